@@ -0,0 +1,172 @@
+import json
+import os
+import uuid
+from collections import namedtuple
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import JSON, DateTime, Float, Integer, LargeBinary, delete, func, insert, select
+
+from app.config import ARCHIVE_COMPRESSION, ARCHIVE_DIR
+from app.db import Nudge, Patient, PatientLatestRisk, Prediction, PredictionArchive
+from app.shards import shard_filename
+
+# Below this the day/week rollup buckets that new predictions land in could hold archived rows
+MIN_AGE_DAYS = 7
+ROW_GROUP_SIZE = 2048  # rows are sorted by patient, so a history read only decodes the groups holding it
+ID_CHUNK = 500  # ids per IN (...) statement
+
+ColdPrediction = namedtuple("ColdPrediction", "id timestamp risk_score band")
+
+
+def _arrow_type(column):
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, LargeBinary):
+        return pa.binary()
+    return pa.string()  # String, Text and JSON (as its text)
+
+
+def arrow_schema(table) -> pa.Schema:
+    """Parquet schema mirroring a table's columns."""
+    return pa.schema([pa.field(c.name, _arrow_type(c), nullable=c.nullable) for c in table.columns])
+
+
+def _to_arrow(rows: list, table) -> pa.Table:
+    json_columns = [c.name for c in table.columns if isinstance(c.type, JSON)]
+    records = [dict(r._mapping) for r in rows]
+    for record in records:
+        for name in json_columns:
+            record[name] = json.dumps(record[name])
+    return pa.Table.from_pylist(records, schema=arrow_schema(table))
+
+
+def partition_dir(kind: str, customer_id: str, month: str) -> str:
+    """Directory of a customer's month of archived `kind` (predictions/nudges), relative to the archive root."""
+    customer = os.path.splitext(shard_filename(customer_id))[0]
+    return os.path.join(kind, f"customer={customer}", f"month={month}")
+
+
+def _write(table: pa.Table, relative_dir: str, archive_dir: str) -> str:
+    """Write a new part file (durably, under a temporary name until complete); returns its relative path."""
+    directory = os.path.join(archive_dir, relative_dir)
+    os.makedirs(directory, exist_ok=True)
+    name = f"part-{uuid.uuid4().hex}.parquet"
+    tmp = os.path.join(directory, f".{name}.tmp")
+    pq.write_table(table, tmp, compression=ARCHIVE_COMPRESSION, row_group_size=ROW_GROUP_SIZE)
+    with open(tmp, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(directory, name))
+    return os.path.join(relative_dir, name)
+
+
+def archive_customer(db, customer_id: str, cutoff: datetime, archive_dir: str = ARCHIVE_DIR) -> dict:
+    """
+    Move the customer's predictions older than `cutoff`, and their nudges, to
+    one Parquet file per month, then delete them from `db` (a sync session on
+    the customer's database): one transaction per month, together with its
+    prediction_archive row. Each patient's newest prediction stays hot: it
+    backs patient_latest_risk, the /predict reuse check and the rollup
+    trigger's first-prediction probe. The rollups keep counting archived rows.
+    """
+    patient_ids = select(Patient.id).where(Patient.customer_id == customer_id)
+    old = [
+        Prediction.patient_id.in_(patient_ids),
+        Prediction.timestamp < cutoff,
+        Prediction.id.not_in(select(PatientLatestRisk.prediction_id)),
+    ]
+    month_of = func.strftime("%Y-%m", Prediction.timestamp)
+    months = db.scalars(select(month_of).where(*old).distinct().order_by(month_of)).all()
+    db.rollback()
+
+    counts = {"months": 0, "predictions": 0, "nudges": 0, "bytes": 0}
+    for month in months:
+        try:
+            in_month = old + [month_of == month]
+            preds = db.execute(
+                select(Prediction.__table__).where(*in_month)
+                .order_by(Prediction.patient_id, Prediction.timestamp, Prediction.id)
+            ).all()
+            # Everything below goes by these ids: exactly the rows in the file leave the database
+            ids = [p.id for p in preds]
+            chunks = [ids[start:start + ID_CHUNK] for start in range(0, len(ids), ID_CHUNK)]
+            nudges = [n for chunk in chunks for n in db.execute(
+                select(Nudge.__table__).where(Nudge.prediction_id.in_(chunk)).order_by(Nudge.id)
+            ).all()]
+            predictions_path = _write(_to_arrow(preds, Prediction.__table__),
+                                      partition_dir("predictions", customer_id, month), archive_dir)
+            nudges_path = _write(_to_arrow(nudges, Nudge.__table__),
+                                 partition_dir("nudges", customer_id, month), archive_dir) if nudges else None
+
+            for chunk in chunks:
+                db.execute(delete(Nudge).where(Nudge.prediction_id.in_(chunk)))
+                db.execute(delete(Prediction).where(Prediction.id.in_(chunk)))
+            db.execute(insert(PredictionArchive), [{
+                "customer_id": customer_id, "month": month,
+                "predictions_path": predictions_path, "nudges_path": nudges_path,
+                "predictions": len(preds), "nudges": len(nudges),
+                "first_timestamp": min(p.timestamp for p in preds),
+                "last_timestamp": max(p.timestamp for p in preds),
+            }])
+            db.commit()
+        except Exception:
+            db.rollback()  # a part file written before the failure is not in prediction_archive, so never read
+            raise
+        counts["months"] += 1
+        counts["predictions"] += len(preds)
+        counts["nudges"] += len(nudges)
+        for path in (predictions_path, nudges_path):
+            if path:
+                counts["bytes"] += os.path.getsize(os.path.join(archive_dir, path))
+    return counts
+
+
+def cold_parts_query(customer_id: str, after: tuple = None):
+    """(predictions_path, first_timestamp) of the customer's archive files that can hold rows after `after`."""
+    q = select(PredictionArchive.predictions_path, PredictionArchive.first_timestamp).where(
+        PredictionArchive.customer_id == customer_id
+    )
+    if after is not None:
+        q = q.where(PredictionArchive.last_timestamp >= after[0])
+    return q.order_by(PredictionArchive.first_timestamp, PredictionArchive.id)
+
+
+def _read_patient(path: str, patient_id: str) -> list:
+    """The patient's ColdPrediction rows in one archive file, decoding only the row groups whose patient_id range holds them."""
+    f = pq.ParquetFile(path)
+    meta = f.metadata
+    column = meta.schema.to_arrow_schema().get_field_index("patient_id")
+    groups = []
+    for i in range(meta.num_row_groups):
+        stats = meta.row_group(i).column(column).statistics
+        if stats is None or not stats.has_min_max or stats.min <= patient_id <= stats.max:
+            groups.append(i)
+    if not groups:
+        return []
+    table = f.read_row_groups(groups, columns=list(ColdPrediction._fields) + ["patient_id"])
+    table = table.filter(pc.equal(table["patient_id"], patient_id)).drop_columns(["patient_id"])
+    return [ColdPrediction(**r) for r in table.to_pylist()]
+
+
+def read_cold_history(parts: list, patient_id: str, band: str = None, after: tuple = None, limit: int = None,
+                      archive_dir: str = ARCHIVE_DIR) -> list:
+    """
+    A patient's archived predictions, oldest first, as ColdPrediction rows
+    after the (timestamp, id) keyset `after`. `parts` come from
+    cold_parts_query(); files are read in order and only until the first
+    `limit` rows are settled.
+    """
+    rows = []
+    for path, first_timestamp in parts:
+        if limit is not None and len(rows) >= limit and first_timestamp > rows[limit - 1].timestamp:
+            break
+        rows.extend(r for r in _read_patient(os.path.join(archive_dir, path), patient_id)
+                    if (not band or r.band == band) and (after is None or (r.timestamp, r.id) > after))
+        rows.sort(key=lambda r: (r.timestamp, r.id))
+    return rows[:limit] if limit is not None else rows
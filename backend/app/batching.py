@@ -0,0 +1,125 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent single-row scoring calls into vectorized batches.
+
+    Callers submit one item and get a Future back. A background thread takes
+    the first waiting item, keeps collecting until `max_batch_size` items or
+    `max_wait_ms` have passed, then calls `score_batch(items)` once and hands
+    each result back to its caller. If the batch call fails, its items are
+    retried one by one so only the failing item's caller gets the error.
+    `concurrency` threads do this side by side, so that many batches can be
+    in flight (e.g. one per inference worker process).
+    """
+
+    def __init__(self, score_batch, max_batch_size: int = 32, max_wait_ms: float = 5.0, concurrency: int = 1):
+        self.score_batch = score_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self.concurrency = max(1, concurrency)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+
+        # Metrics
+        self._submitted = 0
+        self._batches = 0
+        self._items_scored = 0
+        self._errors = 0
+        self._fallbacks = 0  # failed batches re-scored item by item
+        self._last_batch_size = 0
+        self._peak_queue_depth = 0
+
+    def _ensure_started(self):
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.concurrency:
+                t = threading.Thread(target=self._run, name=f"micro-batcher-{len(self._threads)}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, item) -> Future:
+        self._ensure_started()
+        fut = Future()
+        self._queue.put((item, fut))
+        with self._lock:
+            self._submitted += 1
+            self._peak_queue_depth = max(self._peak_queue_depth, self._queue.qsize())
+        return fut
+
+    def score(self, item):
+        """Blocking helper: submit one item and wait for its result."""
+        return self.submit(item).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _score(self, items: list) -> list:
+        results = self.score_batch(items)
+        if len(results) != len(items):
+            raise RuntimeError(f"score_batch returned {len(results)} results for {len(items)} items")
+        return results
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self._score(items)
+            except Exception as e:
+                with self._lock:
+                    self._errors += 1
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                    continue
+                # One bad item should not fail its neighbours: score them one by one
+                with self._lock:
+                    self._fallbacks += 1
+                results = []
+                for item, fut in batch:
+                    try:
+                        results.append(self._score([item])[0])
+                    except Exception as item_error:
+                        results.append(None)
+                        fut.set_exception(item_error)
+
+            with self._lock:
+                self._batches += 1
+                self._items_scored += len(batch)
+                self._last_batch_size = len(batch)
+            for (_, fut), result in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(result)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "concurrency": self.concurrency,
+                "queue_depth": self._queue.qsize(),
+                "peak_queue_depth": self._peak_queue_depth,
+                "submitted": self._submitted,
+                "batches": self._batches,
+                "items_scored": self._items_scored,
+                "mean_batch_size": self._items_scored / self._batches if self._batches else 0.0,
+                "last_batch_size": self._last_batch_size,
+                "errors": self._errors,
+                "fallbacks": self._fallbacks,
+            }
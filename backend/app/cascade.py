@@ -0,0 +1,171 @@
+import warnings
+import numpy as np
+
+from app.features import feature_aliases, to_float
+
+AGE_BRACKETS = [f"[{lo}-{lo + 10})" for lo in range(0, 100, 10)]
+
+
+def _age_bracket(val):
+    """75 -> "[70-80)"; the LR artifacts were trained on bracketed ages."""
+    age = to_float(val)
+    if age != age:
+        return val
+    return AGE_BRACKETS[min(9, max(0, int(age) // 10))]
+
+
+class LRScreen:
+    """
+    Logistic-regression screen loaded from stack/lr_model.pkl. Supports both
+    artifact layouts in the repo: the Pipeline written by train_lr.py and the
+    (LogisticRegression, OrdinalEncoder, cat_cols) tuple read by predict_lr.py.
+
+    The encoder is compiled into lookup tables at load time, so scoring is a
+    dict lookup per categorical value plus one dot product — no pandas or
+    sklearn on the request path.
+    """
+
+    def __init__(self, path: str):
+        import joblib  # deferred: only needed when the cascade is enabled
+        from app.ml import file_checksum, model_version_for
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # sklearn version-skew warnings on unpickle
+            artifact = joblib.load(path)
+        self.path = path
+        self.model_version = model_version_for(path, file_checksum(path))
+
+        if isinstance(artifact, tuple):
+            model, encoder, cat_cols = artifact
+            self.columns = list(model.feature_names_in_)
+            self.one_hot = False
+            unknown = float(encoder.unknown_value) if encoder.handle_unknown == "use_encoded_value" else np.nan
+        else:
+            model = artifact.named_steps["classifier"]
+            pre = artifact.named_steps["preprocessor"]
+            encoder = pre.named_transformers_["cat"]
+            cat_cols = pre.transformers[0][2]
+            self.columns = list(artifact.feature_names_in_)
+            self.one_hot = True
+            unknown = None
+        self.cat_cols = list(cat_cols)
+        cat_set = set(self.cat_cols)
+        self.num_cols = [c for c in self.columns if c not in cat_set]
+        self.age_is_bracketed = "age" in cat_set
+        self._unknown = unknown
+
+        # category value -> ordinal code / one-hot offset, per categorical column
+        self._codes = [{str(v): i for i, v in enumerate(cats)} for cats in encoder.categories_]
+
+        # Design layout: ordinal -> original column order; one-hot -> cat blocks then numerics
+        if self.one_hot:
+            widths = [len(c) for c in self._codes]
+            self._cat_offsets = np.cumsum([0] + widths[:-1])
+            self._width = sum(widths) + len(self.num_cols)
+            sources = [c for c, w in zip(self.cat_cols, widths) for _ in range(w)] + self.num_cols
+        else:
+            self._col_pos = {c: i for i, c in enumerate(self.columns)}
+            self._width = len(self.columns)
+            sources = list(self.columns)
+
+        self.coef = model.coef_[0].astype(float)
+        self.intercept = float(model.intercept_[0])
+        # design column -> source feature, as a 0/1 aggregation matrix
+        self._agg = np.zeros((self._width, len(self.columns)))
+        col_idx = {c: i for i, c in enumerate(self.columns)}
+        for j, src in enumerate(sources):
+            self._agg[j, col_idx[src]] = 1.0
+
+    def _value(self, row: dict, col: str):
+        for key in feature_aliases(col):
+            val = row.get(key)
+            if val is not None:
+                return val
+        return None
+
+    def _design(self, inputs: list) -> np.ndarray:
+        design = np.zeros((len(inputs), self._width))
+        n_cat_width = self._width - len(self.num_cols)
+        for r, row in enumerate(inputs):
+            for k, col in enumerate(self.cat_cols):
+                val = self._value(row, col)
+                if col == "age" and self.age_is_bracketed and val is not None:
+                    val = _age_bracket(val)
+                code = self._codes[k].get("missing" if val is None else str(val))
+                if self.one_hot:
+                    if code is not None:  # handle_unknown="ignore" → all zeros
+                        design[r, self._cat_offsets[k] + code] = 1.0
+                else:
+                    design[r, self._col_pos[col]] = self._unknown if code is None else code
+            for k, col in enumerate(self.num_cols):
+                num = to_float(self._value(row, col))
+                pos = n_cat_width + k if self.one_hot else self._col_pos[col]
+                design[r, pos] = 0.0 if num != num else num  # preprocess() fills numeric NaN with 0
+        return design
+
+    def predict_batch(self, inputs: list):
+        """(probabilities, per-feature logit contributions [n, n_columns]) for each input."""
+        design = self._design(inputs)
+        probs = 1.0 / (1.0 + np.exp(-(design @ self.coef + self.intercept)))
+        # coefficient * value, summed back onto the original feature
+        contribs = (design * self.coef) @ self._agg
+        return probs, contribs
+
+
+class CascadeScorer:
+    """
+    Score with the LR screen first and only send patients whose LR
+    probability falls inside [band_low, band_high] on to CatBoost + SHAP.
+    Confident cases are returned with LR contributions as their explanation.
+    """
+
+    def __init__(self, screen: LRScreen, band_low: float, band_high: float):
+        self.screen = screen
+        self.band_low = band_low
+        self.band_high = band_high
+        self.screened = 0
+        self.short_circuited = 0
+
+    def predict_batch(self, inputs: list, score_full, tier: str = "exact") -> list:
+        from app.ml import band_for_probability
+
+        probs, contribs = self.screen.predict_batch(inputs)
+        uncertain = [i for i, p in enumerate(probs) if self.band_low <= p <= self.band_high]
+        full = dict(zip(uncertain, score_full([inputs[i] for i in uncertain]) if uncertain else []))
+
+        self.screened += len(inputs)
+        self.short_circuited += len(inputs) - len(uncertain)
+
+        results = []
+        for i, (row, prob) in enumerate(zip(inputs, probs)):
+            if i in full:
+                results.append(dict(full[i], scorer="catboost"))
+                continue
+            prob = float(prob)
+            top_features = {}
+            # coefficient x value is already the exact attribution for a linear model
+            for j, col in enumerate(self.screen.columns if tier != "none" else ()):
+                for key in feature_aliases(col):
+                    if key in row:
+                        top_features[key] = float(contribs[i, j])
+                        break
+            results.append({
+                "risk_score": prob,
+                "band": band_for_probability(prob),
+                "top_features": top_features,
+                "explanation_tier": "none" if tier == "none" else "exact",
+                "model_version": self.screen.model_version,
+                "scorer": "lr_screen"
+            })
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "lr_model_version": self.screen.model_version,
+            "band_low": self.band_low,
+            "band_high": self.band_high,
+            "screened": self.screened,
+            "short_circuited": self.short_circuited,
+            "short_circuit_rate": self.short_circuited / self.screened if self.screened else 0.0,
+        }
+
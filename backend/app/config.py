@@ -0,0 +1,103 @@
+import os
+
+# Storage: request handlers use the async engine (aiosqlite); background threads the sync one
+DATABASE_URL = os.getenv("READM_DATABASE_URL", "sqlite:///./readm.db")
+ASYNC_DATABASE_URL = os.getenv("READM_ASYNC_DATABASE_URL") or DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+DB_POOL_SIZE = int(os.getenv("READM_DB_POOL_SIZE", "8"))
+
+# Per-customer shards: READM_DATABASE_URL becomes the catalog (customers), each customer's
+# patients/predictions/nudges live in <READM_SHARD_DIR>/<customer>.db
+SHARDING_ENABLED = os.getenv("READM_SHARDING_ENABLED", "0") == "1"
+SHARD_DIR = os.getenv("READM_SHARD_DIR", "shards")
+SHARD_MAX_OPEN = int(os.getenv("READM_SHARD_MAX_OPEN", "32"))  # open shard engines kept (LRU)
+SHARD_POOL_SIZE = int(os.getenv("READM_SHARD_POOL_SIZE", "4"))
+
+# Write-behind /predict: prediction + nudge rows are queued and committed by a background writer,
+# one transaction per batch. Queued rows are lost if the process dies (a clean shutdown flushes them);
+# a full queue answers 503 instead of blocking
+WRITE_BEHIND = os.getenv("READM_WRITE_BEHIND", "0") == "1"
+JOURNAL_MAX_QUEUE = int(os.getenv("READM_JOURNAL_MAX_QUEUE", "10000"))
+JOURNAL_BATCH_SIZE = int(os.getenv("READM_JOURNAL_BATCH_SIZE", "256"))
+JOURNAL_MAX_WAIT_MS = float(os.getenv("READM_JOURNAL_MAX_WAIT_MS", "20"))
+JOURNAL_WAIT_S = float(os.getenv("READM_JOURNAL_WAIT_S", "30"))  # background updates wait this long for a queued row
+
+# List endpoints: keyset pages of `limit` rows (cap), next cursor in the X-Next-Cursor header. The default
+# applies to /dashboard and to a ?cursor without ?limit; patient lists and histories are unpaged without ?limit
+PAGE_DEFAULT_LIMIT = int(os.getenv("READM_PAGE_DEFAULT_LIMIT", "100"))
+PAGE_MAX_LIMIT = int(os.getenv("READM_PAGE_MAX_LIMIT", "1000"))
+
+# Per-prediction SHAP contributions: "json" (top_features name -> value dict in every row) or "packed"
+# (float32 vector in the order of the model version's feature_schemas row; decoded when a response needs it)
+SHAP_STORAGE = os.getenv("READM_SHAP_STORAGE", "json")
+
+# Cold tier: archive_predictions.py moves predictions older than READM_ARCHIVE_AFTER_DAYS (and their
+# nudges) into Parquet files under READM_ARCHIVE_DIR, partitioned by customer and month
+ARCHIVE_DIR = os.getenv("READM_ARCHIVE_DIR", "archive")
+ARCHIVE_AFTER_DAYS = int(os.getenv("READM_ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_COMPRESSION = os.getenv("READM_ARCHIVE_COMPRESSION", "zstd")
+
+# SQLite pragmas applied on every new connection (WAL lets readers run alongside the writer)
+SQLITE_WAL = os.getenv("READM_SQLITE_WAL", "1") == "1"
+SQLITE_SYNCHRONOUS = os.getenv("READM_SQLITE_SYNCHRONOUS", "NORMAL")  # NORMAL is durable across app crashes in WAL mode
+SQLITE_CACHE_KB = int(os.getenv("READM_SQLITE_CACHE_KB", "65536"))
+SQLITE_MMAP_MB = int(os.getenv("READM_SQLITE_MMAP_MB", "256"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("READM_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Model
+MODEL_PATH = os.getenv("READM_MODEL_PATH", "stack/catboost_model.cbm")
+MODEL_DIR = os.getenv("READM_MODEL_DIR", "stack")  # registry scans *.cbm here
+
+# Micro-batching of concurrent /predict calls
+BATCH_ENABLED = os.getenv("READM_BATCH_ENABLED", "1") == "1"
+BATCH_MAX_SIZE = int(os.getenv("READM_BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.getenv("READM_BATCH_MAX_WAIT_MS", "5"))
+
+# Cache of raw scores + SHAP vectors keyed by feature row and model version
+PREDICTION_CACHE_SIZE = int(os.getenv("READM_PREDICTION_CACHE_SIZE", "4096"))
+PREDICTION_CACHE_TTL = float(os.getenv("READM_PREDICTION_CACHE_TTL", "900"))
+
+# Worker processes for CatBoost/SHAP scoring (0 = score in the API process)
+INFERENCE_WORKERS = int(os.getenv("READM_INFERENCE_WORKERS", "0"))
+# forkserver/spawn workers start clean; "fork" shares the loaded model copy-on-write but copies the
+# API process's threads' locks (DB pools, journal, batchers) in whatever state they are in
+INFERENCE_START_METHOD = os.getenv("READM_INFERENCE_START_METHOD", "forkserver")
+
+# Cascade: cheap LR screen, CatBoost + SHAP only inside the uncertainty band
+CASCADE_ENABLED = os.getenv("READM_CASCADE_ENABLED", "0") == "1"
+CASCADE_LR_PATH = os.getenv("READM_CASCADE_LR_PATH", "stack/lr_model.pkl")
+CASCADE_BAND_LOW = float(os.getenv("READM_CASCADE_BAND_LOW", "0.10"))
+CASCADE_BAND_HIGH = float(os.getenv("READM_CASCADE_BAND_HIGH", "0.40"))
+
+# Explanation tier: "exact" (full TreeSHAP; deferred to a background task on /predict),
+# "fast" (approximate SHAP or cached contributions) or "none" (no attributions)
+EXPLAIN_TIER = os.getenv("READM_EXPLAIN_TIER", "exact")
+BULK_EXPLAIN_TIER = os.getenv("READM_BULK_EXPLAIN_TIER", "none")
+
+# Explanation text: "llm" (generated in the background) or "local" (rule/template bullets, no network);
+# overridden per customer (Customer.explainer) and per request
+EXPLAINER = os.getenv("READM_EXPLAINER", "llm")
+
+# LLM explanations, generated in the background after /predict returns
+EXPLAIN_MODEL = os.getenv("READM_EXPLAIN_MODEL", "gpt-4o-mini")
+EXPLAIN_TIMEOUT = float(os.getenv("READM_EXPLAIN_TIMEOUT", "30"))  # total seconds per explanation, retries included
+EXPLAIN_WORKERS = int(os.getenv("READM_EXPLAIN_WORKERS", "4"))
+
+# LLM client: connection pool, in-flight cap, per-attempt timeout, retries and circuit breaker
+LLM_MAX_CONNECTIONS = int(os.getenv("READM_LLM_MAX_CONNECTIONS", "8"))
+LLM_MAX_IN_FLIGHT = int(os.getenv("READM_LLM_MAX_IN_FLIGHT", "8"))
+LLM_ATTEMPT_TIMEOUT = float(os.getenv("READM_LLM_ATTEMPT_TIMEOUT", "10"))
+LLM_RETRIES = int(os.getenv("READM_LLM_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.getenv("READM_LLM_BACKOFF_BASE", "0.25"))  # seconds, doubled per retry, full jitter
+LLM_BREAKER_FAILURES = int(os.getenv("READM_LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("READM_LLM_BREAKER_RESET", "30"))  # seconds open before a trial call
+
+# Batched multi-patient explanations (bulk scoring)
+EXPLAIN_BATCH_MAX_PATIENTS = int(os.getenv("READM_EXPLAIN_BATCH_MAX_PATIENTS", "20"))
+EXPLAIN_BATCH_MAX_PROMPT_CHARS = int(os.getenv("READM_EXPLAIN_BATCH_MAX_PROMPT_CHARS", "12000"))
+EXPLAIN_BATCH_MAX_TOKENS = int(os.getenv("READM_EXPLAIN_BATCH_MAX_TOKENS", "4000"))  # completion cap per batch
+
+# Persistent cache of explanation text keyed by the normalized prompt (READM_EXPLAIN_CACHE_ENABLED=0 bypasses it)
+EXPLAIN_CACHE_ENABLED = os.getenv("READM_EXPLAIN_CACHE_ENABLED", "1") == "1"
+EXPLAIN_CACHE_PATH = os.getenv("READM_EXPLAIN_CACHE_PATH", "explanation_cache.db")
+EXPLAIN_CACHE_MAX_ENTRIES = int(os.getenv("READM_EXPLAIN_CACHE_MAX_ENTRIES", "50000"))
+EXPLAIN_CACHE_TTL = float(os.getenv("READM_EXPLAIN_CACHE_TTL", str(30 * 86400)))
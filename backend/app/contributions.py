@@ -0,0 +1,99 @@
+import threading
+
+import numpy as np
+from sqlalchemy import insert, select
+
+from app.config import SHAP_STORAGE
+from app.db import FeatureSchema, feature_plan
+
+# A model version's feature order never changes, so the first writer's row stands
+insert_feature_schemas = insert(FeatureSchema.__table__).prefix_with("OR IGNORE")
+
+_lock = threading.Lock()
+_schemas = {}  # model_version -> feature names, as written to (or read from) feature_schemas
+_positions = {}  # tuple(names) -> spelling -> vector index
+
+
+def _writer_schema(model_version: str) -> list:
+    """Feature order for a new vector: the LR screen's columns for its version, else feature_names.json."""
+    with _lock:
+        names = _schemas.get(model_version)
+    if names is not None:
+        return names
+    from app.ml import loaded_cascade  # deferred: app.ml is the heavier import
+
+    cascade = loaded_cascade()
+    if cascade is not None and cascade.screen.model_version == model_version:
+        names = list(cascade.screen.columns)
+    else:
+        names = list(feature_plan.column_names)
+    with _lock:
+        return _schemas.setdefault(model_version, names)
+
+
+def _position(names: list) -> dict:
+    key = tuple(names)
+    with _lock:
+        pos = _positions.get(key)
+        if pos is None:
+            # Drivers are keyed as the caller spelled the feature (glyburide-metformin / glyburide_metformin)
+            pos = {}
+            for i, name in enumerate(names):
+                for spelling in (name, name.replace("-", "_"), name.replace("_", "-")):
+                    pos.setdefault(spelling, i)
+            _positions[key] = pos
+        return pos
+
+
+def pack(top_features: dict, names: list):
+    """float32 vector aligned with `names`, NaN where a feature has no contribution; None if a key is not in `names`."""
+    pos = _position(names)
+    vec = np.full(len(names), np.nan, dtype="<f4")
+    for key, value in top_features.items():
+        i = pos.get(key)
+        if i is None:
+            return None
+        vec[i] = value
+    return vec.tobytes()
+
+
+def unpack(blob: bytes, names: list) -> dict:
+    """The top_features dict back from a packed vector (keys spelled as in the schema)."""
+    return {name: v for name, v in zip(names, np.frombuffer(blob, dtype="<f4").tolist()) if v == v}
+
+
+def pack_rows(rows: list):
+    """
+    With READM_SHAP_STORAGE=packed, move each prediction row's top_features
+    into top_features_packed (in place). Rows whose drivers do not fit the
+    version's schema keep the JSON form.
+    """
+    if SHAP_STORAGE != "packed":
+        return
+    for row in rows:
+        row["top_features_packed"] = None  # executemany needs the same keys in every row
+        if not row.get("top_features") or not row.get("model_version"):
+            continue
+        blob = pack(row["top_features"], _writer_schema(row["model_version"]))
+        if blob is not None:
+            row["top_features"], row["top_features_packed"] = {}, blob
+
+
+def schema_rows(rows: list) -> list:
+    """feature_schemas rows for the versions of the packed rows, for their writer to insert (insert_feature_schemas)."""
+    versions = {r["model_version"] for r in rows if r.get("top_features_packed") is not None}
+    return [{"model_version": v, "features": _writer_schema(v)} for v in sorted(versions)]
+
+
+def remember_schema(model_version: str, names: list) -> list:
+    with _lock:
+        return _schemas.setdefault(model_version, list(names))
+
+
+def cached_schema(model_version: str):
+    with _lock:
+        return _schemas.get(model_version)
+
+
+def schema_query(model_version: str):
+    return select(FeatureSchema.features).where(FeatureSchema.model_version == model_version)
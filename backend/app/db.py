@@ -1,17 +1,74 @@
-from sqlalchemy import create_engine, Column, String, Float, ForeignKey, JSON, DateTime, Integer, Text
+from sqlalchemy import (
+    create_engine, event, inspect, text, and_, insert, select, update, bindparam,
+    Column, String, Float, ForeignKey, Index, JSON, DateTime, Integer, LargeBinary, Text,
+)
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
 from datetime import datetime
+from app.features import load_feature_plan
+from app.utils import details_fingerprint
+from app.config import (
+    DATABASE_URL, ASYNC_DATABASE_URL, DB_POOL_SIZE,
+    SQLITE_WAL, SQLITE_SYNCHRONOUS, SQLITE_CACHE_KB, SQLITE_MMAP_MB, SQLITE_BUSY_TIMEOUT_MS,
+)
 
-DATABASE_URL = "sqlite:///./readm.db"
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+def sqlite_pragmas(wal: bool = SQLITE_WAL) -> list:
+    pragmas = [
+        f"busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        f"synchronous={SQLITE_SYNCHRONOUS}",
+        f"cache_size=-{SQLITE_CACHE_KB}",  # negative = KiB
+        f"mmap_size={SQLITE_MMAP_MB * 1024 * 1024}",
+        "temp_store=MEMORY",
+    ]
+    return (["journal_mode=WAL"] if wal else []) + pragmas
+
+
+def _tune_sqlite(sync_engine, pragmas: list):
+    """Run `pragmas` on every new DBAPI connection of a SQLite engine."""
+    if sync_engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        for pragma in pragmas:
+            cur.execute(f"PRAGMA {pragma}")
+        cur.close()
+
+
+def make_engine(url: str = DATABASE_URL, pragmas: list = None):
+    """Sync engine (background threads, migrations); `pragmas` defaults to sqlite_pragmas()."""
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    eng = create_engine(url, connect_args=connect_args)
+    _tune_sqlite(eng, sqlite_pragmas() if pragmas is None else pragmas)
+    return eng
+
+
+def make_async_engine(url: str = ASYNC_DATABASE_URL, pragmas: list = None, pool_size: int = DB_POOL_SIZE):
+    """Async engine for request handlers, with a bounded connection pool."""
+    eng = create_async_engine(url, pool_size=pool_size, max_overflow=0, pool_pre_ping=False)
+    _tune_sqlite(eng.sync_engine, sqlite_pragmas() if pragmas is None else pragmas)
+    return eng
+
+
+engine = make_engine()
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+async_engine = make_async_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
+
+async def get_db():
+    """FastAPI dependency: one AsyncSession per request, returned to the pool afterwards."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 class Customer(Base):
     __tablename__ = "customers"
     id = Column(String, primary_key=True, index=True)
     name = Column(String, nullable=False)
+    explainer = Column(String, nullable=True)  # llm/local; NULL follows READM_EXPLAINER
     patients = relationship("Patient", back_populates="customer", cascade="all, delete-orphan")
 
 class Patient(Base):
@@ -20,23 +77,101 @@ class Patient(Base):
     name = Column(String, nullable=False)
     details = Column(JSON, nullable=True)
     status = Column(String, default="not_discharged")  # discharged / not_discharged
+    features_hash = Column(String, nullable=True)  # fingerprint of details
     customer_id = Column(String, ForeignKey("customers.id"), index=True, nullable=False)
     customer = relationship("Customer", back_populates="patients")
     predictions = relationship("Prediction", back_populates="patient", cascade="all, delete-orphan")
 
+    # Keyset pages of a customer's patients in id order, optionally for one status
+    __table_args__ = (
+        Index("ix_patients_customer_id_id", "customer_id", "id"),
+        Index("ix_patients_customer_status_id", "customer_id", "status", "id"),
+    )
+
+# Column layout of the feature store; the same files (and coercion) the inference engine uses
+feature_plan = load_feature_plan()
+
+class PatientFeatures(Base):
+    """
+    The model features of each patient's details, holding the values the model
+    is fed. Typed columns, one per feature_names.json entry (underscore
+    spelling; numerics REAL with NULL when missing, categoricals TEXT with
+    "missing"), let SQL filter and index on features. The same row packed into
+    num_vector/cat_vector is what batch paths read: a customer's whole matrix
+    decodes in one pass instead of one details blob per patient. A row is
+    current while its features_hash matches the patient's and `layout` the
+    loaded feature plan; see sync_patient_features().
+    """
+    __tablename__ = "patient_features"
+    patient_id = Column(String, ForeignKey("patients.id"), primary_key=True)
+    features_hash = Column(String, nullable=False)  # Patient.features_hash the row was built from
+    layout = Column(String, nullable=False)  # FeaturePlan.layout the row was built with
+    num_vector = Column(LargeBinary, nullable=False)  # numeric features, little-endian float32
+    cat_vector = Column(Text, nullable=False)  # categorical features joined by CATEGORY_SEPARATOR
+
+for _name in feature_plan.num_columns:
+    setattr(PatientFeatures, _name, Column(_name, Float, nullable=True))
+for _name in feature_plan.cat_columns:
+    setattr(PatientFeatures, _name, Column(_name, String, nullable=True))
+
 class Prediction(Base):
     __tablename__ = "predictions"
     id = Column(String, primary_key=True, index=True)
     patient_id = Column(String, ForeignKey("patients.id"), index=True, nullable=False)
     risk_score = Column(Float, nullable=False)
     band = Column(String, nullable=False)  # low/medium/high
-    top_features = Column(JSON, nullable=False)
+    top_features = Column(JSON, nullable=False)  # {} when the contributions are packed
+    top_features_packed = Column(LargeBinary, nullable=True)  # float32, feature_schemas order for model_version
     explanation = Column(Text, nullable=False)
+    explanation_status = Column(String, nullable=True)  # pending/ready/fallback; NULL rows predate it (ready)
+    features_hash = Column(String, nullable=True)  # fingerprint of the details that were scored
+    model_version = Column(String, nullable=True)  # e.g. catboost_model-dca8d522cd75
+    explanation_tier = Column(String, nullable=True)  # exact/fast/none; NULL rows predate tiers (exact)
+    explainer = Column(String, nullable=True)  # llm/local; NULL: template text only, or the row predates it
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     patient = relationship("Patient", back_populates="predictions")
     nudges = relationship("Nudge", back_populates="prediction", cascade="all, delete-orphan")
 
+    # Latest-first per patient (history, reuse check) without a sort; the second for ?band= filters
+    __table_args__ = (
+        Index("ix_predictions_patient_timestamp", "patient_id", "timestamp"),
+        Index("ix_predictions_patient_band_timestamp", "patient_id", "band", "timestamp"),
+    )
+
+class FeatureSchema(Base):
+    """Feature order of a model version's packed contribution vectors (READM_SHAP_STORAGE=packed)."""
+    __tablename__ = "feature_schemas"
+    model_version = Column(String, primary_key=True)
+    features = Column(JSON, nullable=False)  # names, one per vector element
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class PatientLatestRisk(Base):
+    """Each patient's newest prediction, kept current by a trigger on predictions inserts."""
+    __tablename__ = "patient_latest_risk"
+    patient_id = Column(String, ForeignKey("patients.id"), primary_key=True)
+    prediction_id = Column(String, nullable=False)
+    risk_score = Column(Float, nullable=False)
+    band = Column(String, nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+
+class CustomerRiskRollup(Base):
+    """
+    Per-customer prediction counters: all-time ("all", bucket_start "") and per
+    day/week (bucket_start YYYY-MM-DD, weeks start on Monday). Kept by a trigger
+    on predictions inserts, so customer analytics never scans predictions.
+    """
+    __tablename__ = "customer_risk_rollup"
+    customer_id = Column(String, primary_key=True)
+    granularity = Column(String, primary_key=True)  # all/day/week
+    bucket_start = Column(String, primary_key=True)
+    predictions = Column(Integer, nullable=False, default=0)
+    risk_sum = Column(Float, nullable=False, default=0.0)
+    low = Column(Integer, nullable=False, default=0)
+    medium = Column(Integer, nullable=False, default=0)
+    high = Column(Integer, nullable=False, default=0)
+    patients = Column(Integer, nullable=False, default=0)  # distinct patients scored in the bucket
+
 class Nudge(Base):
     __tablename__ = "nudges"
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -47,4 +182,192 @@ class Nudge(Base):
 
     prediction = relationship("Prediction", back_populates="nudges")
 
-Base.metadata.create_all(bind=engine)
+class PredictionArchive(Base):
+    """
+    A Parquet file of archived (cold) predictions, with the file of their
+    nudges: one per customer, month and archive run. Written in the same
+    transaction that deletes the rows, so a prediction is either here or hot.
+    """
+    __tablename__ = "prediction_archive"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    customer_id = Column(String, index=True, nullable=False)
+    month = Column(String, nullable=False)  # YYYY-MM of the predictions' timestamps
+    predictions_path = Column(String, nullable=False)  # relative to READM_ARCHIVE_DIR
+    nudges_path = Column(String, nullable=True)  # NULL when the predictions had none
+    predictions = Column(Integer, nullable=False)
+    nudges = Column(Integer, nullable=False)
+    first_timestamp = Column(DateTime, nullable=False)
+    last_timestamp = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+def _add_missing_columns(bind):
+    """create_all() never alters existing tables; add new (nullable) columns and indexes in place."""
+    insp = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name not in existing:
+                    ddl_type = col.type.compile(dialect=bind.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {col.name} {ddl_type}"))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+# Every insert path (ORM, bulk Core inserts, the write-behind journal, shard migration) goes
+# through this; an older prediction arriving late does not replace a newer one
+_LATEST_RISK_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS trg_predictions_latest_risk AFTER INSERT ON predictions
+BEGIN
+    INSERT INTO patient_latest_risk (patient_id, prediction_id, risk_score, band, timestamp)
+    VALUES (NEW.patient_id, NEW.id, NEW.risk_score, NEW.band, NEW.timestamp)
+    ON CONFLICT (patient_id) DO UPDATE SET
+        prediction_id = excluded.prediction_id, risk_score = excluded.risk_score,
+        band = excluded.band, timestamp = excluded.timestamp
+    WHERE excluded.timestamp >= patient_latest_risk.timestamp;
+END
+"""
+
+_LATEST_RISK_BACKFILL = """
+INSERT INTO patient_latest_risk (patient_id, prediction_id, risk_score, band, timestamp)
+SELECT p.patient_id, p.id, p.risk_score, p.band, p.timestamp FROM predictions p
+WHERE p.id = (SELECT q.id FROM predictions q WHERE q.patient_id = p.patient_id
+              ORDER BY q.timestamp DESC LIMIT 1)
+"""
+
+# (granularity, bucket start, bucket end) of a timestamp; ends are exclusive, "~" sorts after any date
+_ROLLUP_BUCKETS = [
+    ("all", "''", "'~'"),
+    ("day", "date({ts})", "date({ts}, '+1 day')"),
+    ("week", "date({ts}, 'weekday 0', '-6 days')", "date({ts}, 'weekday 0', '+1 day')"),
+]
+
+# A patient adds to a bucket's `patients` only with their first prediction in it; the probe for an
+# earlier one is a range read on ix_predictions_patient_timestamp
+_ROLLUP_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS trg_predictions_rollup AFTER INSERT ON predictions
+BEGIN
+    INSERT INTO customer_risk_rollup
+        (customer_id, granularity, bucket_start, predictions, risk_sum, low, medium, high, patients)
+    SELECT pt.customer_id, b.granularity, b.bucket_start, 1, NEW.risk_score,
+           NEW.band = 'low', NEW.band = 'medium', NEW.band = 'high',
+           NOT EXISTS (SELECT 1 FROM predictions q
+                       WHERE q.patient_id = NEW.patient_id AND q.id != NEW.id
+                       AND q.timestamp >= b.bucket_start AND q.timestamp < b.bucket_end)
+    FROM patients pt, (%s) b
+    WHERE pt.id = NEW.patient_id
+    ON CONFLICT (customer_id, granularity, bucket_start) DO UPDATE SET
+        predictions = predictions + 1, risk_sum = risk_sum + excluded.risk_sum,
+        low = low + excluded.low, medium = medium + excluded.medium, high = high + excluded.high,
+        patients = patients + excluded.patients;
+END
+""" % " UNION ALL ".join(
+    f"SELECT '{g}' AS granularity, {start.format(ts='NEW.timestamp')} AS bucket_start, "
+    f"{end.format(ts='NEW.timestamp')} AS bucket_end"
+    for g, start, end in _ROLLUP_BUCKETS
+)
+
+_ROLLUP_BACKFILL = """
+INSERT INTO customer_risk_rollup
+    (customer_id, granularity, bucket_start, predictions, risk_sum, low, medium, high, patients)
+""" + " UNION ALL ".join(
+    f"""SELECT pt.customer_id, '{g}', {start.format(ts='p.timestamp')}, COUNT(*), SUM(p.risk_score),
+       SUM(p.band = 'low'), SUM(p.band = 'medium'), SUM(p.band = 'high'), COUNT(DISTINCT p.patient_id)
+    FROM predictions p JOIN patients pt ON pt.id = p.patient_id GROUP BY 1, 3"""
+    for g, start, _ in _ROLLUP_BUCKETS
+)
+
+# Tables derived from predictions: (table, trigger keeping it current, one-off fill from existing rows)
+_DERIVED_TABLES = [
+    ("patient_latest_risk", _LATEST_RISK_TRIGGER, _LATEST_RISK_BACKFILL),
+    ("customer_risk_rollup", _ROLLUP_TRIGGER, _ROLLUP_BACKFILL),
+]
+
+def _maintain_derived_tables(bind):
+    """Install the triggers on predictions; fill each derived table once for predictions stored before it."""
+    if bind.dialect.name != "sqlite":
+        return
+    with bind.begin() as conn:
+        has_predictions = conn.execute(text("SELECT 1 FROM predictions LIMIT 1")).first() is not None
+        for table, trigger, backfill in _DERIVED_TABLES:
+            conn.execute(text(trigger))
+            if has_predictions and conn.execute(text(f"SELECT 1 FROM {table} LIMIT 1")).first() is None:
+                conn.execute(text(backfill))
+
+# --- Feature store ---
+# The row is derived from details, so writers replace it whole
+upsert_patient_features = insert(PatientFeatures.__table__).prefix_with("OR REPLACE")
+
+def patient_features_row(patient_id: str, features_hash: str, details: dict) -> dict:
+    """Values for upsert_patient_features; written in the same transaction as the details."""
+    return {"patient_id": patient_id, "features_hash": features_hash, "layout": feature_plan.layout,
+            **feature_plan.to_columns(details or {})}
+
+def _features_current():
+    return and_(
+        PatientFeatures.patient_id == Patient.id,
+        PatientFeatures.features_hash == Patient.features_hash,
+        PatientFeatures.layout == feature_plan.layout,
+    )
+
+def sync_patient_features(conn, *criteria, chunk: int = 5000) -> int:
+    """
+    Rebuild missing or stale feature-store rows (for patients matching
+    `criteria`), e.g. rows bulk-inserted without one or written under an older
+    feature_names.json. Patients without a features_hash get it filled in.
+    Returns the number of rows rebuilt.
+    """
+    synced, last = 0, ""
+    while True:
+        stale = conn.execute(
+            select(Patient.id, Patient.details, Patient.features_hash)
+            .outerjoin(PatientFeatures, _features_current())
+            .where(PatientFeatures.patient_id.is_(None), Patient.id > last, *criteria)
+            .order_by(Patient.id).limit(chunk)
+        ).all()
+        if not stale:
+            return synced
+        rows, hashes = [], []
+        for patient_id, details, features_hash in stale:
+            if features_hash is None:
+                features_hash = details_fingerprint(details)
+                hashes.append({"patient_id": patient_id, "features_hash": features_hash})
+            rows.append(patient_features_row(patient_id, features_hash, details))
+        if hashes:
+            conn.execute(update(Patient.__table__).where(Patient.id == bindparam("patient_id"))
+                         .values(features_hash=bindparam("features_hash")), hashes)
+        conn.execute(upsert_patient_features, rows)
+        synced += len(stale)
+        last = stale[-1].id
+
+def load_feature_matrix(conn, customer_id: str, status: str = None) -> tuple:
+    """
+    A customer's patients as model input in one query over patient_features:
+    (patient ids, features hashes, numeric float32 [n, n_num], categorical
+    object [n, n_cat]) in patient id order, equal to FeaturePlan.to_arrays()
+    on their details. Stale rows are rebuilt first (in the caller's transaction).
+    """
+    criteria = [Patient.customer_id == customer_id] + ([Patient.status == status] if status else [])
+    sync_patient_features(conn, *criteria)
+    rows = conn.execute(
+        select(Patient.id, Patient.features_hash, PatientFeatures.num_vector, PatientFeatures.cat_vector)
+        .join(PatientFeatures, _features_current())
+        .where(*criteria).order_by(Patient.id)
+    ).all()
+    ids, hashes, num_vectors, cat_vectors = (list(c) for c in zip(*rows)) if rows else ([], [], [], [])
+    num, cat = feature_plan.unpack(num_vectors, cat_vectors)
+    return ids, hashes, num, cat
+
+def init_schema(bind):
+    """Create missing tables, then add columns/indexes newer than the file."""
+    Base.metadata.create_all(bind=bind)
+    _add_missing_columns(bind)
+    _maintain_derived_tables(bind)
+    with bind.begin() as conn:
+        sync_patient_features(conn)
+
+
+if __name__ == "__main__":
+    # Explicit migration step (the API also runs it on startup): python -m app.db
+    init_schema(engine)
@@ -1,13 +1,47 @@
+import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict
-from openai import OpenAI
-import os
-from dotenv import load_dotenv
+from app.config import (
+    EXPLAIN_MODEL, EXPLAIN_TIMEOUT,
+    EXPLAIN_CACHE_ENABLED, EXPLAIN_CACHE_PATH, EXPLAIN_CACHE_MAX_ENTRIES, EXPLAIN_CACHE_TTL,
+    LLM_MAX_CONNECTIONS, LLM_MAX_IN_FLIGHT, LLM_ATTEMPT_TIMEOUT, LLM_RETRIES, LLM_BACKOFF_BASE,
+    LLM_BREAKER_FAILURES, LLM_BREAKER_RESET,
+    EXPLAIN_BATCH_MAX_PATIENTS, EXPLAIN_BATCH_MAX_PROMPT_CHARS, EXPLAIN_BATCH_MAX_TOKENS,
+)
+from app.explain_cache import ExplanationCache
+from app.llm import CircuitBreaker, LLMUnavailable, ResilientLLMClient
+from app.local_explain import explain_locally
+from app.features import to_float
 from app.utils import band_from_score
 from app.diagnosis_normalizer import denormalize_diagnosis
 
-# Load API key from .env
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Bump when the prompt wording changes so cached texts are not reused for it
+PROMPT_VERSION = 2
+
+# Bucket width per numeric driver; patients in the same bucket share one prompt (and cached text)
+VALUE_STEPS = {
+    "age": 10, "time_in_hospital": 3, "num_lab_procedures": 10, "num_procedures": 1,
+    "num_medications": 5, "number_outpatient": 1, "number_emergency": 1,
+    "number_inpatient": 1, "number_diagnoses": 2,
+}
+IMPACT_STEP = 0.05
+
+explanation_cache = ExplanationCache(
+    EXPLAIN_CACHE_PATH, EXPLAIN_CACHE_MAX_ENTRIES, EXPLAIN_CACHE_TTL, enabled=EXPLAIN_CACHE_ENABLED
+)
+
+# Pooled, bounded client; the OpenAI SDK itself is imported on first use
+llm_client = ResilientLLMClient(
+    max_connections=LLM_MAX_CONNECTIONS,
+    max_in_flight=LLM_MAX_IN_FLIGHT,
+    deadline=EXPLAIN_TIMEOUT,
+    attempt_timeout=LLM_ATTEMPT_TIMEOUT,
+    retries=LLM_RETRIES,
+    backoff_base=LLM_BACKOFF_BASE,
+    breaker=CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET),
+)
 
 
 def _map_feature_to_clinical(feat: str, val):
@@ -36,23 +70,43 @@ def _map_feature_to_clinical(feat: str, val):
     return f"{feat} = {val}"
 
 
-def explain_with_openai(input_dict: dict, risk_score: float, top_features: Dict[str, float] = None) -> str:
-    band = band_from_score(risk_score)
+def _bucket_value(feat: str, val):
+    """21 active meds -> "20-24"; categorical values pass through unchanged."""
+    step = VALUE_STEPS.get(feat)
+    num = to_float(val) if step else float("nan")
+    if num != num:
+        return None if val is None else str(val)
+    lo = int(num // step * step)
+    return str(lo) if step == 1 else f"{lo}-{lo + step - 1}"
 
-    # Extract top 3 SHAP drivers
-    driver_texts = []
+
+def prompt_inputs(input_dict: dict, risk_score: float, top_features: Dict[str, float] = None) -> dict:
+    """Everything the prompt is built from, normalized: band plus the top 3 drivers with bucketed value and impact."""
+    drivers = []
     if top_features:
         sorted_drivers = sorted(top_features.items(), key=lambda x: abs(x[1]), reverse=True)[:3]
         for feat, contrib in sorted_drivers:
-            val = input_dict.get(feat, None)
-            clinical_text = _map_feature_to_clinical(feat, val)
-            if clinical_text:
-                driver_texts.append(f"- {clinical_text} (impact {contrib:.3f})")
+            impact = round(float(contrib) / IMPACT_STEP) * IMPACT_STEP
+            drivers.append([feat, _bucket_value(feat, input_dict.get(feat, None)), f"{impact:+.2f}"])
+    return {"v": PROMPT_VERSION, "model": EXPLAIN_MODEL, "band": band_from_score(risk_score), "drivers": drivers}
 
-    driver_block = "\n".join(driver_texts) or "- Insufficient feature data available"
+
+def _driver_block(inputs: dict) -> str:
+    driver_texts = []
+    for feat, val, impact in inputs["drivers"]:
+        clinical_text = _map_feature_to_clinical(feat, val)
+        if clinical_text:
+            driver_texts.append(f"- {clinical_text} (impact {impact})")
+    return "\n".join(driver_texts) or "- Insufficient feature data available"
+
+
+def _build_prompt(inputs: dict):
+    """(band, driver_block, prompt) from prompt_inputs()."""
+    band = inputs["band"]
+    driver_block = _driver_block(inputs)
 
     prompt = f"""
-    A machine learning model predicted a hospital readmission risk score of {risk_score:.3f} ({band} risk).
+    A machine learning model predicted a {band} risk of hospital readmission.
 
     Top contributing features (already mapped to clinical terms):
     {driver_block}
@@ -63,19 +117,228 @@ def explain_with_openai(input_dict: dict, risk_score: float, top_features: Dict[
     - Describe why each listed feature elevates readmission risk in clinical terms
     - Keep it concise, logical, and evidence-based
     """
+    return band, driver_block, prompt
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=220,
-            temperature=0.2
-        )
-        return response.choices[0].message.content.strip()
 
+def unavailable_explanation(input_dict: dict, risk_score: float, top_features: Dict[str, float], error) -> str:
+    band = band_from_score(risk_score)
+    return (
+        f"Readmission risk is {band} (score {risk_score:.2f}).\n"
+        f"Top factors:\n{explain_locally(input_dict, risk_score, top_features)}\n"
+        f"(Automated explanation unavailable due to: {str(error)}.)"
+    )
+
+
+def explain_with_openai(input_dict: dict, risk_score: float, top_features: Dict[str, float] = None) -> str:
+    inputs = prompt_inputs(input_dict, risk_score, top_features)
+    key = ExplanationCache.key_for(inputs)
+    cached = explanation_cache.get(key)
+    if cached is not None:
+        return cached
+
+    try:
+        return _complete(key, inputs)
     except Exception as e:
-        return (
-            f"Readmission risk is {band} (score {risk_score:.2f}).\n"
-            f"Top factors:\n{driver_block}\n"
-            f"(Automated explanation unavailable due to: {str(e)}.)"
-        )
\ No newline at end of file
+        return unavailable_explanation(input_dict, risk_score, top_features, e)
+
+
+def _complete(key: str, inputs: dict) -> str:
+    """One chat completion for one patient; cached on success, raises on failure."""
+    _, _, prompt = _build_prompt(inputs)
+    text = llm_client.complete(
+        model=EXPLAIN_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=220,
+        temperature=0.2
+    ).strip()
+    if not text:
+        raise ValueError("empty completion")
+    explanation_cache.put(key, text)
+    return text
+
+
+def stream_explanation(input_dict: dict, risk_score: float, top_features: Dict[str, float] = None):
+    """Yield the explanation as it is generated (text deltas). Errors are raised to the caller."""
+    inputs = prompt_inputs(input_dict, risk_score, top_features)
+    key = ExplanationCache.key_for(inputs)
+    cached = explanation_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    _, _, prompt = _build_prompt(inputs)
+    parts = []
+    for delta in llm_client.stream(
+        model=EXPLAIN_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=220,
+        temperature=0.2
+    ):
+        parts.append(delta)
+        yield delta
+    text = "".join(parts).strip()
+    if text:
+        explanation_cache.put(key, text)
+
+
+# --- Batched explanations (ward-level / bulk scoring) ---
+
+BATCH_PROMPT = """
+A machine learning model predicted hospital readmission risk for each patient below.
+Each patient lists its risk band and top contributing features (already mapped to clinical terms).
+
+{patients}
+
+Task:
+For EACH patient, provide 2–4 bullet points for clinicians that:
+- ONLY explain that patient's listed features (do not mention age, weight, or inpatient admissions unless explicitly in the list)
+- Describe why each listed feature elevates readmission risk in clinical terms
+- Keep it concise, logical, and evidence-based
+
+Respond with only a JSON object mapping every patient id to a list of bullet strings,
+e.g. {{"P1": ["...", "..."], "P2": ["..."]}}.
+"""
+
+_batch_stats = {"calls": 0, "patients": 0, "cache_hits": 0, "deduplicated": 0,
+                "batches": 0, "batched_patients": 0, "parse_failures": 0, "single_fallbacks": 0}
+_batch_stats_lock = threading.Lock()
+
+
+def _count(**deltas):
+    with _batch_stats_lock:
+        for name, n in deltas.items():
+            _batch_stats[name] += n
+
+
+def batch_stats() -> dict:
+    with _batch_stats_lock:
+        stats = dict(_batch_stats)
+    stats["mean_batch_size"] = stats["batched_patients"] / stats["batches"] if stats["batches"] else 0.0
+    return stats
+
+
+def _patient_section(pid: str, inputs: dict) -> str:
+    return f"### {pid}\nRisk: {inputs['band']}\n{_driver_block(inputs)}"
+
+
+def _chunk_batches(todo: list) -> list:
+    """Split [(key, inputs)] into batches within the patient-count and prompt-size limits."""
+    batches, current, size = [], [], len(BATCH_PROMPT)
+    for key, inputs in todo:
+        section = len(_patient_section(f"P{len(current) + 1}", inputs)) + 2
+        if current and (len(current) >= EXPLAIN_BATCH_MAX_PATIENTS or size + section > EXPLAIN_BATCH_MAX_PROMPT_CHARS):
+            batches.append(current)
+            current, size = [], len(BATCH_PROMPT)
+        current.append((key, inputs))
+        size += section
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _parse_batch(text: str, ids: list) -> dict:
+    """{patient id: bullet text} for every id with a usable answer; raises if the reply is not a JSON object."""
+    # Tolerate a fenced code block around the JSON
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    data = json.loads(match.group(0) if match else text)
+    if not isinstance(data, dict):
+        raise ValueError("batch reply is not a JSON object")
+    out = {}
+    for pid in ids:
+        answer = data.get(pid)
+        if isinstance(answer, str):
+            answer = [line for line in answer.splitlines() if line.strip()]
+        if not isinstance(answer, list):
+            continue
+        bullets = [str(b).strip().lstrip("-•*").strip() for b in answer if str(b).strip()]
+        if bullets:
+            out[pid] = "\n".join(f"- {b}" for b in bullets)
+    return out
+
+
+def _explain_batch(batch: list) -> dict:
+    """One structured completion for several patients: {cache key: text} for those parsed back out."""
+    ids = [f"P{i + 1}" for i in range(len(batch))]
+    prompt = BATCH_PROMPT.format(patients="\n\n".join(
+        _patient_section(pid, inputs) for pid, (_, inputs) in zip(ids, batch)
+    ))
+    reply = llm_client.complete(
+        model=EXPLAIN_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=min(EXPLAIN_BATCH_MAX_TOKENS, 220 * len(batch)),
+        temperature=0.2,
+        response_format={"type": "json_object"}
+    )
+    _count(batches=1, batched_patients=len(batch))
+    try:
+        parsed = _parse_batch(reply, ids)
+    except ValueError:  # includes json.JSONDecodeError
+        parsed = {}
+    if len(parsed) < len(batch):
+        _count(parse_failures=1)
+    out = {}
+    for pid, (key, _) in zip(ids, batch):
+        if pid in parsed:
+            explanation_cache.put(key, parsed[pid])
+            out[key] = parsed[pid]
+    return out
+
+
+def _safe(fn):
+    """Wrap fn so pool.map returns the exception instead of raising it."""
+    def call(arg):
+        try:
+            return fn(arg)
+        except Exception as e:
+            return e
+    return call
+
+
+def explain_many(items: list) -> list:
+    """
+    Explanations for many (input_dict, risk_score, top_features) at once:
+    cache hits first, identical prompts generated once, the rest packed into
+    structured multi-patient requests. Patients a batch reply does not cover
+    fall back to single requests. Returns [(text, generated_ok)] in order.
+    """
+    inputs = [prompt_inputs(*item) for item in items]
+    keys = [ExplanationCache.key_for(i) for i in inputs]
+    texts, errors, todo = {}, {}, {}
+    for key, inp in zip(keys, inputs):
+        if key in texts or key in todo:
+            continue
+        cached = explanation_cache.get(key)
+        if cached is not None:
+            texts[key] = cached
+        else:
+            todo[key] = inp
+    _count(calls=1, patients=len(items), cache_hits=len(texts), deduplicated=len(items) - len(texts) - len(todo))
+
+    batches = _chunk_batches(list(todo.items()))
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(len(batches), LLM_MAX_IN_FLIGHT)) as pool:
+            for batch, result in zip(batches, pool.map(_safe(_explain_batch), batches)):
+                if isinstance(result, Exception):
+                    errors.update((key, result) for key, _ in batch)
+                else:
+                    texts.update(result)
+
+        # Whatever a batch did not answer (parse failure, missing id, failed call) goes one by one,
+        # unless the LLM is unavailable altogether
+        singles = [(k, todo[k]) for k in todo if k not in texts and not isinstance(errors.get(k), LLMUnavailable)]
+        if singles:
+            _count(single_fallbacks=len(singles))
+            with ThreadPoolExecutor(max_workers=min(len(singles), LLM_MAX_IN_FLIGHT)) as pool:
+                for (key, _), result in zip(singles, pool.map(_safe(lambda s: _complete(*s)), singles)):
+                    if isinstance(result, Exception):
+                        errors[key] = result
+                    else:
+                        texts[key] = result
+
+    out = []
+    for item, key in zip(items, keys):
+        if key in texts:
+            out.append((texts[key], True))
+        else:
+            out.append((unavailable_explanation(*item, errors.get(key, "no reply")), False))
+    return out
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+# Recency is refreshed at most this often per entry, so most hits are pure reads
+TOUCH_INTERVAL = 60.0
+
+
+class ExplanationCache:
+    """
+    SQLite-backed cache of generated explanation text, keyed by the normalized
+    prompt fingerprint (band + bucketed drivers, see explain.prompt_inputs).
+    Survives restarts; entries expire after `ttl_seconds` and the least
+    recently used ones are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, path: str, max_entries: int = 50000, ttl_seconds: float = 30 * 86400, enabled: bool = True):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.writes = 0
+
+    @staticmethod
+    def key_for(inputs: dict) -> str:
+        canonical = json.dumps(inputs, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; autocommit, WAL so readers never wait on the writer
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._lock:
+                if not self._schema_ready:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS explanation_cache ("
+                        " key TEXT PRIMARY KEY, text TEXT NOT NULL,"
+                        " created_at REAL NOT NULL, last_used REAL NOT NULL)"
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS ix_explanation_cache_last_used ON explanation_cache (last_used)")
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        if not self.enabled:
+            return None
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute("SELECT text, created_at, last_used FROM explanation_cache WHERE key = ?", (key,)).fetchone()
+        if row is not None and row[1] < now - self.ttl_seconds:
+            conn.execute("DELETE FROM explanation_cache WHERE key = ?", (key,))
+            with self._lock:
+                self.expirations += 1
+            row = None
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        if row[2] < now - TOUCH_INTERVAL:
+            conn.execute("UPDATE explanation_cache SET last_used = ? WHERE key = ?", (now, key))
+        with self._lock:
+            self.hits += 1
+        return row[0]
+
+    def put(self, key: str, text: str):
+        if not self.enabled:
+            return
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO explanation_cache (key, text, created_at, last_used) VALUES (?, ?, ?, ?)",
+            (key, text, now, now),
+        )
+        # Expired rows first, then least recently used beyond the size cap
+        expired = conn.execute("DELETE FROM explanation_cache WHERE created_at < ?", (now - self.ttl_seconds,)).rowcount
+        evicted = conn.execute(
+            "DELETE FROM explanation_cache WHERE key IN ("
+            " SELECT key FROM explanation_cache ORDER BY last_used"
+            " LIMIT max(0, (SELECT COUNT(*) FROM explanation_cache) - ?))",
+            (self.max_entries,),
+        ).rowcount
+        with self._lock:
+            self.writes += 1
+            self.expirations += expired
+            self.evictions += evicted
+
+    def clear(self):
+        self._conn().execute("DELETE FROM explanation_cache")
+
+    def stats(self) -> dict:
+        size = self._conn().execute("SELECT COUNT(*) FROM explanation_cache").fetchone()[0] if self.enabled else 0
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "path": self.path,
+                "size": size,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "writes": self.writes,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,239 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import update
+
+from app import explain
+from app.config import EXPLAIN_WORKERS, SHARDING_ENABLED
+from app.db import SessionLocal, Customer, Prediction
+from app.local_explain import explain_locally
+from app.journal import prediction_journal
+from app.shards import tenant_router, tenant_session
+
+log = logging.getLogger(__name__)
+
+# Prediction.explanation_status values; NULL rows predate background explanations (ready)
+PENDING, READY, FALLBACK = "pending", "ready", "fallback"
+UNSAVED_IDS_KEPT = 100  # newest prediction ids whose explanation could not be stored, listed in stats()
+
+
+class ExplanationStream:
+    """Text deltas of one explanation as they are generated, readable by any number of subscribers."""
+
+    def __init__(self):
+        self.parts = []
+        self.done = False
+        self.status = PENDING
+        self.text = None
+        self._cond = threading.Condition()
+
+    def push(self, delta: str):
+        with self._cond:
+            self.parts.append(delta)
+            self._cond.notify_all()
+
+    def finish(self, status: str, text: str):
+        with self._cond:
+            self.status, self.text, self.done = status, text, True
+            self._cond.notify_all()
+
+    def follow(self, timeout: float = None):
+        """Yield deltas from the start until finished; `timeout` bounds each wait for the next one."""
+        i = 0
+        while True:
+            with self._cond:
+                if i >= len(self.parts) and not self.done:
+                    if not self._cond.wait(timeout):
+                        raise TimeoutError("no explanation output within timeout")
+                new, i = self.parts[i:], len(self.parts)
+                done = self.done
+            yield from new
+            if done and i >= len(self.parts):
+                return
+
+
+class ExplanationWorker:
+    """
+    Generates LLM explanations off the request path. /predict stores the
+    prediction with a template explanation and status "pending", then submits
+    a job here; the job streams the LLM output (observable via `stream()` for
+    SSE) and writes the final text and status back to the prediction row.
+    No DB session is held while waiting on the LLM.
+    """
+
+    def __init__(self, workers: int = EXPLAIN_WORKERS):
+        self.workers = max(1, workers)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._streams = {}  # prediction_id -> ExplanationStream, while in flight
+        self.submitted = 0
+        self.completed = 0
+        self.fallbacks = 0
+        self.unsaved = 0  # explanations for rows the journal dropped or had not written in time
+        self._unsaved_ids = deque(maxlen=UNSAVED_IDS_KEPT)
+        self._total_seconds = 0.0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="explain")
+            return self._executor
+
+    def submit(self, prediction_id: str, details: dict, risk_score: float, top_features: dict, refine=None,
+               explainer: str = "llm", customer_id: str = None):
+        """
+        Queue an explanation for `prediction_id` (stored in `customer_id`'s
+        shard). `refine`, if given, runs first and may return better
+        top_features (e.g. exact SHAP) to explain instead.
+        `explainer="local"` rewrites the rule-based text instead of calling the LLM.
+        """
+        stream = ExplanationStream()
+        with self._lock:
+            self._streams[prediction_id] = stream
+            self.submitted += 1
+        self._get_executor().submit(self._run, prediction_id, stream, details, risk_score, top_features, refine,
+                                    explainer, customer_id)
+        return stream
+
+    def submit_many(self, jobs: list, customer_id: str = None):
+        """
+        Queue explanations for many predictions of one customer as one batched
+        job (bulk scoring). `jobs` is [(prediction_id, details, risk_score, top_features)].
+        """
+        streams = [ExplanationStream() for _ in jobs]
+        with self._lock:
+            for (prediction_id, *_), stream in zip(jobs, streams):
+                self._streams[prediction_id] = stream
+            self.submitted += len(jobs)
+        self._get_executor().submit(self._run_many, jobs, streams, customer_id)
+        return streams
+
+    def stream(self, prediction_id: str):
+        """The in-flight stream for a prediction, or None if it is finished (or unknown)."""
+        with self._lock:
+            return self._streams.get(prediction_id)
+
+    def _run(self, prediction_id, stream, details, risk_score, top_features, refine, explainer="llm",
+             customer_id=None):
+        t0 = time.perf_counter()
+        try:
+            if refine is not None:
+                top_features = refine() or top_features
+            if explainer == "local":
+                deltas = [explain_locally(details, risk_score, top_features)]
+            else:
+                deltas = explain.stream_explanation(details, risk_score, top_features)
+            parts = []
+            for delta in deltas:
+                parts.append(delta)
+                stream.push(delta)
+            text, status = "".join(parts).strip(), READY
+            if not text:
+                raise ValueError("empty completion")
+        except Exception as e:
+            text, status = explain.unavailable_explanation(details, risk_score, top_features, e), FALLBACK
+
+        try:
+            # A write-behind prediction may still be queued: update the row once it exists
+            if prediction_journal.wait_written(prediction_id):
+                db = tenant_session(customer_id)
+                try:
+                    pred = db.get(Prediction, prediction_id)
+                    if pred is not None:
+                        pred.explanation = text
+                        pred.explanation_status = status
+                        db.commit()
+                finally:
+                    db.close()
+            else:
+                reason = prediction_journal.dropped(prediction_id) or "still queued"
+                log.warning("explanation for prediction %s not stored: %s", prediction_id, reason)
+                with self._lock:
+                    self.unsaved += 1
+                    self._unsaved_ids.append(prediction_id)
+        finally:
+            # Subscribers are told only after the row is written, so a follow-up poll agrees
+            stream.finish(status, text)
+            with self._lock:
+                self._streams.pop(prediction_id, None)
+                self.completed += 1
+                self.fallbacks += status == FALLBACK
+                self._total_seconds += time.perf_counter() - t0
+
+    def _run_many(self, jobs: list, streams: list, customer_id: str = None):
+        t0 = time.perf_counter()
+        try:
+            results = explain.explain_many([job[1:] for job in jobs])
+        except Exception as e:
+            results = [(explain.unavailable_explanation(*job[1:], e), False) for job in jobs]
+        statuses = [READY if ok else FALLBACK for _, ok in results]
+
+        try:
+            db = tenant_session(customer_id)
+            try:
+                # One bulk UPDATE by primary key for the whole batch
+                db.execute(update(Prediction), [
+                    {"id": prediction_id, "explanation": text, "explanation_status": status}
+                    for (prediction_id, *_), (text, _), status in zip(jobs, results, statuses)
+                ])
+                db.commit()
+            finally:
+                db.close()
+        finally:
+            elapsed = time.perf_counter() - t0
+            for (prediction_id, *_), stream, (text, _), status in zip(jobs, streams, results, statuses):
+                stream.push(text)
+                stream.finish(status, text)
+            with self._lock:
+                for prediction_id, *_ in jobs:
+                    self._streams.pop(prediction_id, None)
+                self.completed += len(jobs)
+                self.fallbacks += statuses.count(FALLBACK)
+                self._total_seconds += elapsed * len(jobs)
+
+    def recover_pending(self) -> int:
+        """Rows left "pending" by a previous process keep their template text; mark them as fallback."""
+        db = SessionLocal()
+        try:
+            customer_ids = [c for (c,) in db.query(Customer.id)] if SHARDING_ENABLED else []
+        finally:
+            db.close()
+
+        n = 0
+        for customer_id in [None] + tenant_router.existing_customers(customer_ids):
+            db = tenant_session(customer_id)
+            try:
+                n += (
+                    db.query(Prediction)
+                    .filter(Prediction.explanation_status == PENDING)
+                    .update({Prediction.explanation_status: FALLBACK}, synchronize_session=False)
+                )
+                db.commit()
+            finally:
+                db.close()
+        return n
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "in_flight": len(self._streams),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "fallbacks": self.fallbacks,
+                "unsaved": self.unsaved,
+                "unsaved_ids": list(self._unsaved_ids),
+                "mean_seconds": self._total_seconds / self.completed if self.completed else 0.0,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+explanation_worker = ExplanationWorker()
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+MISSING_CATEGORY = "missing"
+CATEGORY_SEPARATOR = "\x1f"  # joins a row's categorical values (cache keys, packed feature-store rows)
+
+FEATURE_NAMES_PATH = "models/feature_names.json"
+CAT_FEATURES_PATH = "models/cat_features.json"
+
+# Fallback when models/cat_features.json is absent
+DEFAULT_CAT_FEATURES = [
+    "race", "gender", "weight", "payer_code", "medical_specialty",
+    "diag_1", "diag_2", "diag_3", "max_glu_serum", "A1Cresult",
+    "metformin", "repaglinide", "nateglinide", "chlorpropamide",
+    "glimepiride", "acetohexamide", "glipizide", "glyburide",
+    "tolbutamide", "pioglitazone", "rosiglitazone", "acarbose",
+    "miglitol", "troglitazone", "tolazamide", "examide",
+    "citoglipton", "insulin", "glyburide_metformin",
+    "glipizide_metformin", "glimepiride_pioglitazone",
+    "metformin_rosiglitazone", "metformin_pioglitazone",
+    "change", "diabetesMed"
+]
+
+
+def load_json(path, default=None):
+    if default is not None and not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def feature_aliases(name: str) -> tuple:
+    """
+    Spellings accepted for a model feature. feature_names.json uses hyphens for
+    combination drugs (glyburide-metformin) while the API and DRUG_FIELDS use
+    underscores (glyburide_metformin); both resolve to the same column.
+    """
+    alt = name.replace("-", "_")
+    return (name, alt) if alt != name else (name,)
+
+
+def to_category(val) -> str:
+    """Missing categorical features → "missing"; CATEGORY_SEPARATOR is dropped so joined rows split back exactly."""
+    return str(val).replace(CATEGORY_SEPARATOR, "") if val is not None and val == val else MISSING_CATEGORY
+
+
+def to_float(val) -> float:
+    """Missing or malformed numeric features → np.nan."""
+    if val is None:
+        return np.nan
+    try:
+        return float(val)
+    except (ValueError, TypeError):
+        return np.nan
+
+
+def _getter(aliases: tuple):
+    if len(aliases) == 1:
+        key = aliases[0]
+        return lambda row: row.get(key)
+    first, second = aliases
+
+    def get(row):
+        val = row.get(first)
+        return row.get(second) if val is None else val
+    return get
+
+
+class FeaturePlan:
+    """
+    Feature layout compiled once from feature_names.json / cat_features.json:
+    column order, categorical vs numeric index arrays, per-column getters that
+    reconcile alias spellings, and the coercion for each column. Turning
+    patient dicts into model input is then a flat loop with no pandas.
+    """
+
+    def __init__(self, feature_names: list, cat_features: list):
+        self.feature_names = list(feature_names)
+        cat_set = frozenset(cat_features)
+        self.cat_indices = np.array([i for i, f in enumerate(self.feature_names) if f in cat_set], dtype=np.intp)
+        self.num_indices = np.array([i for i, f in enumerate(self.feature_names) if f not in cat_set], dtype=np.intp)
+        self.cat_names = [self.feature_names[i] for i in self.cat_indices]
+        self.num_names = [self.feature_names[i] for i in self.num_indices]
+
+        self._aliases = [feature_aliases(f) for f in self.feature_names]
+        self._cat_getters = [_getter(self._aliases[i]) for i in self.cat_indices]
+        self._num_getters = [_getter(self._aliases[i]) for i in self.num_indices]
+
+        # alias spelling -> column index
+        self.index_of = {a: i for i, aliases in enumerate(self._aliases) for a in aliases}
+
+        # Feature-store columns (API spelling, underscores) and a tag for this layout
+        self.column_names = [aliases[-1] for aliases in self._aliases]
+        self.num_columns = [self.column_names[i] for i in self.num_indices]
+        self.cat_columns = [self.column_names[i] for i in self.cat_indices]
+        self.layout = hashlib.blake2b(
+            json.dumps([self.num_names, self.cat_names]).encode(), digest_size=8
+        ).hexdigest()
+
+    def to_arrays(self, rows):
+        """
+        One dict or a list of dicts → (numeric float32 [n, n_num],
+        categorical object [n, n_cat]).
+        """
+        if isinstance(rows, dict):
+            rows = [rows]
+        num_getters, cat_getters = self._num_getters, self._cat_getters
+        num = np.array([[to_float(g(r)) for g in num_getters] for r in rows], dtype=np.float32)
+        cat = np.array([[to_category(g(r)) for g in cat_getters] for r in rows], dtype=object)
+        return num.reshape(len(rows), len(num_getters)), cat.reshape(len(rows), len(cat_getters))
+
+    def to_columns(self, row: dict) -> dict:
+        """
+        One patient's feature-store values: a typed column per feature (NaN
+        stored as NULL) plus the vectorized row packed for batch reads.
+        """
+        num, cat = self.to_arrays(row)
+        values = {c: (None if v != v else float(v)) for c, v in zip(self.num_columns, num[0])}
+        values.update(zip(self.cat_columns, cat[0]))
+        values["num_vector"] = num[0].astype("<f4").tobytes()
+        values["cat_vector"] = CATEGORY_SEPARATOR.join(cat[0])
+        return values
+
+    def unpack(self, num_vectors: list, cat_vectors: list) -> tuple:
+        """
+        Packed rows → the (numeric, categorical) arrays to_arrays() builds from
+        dicts: one frombuffer for the numerics, one split for all categoricals.
+        """
+        n, n_cat = len(num_vectors), len(self.cat_columns)
+        num = np.frombuffer(b"".join(num_vectors), dtype="<f4").astype(np.float32).reshape(n, len(self.num_columns))
+        if not n or not n_cat:
+            return num, np.empty((n, n_cat), dtype=object)
+        cat = np.array(CATEGORY_SEPARATOR.join(cat_vectors).split(CATEGORY_SEPARATOR), dtype=object)
+        return num, cat.reshape(n, n_cat)
+
+    def to_pool(self, rows):
+        return self.pool_from_arrays(*self.to_arrays(rows))
+
+    def pool_from_arrays(self, num, cat):
+        from catboost import FeaturesData, Pool  # deferred: heavy import
+
+        return Pool(FeaturesData(
+            num_feature_data=num,
+            cat_feature_data=cat,
+            num_feature_names=self.num_names,
+            cat_feature_names=self.cat_names,
+        ))
+
+    @staticmethod
+    def row_key(num_row, cat_row) -> bytes:
+        """Canonical digest of one vectorized row."""
+        h = hashlib.blake2b(num_row.tobytes(), digest_size=16)
+        h.update(CATEGORY_SEPARATOR.join(cat_row).encode())
+        return h.digest()
+
+    def present(self, num_row, cat_row) -> list:
+        """(column index, column name) for each feature with a value in a vectorized row."""
+        out = [(int(i), self.column_names[i]) for i, v in zip(self.num_indices, num_row) if v == v]
+        out += [(int(i), self.column_names[i]) for i, v in zip(self.cat_indices, cat_row) if v != MISSING_CATEGORY]
+        return sorted(out)
+
+    def provided(self, row: dict) -> list:
+        """(column index, key as spelled by the caller) for each model feature present in `row`."""
+        out = []
+        for i, aliases in enumerate(self._aliases):
+            for a in aliases:
+                if a in row:
+                    out.append((i, a))
+                    break
+        return out
+
+
+def load_feature_plan(feature_names_path=FEATURE_NAMES_PATH, cat_features_path=CAT_FEATURES_PATH) -> FeaturePlan:
+    return FeaturePlan(load_json(feature_names_path), load_json(cat_features_path, DEFAULT_CAT_FEATURES))
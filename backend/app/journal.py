@@ -0,0 +1,266 @@
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from sqlalchemy import insert
+
+from app.config import JOURNAL_BATCH_SIZE, JOURNAL_MAX_QUEUE, JOURNAL_MAX_WAIT_MS, JOURNAL_WAIT_S
+from app.contributions import insert_feature_schemas, schema_rows
+from app.db import Nudge, Prediction
+from app.shards import tenant_session
+
+log = logging.getLogger(__name__)
+
+DROPPED_IDS_KEPT = 100  # newest dropped prediction ids remembered for dropped() and stats()
+
+
+class JournalFull(Exception):
+    """The write-behind queue is at capacity (or shutting down); the caller should retry later."""
+
+
+class JournalEntry:
+    __slots__ = ("customer_id", "prediction", "nudges")
+
+    def __init__(self, customer_id: str, prediction: dict, nudges: list):
+        self.customer_id = customer_id
+        self.prediction = prediction  # Prediction column values
+        self.nudges = nudges  # Nudge column values
+
+    @property
+    def key(self):
+        return self.customer_id, self.prediction["patient_id"]
+
+
+class PredictionJournal:
+    """
+    Write-behind queue for /predict rows.
+
+    append() registers a prediction (and its nudges) as pending and queues it
+    without touching the database. A background thread takes up to
+    `max_batch_size` entries, or whatever arrived within `max_wait_ms`, and
+    commits them in one transaction per customer shard. Until that commit,
+    get()/latest()/pending() serve the queued rows so reads see them.
+
+    The queue is bounded: append() raises JournalFull rather than blocking
+    the event loop. close() stops intake and flushes what is queued. An entry
+    that still fails on its own after a failed batch is dropped: it is
+    logged and its id is kept for dropped() and stats().
+    """
+
+    def __init__(self, session_for=tenant_session, max_queue: int = JOURNAL_MAX_QUEUE,
+                 max_batch_size: int = JOURNAL_BATCH_SIZE, max_wait_ms: float = JOURNAL_MAX_WAIT_MS):
+        self.session_for = session_for
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self._queue = queue.Queue(maxsize=max(1, max_queue))
+        self._lock = threading.Lock()
+        self._flushed = threading.Condition(self._lock)
+        self._pending = {}  # prediction_id -> entry
+        self._by_patient = defaultdict(list)  # (customer_id, patient_id) -> entries, in append order
+        self._closing = threading.Event()
+        self._thread = None
+
+        # Metrics
+        self._appended = 0
+        self._written = 0
+        self._batches = 0
+        self._transactions = 0
+        self._rejected = 0
+        self._failed = 0
+        self._dropped = OrderedDict()  # prediction_id -> error, newest last
+        self._last_error = None
+        self._peak_queue_depth = 0
+        self._flush_seconds = 0.0
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="prediction-journal", daemon=True)
+                self._thread.start()
+
+    def append(self, customer_id: str, prediction: dict, nudges: list):
+        if self._closing.is_set():
+            raise JournalFull("shutting down")
+        self._ensure_started()
+        entry = JournalEntry(customer_id, prediction, nudges)
+        with self._lock:
+            # Visible to reads before the writer can pick it up
+            self._pending[prediction["id"]] = entry
+            self._by_patient[entry.key].append(entry)
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                self._forget(entry)
+                self._rejected += 1
+                raise JournalFull(f"{self._queue.maxsize} predictions waiting to be written")
+            self._appended += 1
+            self._peak_queue_depth = max(self._peak_queue_depth, self._queue.qsize())
+
+    def _forget(self, entry: JournalEntry):
+        self._pending.pop(entry.prediction["id"], None)
+        entries = self._by_patient.get(entry.key)
+        if entries is not None:
+            entries.remove(entry)
+            if not entries:
+                del self._by_patient[entry.key]
+
+    # --- reads of rows not yet committed ---
+    def get(self, prediction_id: str):
+        with self._lock:
+            return self._pending.get(prediction_id)
+
+    def latest(self, customer_id: str, patient_id: str):
+        """The newest queued entry for the patient, or None."""
+        with self._lock:
+            entries = self._by_patient.get((customer_id, patient_id))
+            return max(entries, key=lambda e: e.prediction["timestamp"]) if entries else None
+
+    def latest_by_patient(self, customer_id: str) -> dict:
+        """patient_id -> newest queued entry, for the customer's patients with queued rows."""
+        with self._lock:
+            return {
+                patient_id: max(entries, key=lambda e: e.prediction["timestamp"])
+                for (cid, patient_id), entries in self._by_patient.items() if cid == customer_id
+            }
+
+    def pending(self, customer_id: str, patient_id: str) -> list:
+        with self._lock:
+            return list(self._by_patient.get((customer_id, patient_id), ()))
+
+    def wait_written(self, prediction_id: str, timeout: float = JOURNAL_WAIT_S) -> bool:
+        """
+        Block until the prediction is out of the queue. True if its row is
+        committed (or it was never queued); False if it was dropped or is
+        still queued after `timeout`.
+        """
+        deadline = time.monotonic() + timeout
+        with self._flushed:
+            while prediction_id in self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._flushed.wait(remaining)
+            return prediction_id not in self._dropped
+
+    def dropped(self, prediction_id: str):
+        """The error that made the writer drop the prediction, or None."""
+        with self._lock:
+            return self._dropped.get(prediction_id)
+
+    # --- writer ---
+    def _collect(self):
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0 or self._closing.is_set():
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch:
+                self._write(batch)
+            elif self._closing.is_set():
+                return
+
+    def _commit(self, customer_id: str, entries: list):
+        db = self.session_for(customer_id)
+        try:
+            rows = [e.prediction for e in entries]
+            schemas = schema_rows(rows)
+            if schemas:
+                db.execute(insert_feature_schemas, schemas)
+            db.execute(insert(Prediction), rows)
+            nudges = [n for e in entries for n in e.nudges]
+            if nudges:
+                db.execute(insert(Nudge), nudges)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _write(self, batch: list):
+        t0 = time.perf_counter()
+        by_customer = defaultdict(list)
+        for entry in batch:
+            by_customer[entry.customer_id].append(entry)
+
+        written, transactions, last_error = 0, 0, None
+        dropped = {}  # prediction_id -> error
+        for customer_id, entries in by_customer.items():
+            try:
+                self._commit(customer_id, entries)
+                written += len(entries)
+                transactions += 1
+            except Exception:
+                # One bad row must not sink the batch: retry entries one by one
+                for entry in entries:
+                    try:
+                        self._commit(customer_id, [entry])
+                        written += 1
+                        transactions += 1
+                    except Exception as e:
+                        last_error = f"{type(e).__name__}: {e}"
+                        dropped[entry.prediction["id"]] = last_error
+        if dropped:
+            log.error("prediction journal dropped %d row(s) %s: %s", len(dropped), sorted(dropped), last_error)
+
+        with self._flushed:
+            for entry in batch:
+                self._forget(entry)
+            self._dropped.update(dropped)
+            while len(self._dropped) > DROPPED_IDS_KEPT:
+                self._dropped.popitem(last=False)
+            self._batches += 1
+            self._written += written
+            self._transactions += transactions
+            self._failed += len(dropped)
+            self._last_error = last_error or self._last_error
+            self._flush_seconds += time.perf_counter() - t0
+            self._flushed.notify_all()
+
+    def close(self, timeout: float = 30.0):
+        """Stop accepting rows and flush the queue."""
+        self._closing.set()
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_queue": self._queue.maxsize,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "queue_depth": self._queue.qsize(),
+                "peak_queue_depth": self._peak_queue_depth,
+                "pending": len(self._pending),
+                "appended": self._appended,
+                "written": self._written,
+                "batches": self._batches,
+                "transactions": self._transactions,
+                "mean_batch_size": self._written / self._batches if self._batches else 0.0,
+                "mean_flush_ms": self._flush_seconds * 1000 / self._batches if self._batches else 0.0,
+                "rejected": self._rejected,
+                "failed": self._failed,
+                "dropped_ids": list(self._dropped),
+                "last_error": self._last_error,
+            }
+
+
+prediction_journal = PredictionJournal()
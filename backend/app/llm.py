@@ -0,0 +1,279 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+
+
+class LLMUnavailable(RuntimeError):
+    """The call was not attempted (breaker open, no free slot) or ran out of time."""
+
+
+class CircuitOpenError(LLMUnavailable):
+    pass
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failed attempts;
+    open -> half_open after `reset_timeout` seconds, letting one trial call
+    through; the trial's outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self.opens = 0
+        self.half_opens = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self.half_opens += 1
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def cancel(self):
+        """The allowed call never reached upstream: free the half-open trial slot."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opens += 1
+                self.state = "open"
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "opens": self.opens,
+                "half_opens": self.half_opens,
+                "rejected": self.rejected,
+                "seconds_until_half_open": (
+                    max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)) if self.state == "open" else None
+                ),
+            }
+
+
+def _is_retryable(e: Exception) -> bool:
+    import openai
+
+    if isinstance(e, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    return isinstance(e, openai.APIStatusError) and e.status_code >= 500
+
+
+def _counts_as_failure(e: Exception) -> bool:
+    """Upstream trouble trips the breaker; a request the API rejected as malformed does not."""
+    import openai
+
+    return not isinstance(e, (openai.BadRequestError, openai.UnprocessableEntityError))
+
+
+class ResilientLLMClient:
+    """
+    OpenAI chat completions behind a bounded httpx connection pool, a cap on
+    in-flight calls, a total deadline per call, retries with full-jitter
+    backoff for transient errors, and a circuit breaker. Failures surface as
+    exceptions quickly so callers can fall back to local text.
+    """
+
+    def __init__(self, max_connections: int = 8, max_in_flight: int = 8, deadline: float = 30.0,
+                 attempt_timeout: float = 10.0, retries: int = 2, backoff_base: float = 0.25,
+                 breaker: CircuitBreaker = None):
+        self.max_connections = max_connections
+        self.max_in_flight = max_in_flight
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._client = None
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.in_flight = 0
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.retried = 0
+        self.saturated = 0
+        self._latencies = deque(maxlen=1024)
+
+    def get_client(self):
+        # Created on first use so importing the app does not pull in openai/httpx/dotenv
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import httpx
+                    from dotenv import load_dotenv
+                    from openai import OpenAI
+
+                    # Load API key from .env; OPENAI_BASE_URL points at any OpenAI-compatible server
+                    load_dotenv()
+                    limits = httpx.Limits(max_connections=self.max_connections,
+                                          max_keepalive_connections=self.max_connections)
+                    self._client = OpenAI(
+                        api_key=os.getenv("OPENAI_API_KEY"),
+                        base_url=os.getenv("OPENAI_BASE_URL") or None,
+                        http_client=httpx.Client(limits=limits, timeout=self.attempt_timeout),
+                        max_retries=0,  # retries are ours, bounded by the deadline
+                        timeout=self.attempt_timeout,
+                    )
+        return self._client
+
+    def _acquire(self, deadline_at: float):
+        if not self.breaker.allow():
+            raise CircuitOpenError("LLM circuit open")
+        if not self._slots.acquire(timeout=max(0.0, deadline_at - time.monotonic())):
+            self.breaker.cancel()
+            with self._lock:
+                self.saturated += 1
+            raise LLMUnavailable(f"more than {self.max_in_flight} LLM calls in flight")
+        with self._lock:
+            self.in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def _attempts(self, deadline_at: float):
+        """Yield (attempt, per-attempt timeout) while retries and the deadline last."""
+        for attempt in range(self.retries + 1):
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise LLMUnavailable("LLM deadline exceeded")
+            yield attempt, min(self.attempt_timeout, remaining)
+
+    def _backoff(self, attempt: int, deadline_at: float) -> bool:
+        """Sleep before the next attempt; False if that would cross the deadline."""
+        delay = random.uniform(0, self.backoff_base * 2 ** attempt)
+        if time.monotonic() + delay >= deadline_at:
+            return False
+        with self._lock:
+            self.retried += 1
+        time.sleep(delay)
+        return True
+
+    def _finish(self, t0: float, ok: bool):
+        with self._lock:
+            self.calls += 1
+            if ok:
+                self.successes += 1
+            else:
+                self.failures += 1
+            self._latencies.append(time.perf_counter() - t0)
+
+    def complete(self, **request) -> str:
+        """Chat completion text for `request` (create() kwargs). Raises on failure."""
+        t0, deadline_at = time.perf_counter(), time.monotonic() + self.deadline
+        ok = False
+        try:
+            for attempt, timeout in self._attempts(deadline_at):
+                self._acquire(deadline_at)
+                try:
+                    response = self.get_client().chat.completions.create(timeout=timeout, **request)
+                except Exception as e:
+                    if _counts_as_failure(e):
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.cancel()  # upstream answered; a half-open trial must not stay taken
+                    if not _is_retryable(e) or attempt == self.retries or not self._backoff(attempt, deadline_at):
+                        raise
+                    continue
+                finally:
+                    self._release()
+                self.breaker.record_success()
+                ok = True
+                return response.choices[0].message.content
+        finally:
+            self._finish(t0, ok)
+
+    def stream(self, **request):
+        """
+        Yield text deltas of a streamed chat completion. Retries happen only
+        before the first delta; the deadline covers the whole stream.
+        """
+        t0, deadline_at = time.perf_counter(), time.monotonic() + self.deadline
+        ok = False
+        try:
+            for attempt, timeout in self._attempts(deadline_at):
+                self._acquire(deadline_at)
+                started = False
+                try:
+                    stream = self.get_client().chat.completions.create(timeout=timeout, stream=True, **request)
+                    with stream:
+                        for chunk in stream:
+                            if time.monotonic() > deadline_at:
+                                raise LLMUnavailable("LLM deadline exceeded")
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                started = True
+                                yield chunk.choices[0].delta.content
+                except GeneratorExit:
+                    # The consumer stopped reading: upstream was fine if it had started answering
+                    if started:
+                        self.breaker.record_success()
+                    else:
+                        self.breaker.cancel()
+                    raise
+                except Exception as e:
+                    if _counts_as_failure(e):
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.cancel()  # upstream answered; a half-open trial must not stay taken
+                    if started or not _is_retryable(e) or attempt == self.retries or not self._backoff(attempt, deadline_at):
+                        raise
+                    continue
+                finally:
+                    self._release()
+                self.breaker.record_success()
+                ok = True
+                return
+        finally:
+            self._finish(t0, ok)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lat = sorted(self._latencies)
+            pct = lambda q: lat[min(len(lat) - 1, int(len(lat) * q))] * 1000 if lat else None
+            return {
+                "breaker": self.breaker.stats(),
+                "max_connections": self.max_connections,
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self.in_flight,
+                "deadline_seconds": self.deadline,
+                "attempt_timeout_seconds": self.attempt_timeout,
+                "calls": self.calls,
+                "successes": self.successes,
+                "failures": self.failures,
+                "retries": self.retried,
+                "saturated": self.saturated,
+                "latency_ms": {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99), "samples": len(lat)},
+            }
@@ -0,0 +1,190 @@
+import json
+import threading
+from typing import Dict
+
+from app.diagnosis_normalizer import DIAGNOSIS_MAP, denormalize_diagnosis, normalize_diagnosis
+from app.features import FEATURE_NAMES_PATH, feature_aliases, to_float
+from app.utils import band_from_score
+
+# |SHAP contribution| (log-odds) at which a driver is called strong / moderate; below is slight
+STRONG_IMPACT = 0.3
+MODERATE_IMPACT = 0.1
+MAX_BULLETS = 4
+MIN_BULLETS = 2
+
+# feature -> (label, why it raises risk, why it lowers risk)
+FEATURE_RULES = {
+    # Demographics / coverage
+    "race": ("Recorded race", "reflects population-level differences in access to follow-up care in the training data", "reflects population-level differences in access to follow-up care in the training data"),
+    "gender": ("Sex", "carries a small population-level difference in readmission rates", "carries a small population-level difference in readmission rates"),
+    "age": ("Age", "older patients have less physiologic reserve and more comorbidity, so recovery after discharge is slower", "the model sees lower-than-average readmission risk at this age"),
+    "weight": ("Weight category", "body weight extremes complicate glycemic control and recovery", "weight in this range is not adding to the patient's risk"),
+    "payer_code": ("Payer", "coverage type is associated with gaps in post-discharge follow-up and medication access", "coverage type is associated with better access to post-discharge follow-up"),
+    "medical_specialty": ("Admitting specialty", "admissions under this service tend to involve sicker or more complex patients", "admissions under this service tend to be more routine"),
+    # Labs
+    "max_glu_serum": ("Max serum glucose", "marked hyperglycemia during the stay signals unstable diabetes control", "glucose stayed in a controlled range during the stay"),
+    "A1Cresult": ("A1C result", "poor long-term glycemic control raises the chance of decompensation after discharge", "long-term glycemic control is adequate or was checked"),
+    # Encounter
+    "change": ("Diabetes medication change", "a regimen change near discharge needs close follow-up to avoid dosing errors", "a stable regimen lowers the risk of post-discharge medication problems"),
+    "diabetesMed": ("On diabetes medication", "drug-treated diabetes indicates more advanced disease that needs monitoring", "diabetes that does not need medication is less likely to destabilize"),
+    "admission_type_id": ("Admission type", "unplanned admissions reflect acute illness that often recurs", "planned admissions carry less acute illness"),
+    "admission_source_id": ("Admission source", "arriving via the emergency department or a transfer points to acute or complex illness", "a referral admission points to less acute illness"),
+    "time_in_hospital": ("Length of stay", "a longer stay reflects more severe or complicated illness and a harder transition home", "a short stay suggests an uncomplicated course"),
+    "num_lab_procedures": ("Lab tests this stay", "heavy lab testing reflects diagnostic uncertainty or physiologic instability", "limited lab testing suggests a stable course"),
+    "num_procedures": ("Procedures this stay", "procedures add recovery needs and complication risk after discharge", "few procedures means fewer complications to manage at home"),
+    "num_medications": ("Active medications", "a high medication burden raises the risk of adverse events and non-adherence", "a manageable medication list lowers the risk of adverse drug events"),
+    "number_outpatient": ("Outpatient visits in the past year", "frequent outpatient care marks chronic conditions that need ongoing management", "regular outpatient contact supports follow-up after discharge"),
+    "number_emergency": ("ER visits in the past year", "repeated emergency visits show unstable disease and gaps in outpatient care", "few emergency visits suggest conditions are controlled between admissions"),
+    "number_inpatient": ("Inpatient admissions in the past year", "prior admissions are among the strongest predictors of another readmission", "no recent pattern of repeat hospitalization"),
+    "number_diagnoses": ("Recorded diagnoses", "multimorbidity complicates care coordination after discharge", "fewer active diagnoses keep post-discharge care simpler"),
+}
+
+# Diabetes drugs by class; (label suffix, why use raises risk, why use/non-use lowers it)
+_DRUG_CLASSES = {
+    "biguanide": (("metformin",), "first-line therapy, but use alongside other drivers flags diabetes needing active management", "first-line therapy associated with stable outpatient diabetes control"),
+    "sulfonylurea": (("chlorpropamide", "glimepiride", "acetohexamide", "glipizide", "glyburide", "tolbutamide", "tolazamide"), "carries a risk of hypoglycemia, especially with reduced intake after discharge", "no added hypoglycemia risk from this agent"),
+    "meglitinide": (("repaglinide", "nateglinide"), "short-acting secretagogue with hypoglycemia risk if meals are irregular", "no added hypoglycemia risk from this agent"),
+    "thiazolidinedione": (("pioglitazone", "rosiglitazone", "troglitazone"), "can cause fluid retention and worsen heart failure", "no added fluid-retention risk from this agent"),
+    "alpha-glucosidase inhibitor": (("acarbose", "miglitol"), "gastrointestinal side effects can limit adherence", "no added adherence burden from this agent"),
+    "insulin": (("insulin",), "insulin-treated diabetes is harder to manage at home and dosing errors cause hypoglycemia", "not needing insulin indicates less advanced diabetes"),
+    "combination therapy": (("glyburide-metformin", "glipizide-metformin", "glimepiride-pioglitazone", "metformin-rosiglitazone", "metformin-pioglitazone"), "needing combination therapy indicates diabetes that is harder to control", "no combination regimen to manage at home"),
+    "other diabetes agent": (("examide", "citoglipton"), "an uncommon diabetes agent warrants medication review at discharge", "no added regimen complexity from this agent"),
+}
+for _cls, (_drugs, _up, _down) in _DRUG_CLASSES.items():
+    for _drug in _drugs:
+        FEATURE_RULES[_drug] = (f"{_drug.capitalize()} ({_cls})", _up, _down)
+
+# Diagnosis groups, mirroring the sections of DIAGNOSIS_MAP: (terms, why it raises risk, why it lowers it)
+DIAGNOSIS_GROUPS = {
+    "metabolic/endocrine": (("diabetes", "type 1 diabetes", "type 2 diabetes", "obesity", "hyperlipidemia", "hypothyroidism", "hyperthyroidism"), "metabolic disease destabilizes easily with changes in diet, activity and medication after discharge", "this metabolic condition is usually well managed in outpatient care"),
+    "cardiovascular": (("hypertension", "high blood pressure", "congestive heart failure", "heart failure", "coronary artery disease", "myocardial infarction", "heart attack", "angina", "cardiac arrhythmia", "atrial fibrillation", "stroke", "transient ischemic attack", "peripheral vascular disease"), "cardiovascular disease, heart failure above all, frequently decompensates in the weeks after discharge", "this cardiovascular condition is stable enough to be managed as an outpatient"),
+    "respiratory": (("asthma", "chronic obstructive pulmonary disease", "copd", "pneumonia", "respiratory failure"), "respiratory illness relapses easily, especially with incomplete recovery or poor inhaler technique", "this respiratory condition tends to resolve without readmission"),
+    "renal": (("chronic kidney disease", "acute kidney failure", "end stage renal disease", "urinary tract infection"), "impaired kidney function complicates fluid balance and drug dosing after discharge", "this renal or urinary condition usually resolves with outpatient treatment"),
+    "hematologic": (("anemia", "iron deficiency anemia", "leukemia"), "blood disorders limit recovery and may need transfusion or specialist follow-up", "this blood disorder is mild enough not to add to the risk"),
+    "neurologic": (("dementia", "alzheimers", "parkinson's disease", "epilepsy"), "neurologic and cognitive impairment makes self-care and medication adherence at home harder", "this neurologic condition is not adding to the risk of readmission"),
+    "musculoskeletal": (("osteoarthritis", "arthritis", "rheumatoid arthritis", "fracture of femur", "hip fracture", "osteoporosis"), "reduced mobility raises the risk of falls and complications during recovery", "this musculoskeletal condition is typically managed without readmission"),
+    "infectious": (("sepsis", "septicemia", "hiv", "tuberculosis", "influenza"), "serious infection can recur or leave the patient deconditioned after discharge", "this infection is usually cleared before discharge"),
+    "gastrointestinal": (("cirrhosis", "hepatitis", "gastrointestinal bleed", "peptic ulcer", "cholelithiasis"), "gastrointestinal and liver disease often rebleeds or decompensates after discharge", "this gastrointestinal condition usually resolves with treatment"),
+    "cancer": (("lung cancer", "breast cancer", "colon cancer", "prostate cancer", "pancreatic cancer"), "active cancer and its treatment cause complications that bring patients back", "this cancer diagnosis is not adding to the short-term risk"),
+    "psychiatric": (("depression", "major depressive disorder", "bipolar disorder", "schizophrenia", "anxiety", "substance abuse", "alcohol dependence"), "mental illness and substance use reduce adherence and engagement with follow-up", "this psychiatric condition is not adding to the risk of readmission"),
+    "other": (("complications of device", "injury", "pregnancy complications"), "complications of this kind frequently need further inpatient care", "this condition is not adding to the risk of readmission"),
+}
+
+# ICD-9 chapters for codes outside DIAGNOSIS_MAP: (first code, last code, group)
+ICD9_CHAPTERS = (
+    (1, 139, "infectious"), (140, 239, "cancer"), (240, 279, "metabolic/endocrine"),
+    (280, 289, "hematologic"), (290, 319, "psychiatric"), (320, 389, "neurologic"),
+    (390, 459, "cardiovascular"), (460, 519, "respiratory"), (520, 579, "gastrointestinal"),
+    (580, 629, "renal"), (710, 739, "musculoskeletal"),
+)
+DIAGNOSIS_FEATURES = ("diag_1", "diag_2", "diag_3")
+_DIAGNOSIS_LABELS = {"diag_1": "Primary diagnosis", "diag_2": "Secondary diagnosis", "diag_3": "Additional diagnosis"}
+
+# UCI diabetes dataset id mappings
+ADMISSION_TYPES = {"1": "emergency", "2": "urgent", "3": "elective", "4": "newborn", "7": "trauma center"}
+ADMISSION_SOURCES = {"1": "physician referral", "2": "clinic referral", "3": "HMO referral",
+                     "4": "transfer from a hospital", "5": "transfer from a skilled nursing facility",
+                     "6": "transfer from another facility", "7": "emergency room", "8": "court/law enforcement"}
+
+
+def _strength(impact: float) -> str:
+    if impact >= STRONG_IMPACT:
+        return "strongly"
+    if impact >= MODERATE_IMPACT:
+        return "moderately"
+    return "slightly"
+
+
+class LocalExplainer:
+    """
+    Deterministic clinician bullets from SHAP direction and magnitude, with no
+    network call. The rule table is compiled once per feature layout: every
+    model feature (under each alias spelling) resolves to its label and
+    reasons, and every ICD code in DIAGNOSIS_MAP to its diagnosis group.
+    """
+
+    def __init__(self, feature_names: list):
+        missing = [f for f in feature_names if f not in FEATURE_RULES and f not in DIAGNOSIS_FEATURES]
+        if missing:
+            raise KeyError(f"no explanation rule for features {missing}")
+        self.feature_names = list(feature_names)
+        self._rules = {}
+        for feat, rule in FEATURE_RULES.items():
+            for alias in feature_aliases(feat):
+                self._rules[alias] = rule
+
+        term_group = {term: group for group, (terms, _, _) in DIAGNOSIS_GROUPS.items() for term in terms}
+        missing = [term for term in DIAGNOSIS_MAP if term not in term_group]
+        if missing:
+            raise KeyError(f"no diagnosis group for {missing}")
+        self._icd_group = {code: term_group[term] for term, code in DIAGNOSIS_MAP.items()}
+
+    def diagnosis_group(self, code: str) -> str:
+        """Group of an ICD-9 code (or free-text diagnosis): DIAGNOSIS_MAP first, then the ICD-9 chapter."""
+        code = normalize_diagnosis(str(code).strip())
+        group = self._icd_group.get(code)
+        if group is not None:
+            return group
+        num = to_float(code.split(".")[0])
+        if num == num:
+            for lo, hi, chapter_group in ICD9_CHAPTERS:
+                if lo <= num <= hi:
+                    return chapter_group
+        return "other"
+
+    def _value_text(self, feat: str, val) -> str:
+        val = str(val)
+        codes = ADMISSION_TYPES if feat == "admission_type_id" else ADMISSION_SOURCES if feat == "admission_source_id" else None
+        if codes is None:
+            return val
+        # Ids arrive as 1, "1" or (from float columns and CSV imports) 1.0 / "1.0"
+        number = to_float(val)
+        key = str(int(number)) if number.is_integer() else val
+        return codes.get(key, val)
+
+    def bullet(self, feat: str, val, contrib: float) -> str:
+        direction = "raises" if contrib > 0 else "lowers"
+        strength = _strength(abs(contrib))
+        if feat in DIAGNOSIS_FEATURES:
+            group = self.diagnosis_group(val)
+            _, up, down = DIAGNOSIS_GROUPS[group]
+            finding = f"{_DIAGNOSIS_LABELS[feat]}: {denormalize_diagnosis(normalize_diagnosis(str(val)))} ({group})"
+        else:
+            label, up, down = self._rules.get(feat, (feat, "the model associates this value with readmission", "the model associates this value with a lower readmission rate"))
+            finding = f"{label}: {self._value_text(feat, val)}"
+        return f"- {finding} — {strength} {direction} risk: {up if contrib > 0 else down}."
+
+    def explain(self, input_dict: dict, risk_score: float, top_features: Dict[str, float] = None) -> str:
+        """2–4 bullets for the largest drivers with a known value; padded with a summary line if fewer."""
+        bullets = []
+        for feat, contrib in sorted((top_features or {}).items(), key=lambda x: abs(x[1]), reverse=True):
+            val = input_dict.get(feat)
+            if not contrib or val is None or val == "None" or val == "":
+                continue
+            bullets.append(self.bullet(feat, val, float(contrib)))
+            if len(bullets) == MAX_BULLETS:
+                break
+        if len(bullets) < MIN_BULLETS:
+            band = band_from_score(risk_score)
+            bullets.append(f"- Overall readmission risk is {band} (score {risk_score:.2f}); "
+                           f"no other single factor stands out in the available data.")
+        return "\n".join(bullets)
+
+
+_local_explainer = None
+_local_explainer_lock = threading.Lock()
+
+
+def get_local_explainer() -> LocalExplainer:
+    """Shared LocalExplainer for the model's feature layout, compiled on first use."""
+    global _local_explainer
+    if _local_explainer is None:
+        with _local_explainer_lock:
+            if _local_explainer is None:
+                with open(FEATURE_NAMES_PATH) as f:
+                    _local_explainer = LocalExplainer(json.load(f))
+    return _local_explainer
+
+
+def explain_locally(input_dict: dict, risk_score: float, top_features: Dict[str, float] = None) -> str:
+    return get_local_explainer().explain(input_dict, risk_score, top_features)
@@ -1,17 +1,48 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import base64
+import re
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+import json
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
+from typing import Optional
 from datetime import datetime
 import uuid
+from sqlalchemy import distinct, func, insert, or_, select, tuple_
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from app.diagnosis_normalizer import normalize_diagnosis, normalize_all_diagnoses, denormalize_all_diagnoses
 
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.db import SessionLocal, Customer, Patient, Prediction, Nudge
-from app.ml import run_ml_model
+from app.db import (
+    engine, async_engine, get_db, init_schema,
+    Customer, CustomerRiskRollup, Patient, PatientLatestRisk, Prediction, Nudge, upsert_patient_features, patient_features_row, load_feature_matrix,
+)
+from app.shards import tenant_router, tenant_async_session, tenant_session, get_tenant_db
+from app.ml import (
+    submit_ml_model, score_many, score_matrix, prediction_batcher, inference_pool,
+    loaded_engine, loaded_cascade, start_warm_up, engine_status, serving_model_versions,
+    EXPLAIN_TIERS,
+)
+from app.config import (
+    EXPLAIN_TIER, BULK_EXPLAIN_TIER, EXPLAIN_TIMEOUT, EXPLAINER, SHARDING_ENABLED, WRITE_BEHIND, CASCADE_ENABLED,
+    PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT,
+)
+from app.registry import model_registry
 from app.nudges import generate_nudges
-from app.explain import explain_with_openai
-from app.utils import demo_rescale, demo_adjust, band_from_score
+from app.explanations import explanation_worker, PENDING, READY, FALLBACK
+from app.journal import prediction_journal, JournalFull
+from app.explain import explanation_cache, llm_client, batch_stats as explain_batch_stats
+from app.local_explain import explain_locally
+from app.archive import cold_parts_query, read_cold_history
+from app.contributions import (
+    pack_rows, schema_rows, insert_feature_schemas, unpack, cached_schema, remember_schema, schema_query,
+)
+from app.utils import demo_rescale, demo_adjust, band_from_score, details_fingerprint
 
 app = FastAPI(title="Readmission Backend", version="1.0.0")
 
@@ -22,6 +53,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # keyset pagination
 )
 
 # -----------------------------
@@ -33,16 +65,27 @@ class MultiFieldUpdate(BaseModel):
 
 class PredictRequest(BaseModel):
     input: dict
+    force: bool = False  # re-score even if details are unchanged since the last prediction
+    explain: Optional[str] = Field(None, pattern="^(exact|fast|none)$")  # defaults to READM_EXPLAIN_TIER
+    explainer: Optional[str] = Field(None, pattern="^(llm|local)$")  # defaults to the customer's, then READM_EXPLAINER
 
 class CustomerRequest(BaseModel):
     id: str = Field(..., min_length=1)
     name: str = Field(..., min_length=1)
+    explainer: Optional[str] = Field(None, pattern="^(llm|local)$")
+
+class CustomerSettings(BaseModel):
+    explainer: Optional[str] = Field(None, pattern="^(llm|local)$")  # null -> READM_EXPLAINER
 
 class StatusUpdate(BaseModel):
     status: str = Field(..., pattern="^(discharged|not_discharged)$")
 
+class ModelReloadRequest(BaseModel):
+    version: str = Field(..., min_length=1)  # artifact name (catboost_tuned) or full version
+
 class ChatbotRequest(BaseModel):
     patient_id: str
+    customer_id: Optional[str] = None  # required when READM_SHARDING_ENABLED=1
     hypothetical_change: str
 
 # -----------------------------
@@ -61,7 +104,8 @@ def normalize_drugs(details: dict) -> dict:
     """Normalize drug fields: Steady/Up/Down -> Yes, No stays No"""
     out = {}
     for k, v in details.items():
-        if k in DRUG_FIELDS:
+        # feature_names.json spells combination drugs with hyphens
+        if k in DRUG_FIELDS or k.replace("-", "_") in DRUG_FIELDS:
             if v is None:
                 out[k] = "No"
             elif str(v).lower() == "no":
@@ -72,87 +116,408 @@ def normalize_drugs(details: dict) -> dict:
             out[k] = v
     return out
 
-def _get_customer_or_404(db, customer_id: str) -> Customer:
-    c = db.query(Customer).filter(Customer.id == customer_id).first()
+async def _get_customer_or_404(db: AsyncSession, customer_id: str) -> Customer:
+    c = await db.get(Customer, customer_id)
     if not c:
         raise HTTPException(status_code=404, detail="Customer not found")
     return c
 
-def _get_patient_or_404(db, customer_id: str, patient_id: str) -> Patient:
-    p = (
-        db.query(Patient)
-        .filter(Patient.id == patient_id, Patient.customer_id == customer_id)
-        .first()
+async def _get_patient_or_404(db: AsyncSession, customer_id: str, patient_id: str) -> Patient:
+    p = await db.scalar(
+        select(Patient)
+        .where(Patient.id == patient_id, Patient.customer_id == customer_id)
     )
     if not p:
         raise HTTPException(status_code=404, detail="Patient not found")
     return p
 
+def _queued_prediction(entry) -> Prediction:
+    """A prediction still in the write-behind journal, as a transient (session-less) Prediction."""
+    pred = Prediction(**entry.prediction)
+    pred.nudges = [Nudge(**row) for row in entry.nudges]
+    return pred
+
+async def _latest_prediction(db: AsyncSession, customer_id: str, patient_id: str, with_nudges: bool = False):
+    # Queued rows are newer than anything stored; the journal is checked first because
+    # an entry only leaves it after its commit
+    queued = prediction_journal.latest(customer_id, patient_id) if WRITE_BEHIND else None
+    if queued is not None:
+        return _queued_prediction(queued)
+    q = (
+        select(Prediction)
+        .filter_by(patient_id=patient_id)
+        .order_by(Prediction.timestamp.desc())
+        .limit(1)
+    )
+    if with_nudges:
+        # No lazy loading on an AsyncSession
+        q = q.options(selectinload(Prediction.nudges))
+    return await db.scalar(q)
+
+async def _latest_band(db: AsyncSession, customer_id: str, patient_id: str) -> Optional[str]:
+    """Band of the newest prediction, from patient_latest_risk (or the journal, if one is queued)."""
+    queued = prediction_journal.latest(customer_id, patient_id) if WRITE_BEHIND else None
+    if queued is not None:
+        return queued.prediction["band"]
+    return await db.scalar(select(PatientLatestRisk.band).where(PatientLatestRisk.patient_id == patient_id))
+
+async def _feature_schema(db: AsyncSession, model_version: str) -> Optional[list]:
+    """Feature order of `model_version`'s packed contributions (cached per process)."""
+    names = cached_schema(model_version)
+    if names is None:
+        names = await db.scalar(schema_query(model_version))
+        if names is not None:
+            names = remember_schema(model_version, names)
+    return names
+
+async def _top_features(db: AsyncSession, pred) -> dict:
+    """A prediction's drivers as a dict, whether they are stored as JSON or packed."""
+    if pred.top_features_packed is None:
+        return pred.top_features
+    return unpack(pred.top_features_packed, await _feature_schema(db, pred.model_version))
+
+def _prediction_payload(pred: Prediction, top_features: dict = None) -> dict:
+    return {
+        "id": pred.id,
+        "risk_score": pred.risk_score,
+        "band": pred.band,
+        "top_features": pred.top_features if top_features is None else top_features,
+        "explanation": pred.explanation,
+        "explanation_status": pred.explanation_status or READY,
+        "model_version": pred.model_version,
+        "explanation_tier": pred.explanation_tier or "exact",
+        "timestamp": pred.timestamp
+    }
+
+def _fallback_explanation(band: str, risk_score: float, top_features: dict) -> str:
+    text = f"The model assigned a {band} readmission risk (score {risk_score:.2f})."
+    if top_features:
+        text += f" Key factors include {list(top_features)[:3]}."
+    return text
+
+def _resolve_explainer(requested: Optional[str], customer: Customer) -> str:
+    """Per-request choice, else the customer's setting, else READM_EXPLAINER."""
+    return requested or customer.explainer or EXPLAINER
+
+def _customer_payload(c: Customer) -> dict:
+    return {"id": c.id, "name": c.name, "explainer": c.explainer or EXPLAINER}
+
+def _tier_rank(tier: Optional[str]) -> int:
+    return EXPLAIN_TIERS.index(tier or "exact")
+
+def _nudge_rows(prediction_id: str, nudges: list) -> list:
+    """Map generated nudges onto Nudge column values."""
+    rows = []
+    for n in nudges:
+        if isinstance(n, dict):
+            rows.append({
+                "prediction_id": prediction_id,
+                "suggestion": n.get("body") or n.get("title", ""),
+                "category": ",".join(n.get("tags", [])) if isinstance(n.get("tags"), list) else n.get("id", "general")
+            })
+        else:
+            # fallback if nudges are plain strings
+            rows.append({
+                "prediction_id": prediction_id,
+                "suggestion": str(n),
+                "category": "general"
+            })
+    return rows
+
+# --- List endpoints: keyset pages, field projection ---
+_DETAIL_KEY = re.compile(r"^[A-Za-z0-9_]+$")
+
+def _encode_cursor(*key) -> str:
+    """Opaque cursor for the sort key of the last row on a page."""
+    return base64.urlsafe_b64encode(json.dumps(jsonable_encoder(key)).encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str, size: int) -> list:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        key = None
+    if not isinstance(key, list) or len(key) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
+
+def _history_cursor(cursor: str) -> tuple:
+    """(timestamp, prediction id) of a predictions cursor."""
+    ts, prediction_id = _decode_cursor(cursor, 2)
+    try:
+        return datetime.fromisoformat(ts), prediction_id
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _page_limit(limit: Optional[int], cursor: Optional[str]) -> Optional[int]:
+    """Paging is opt-in on the history/list endpoints: None (no ?limit or ?cursor) returns every row."""
+    return limit if limit is not None or not cursor else PAGE_DEFAULT_LIMIT
+
+def _fetch_limit(limit: Optional[int]) -> Optional[int]:
+    """Rows to fetch for a page of `limit`: one extra tells whether there is a next page."""
+    return None if limit is None else limit + 1
+
+def _page(rows: list, limit: Optional[int], key) -> tuple:
+    """Split `limit` + 1 fetched rows into the page and the next page's cursor (None on the last page)."""
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, _encode_cursor(*key(rows[-1]))
+
+def _paged_response(items: list, next_cursor: Optional[str]) -> JSONResponse:
+    return JSONResponse(jsonable_encoder(items), headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+def _parse_fields(fields: Optional[str], allowed: set) -> tuple:
+    """`fields=name,details.age` -> (top-level fields, details keys); id is always included."""
+    if not fields:
+        return set(allowed), []
+    top, detail_keys = {"id"}, []
+    for f in filter(None, (x.strip() for x in fields.split(","))):
+        if f.startswith("details.") and _DETAIL_KEY.match(f[len("details."):]):
+            detail_keys.append(f[len("details."):])
+        elif f in allowed:
+            top.add(f)
+        else:
+            raise HTTPException(status_code=400, detail=f"Unknown field '{f}' (fields: {', '.join(sorted(allowed))}, details.<key>)")
+    return top, detail_keys
+
+def _patient_columns(top: set, detail_keys: list) -> list:
+    """Only the requested columns; single details keys are read in SQL instead of decoding the whole JSON."""
+    cols = [Patient.id] + [getattr(Patient, f) for f in ("name", "status", "details") if f in top]
+    if "details" not in top:
+        cols += [func.json_extract(Patient.details, f"$.{k}").label(f"details.{k}") for k in detail_keys]
+    return cols
+
+def _patient_item(row, top: set, detail_keys: list) -> dict:
+    m = row._mapping
+    item = {f: m[f] for f in ("id", "name", "status") if f in top or f == "id"}
+    # ✅ denormalize diagnoses before sending
+    if "details" in top:
+        item["details"] = denormalize_all_diagnoses(m["details"])
+    elif detail_keys:
+        item["details"] = denormalize_all_diagnoses({k: m[f"details.{k}"] for k in detail_keys})
+    return item
+
+def _patients_page_query(customer_id: str, status: Optional[str], cursor: Optional[str], limit: Optional[int],
+                         columns: list):
+    """One page of a customer's patients in id order (ix_patients_customer_id_id / _customer_status_id)."""
+    q = select(*columns).where(Patient.customer_id == customer_id)
+    if status:
+        q = q.where(Patient.status == status)
+    if cursor:
+        q = q.where(Patient.id > _decode_cursor(cursor, 1)[0])
+    return q.order_by(Patient.id).limit(_fetch_limit(limit))
+
+# -----------------------------
+# Lifecycle
+# -----------------------------
+@app.on_event("startup")
+def migrate_schema():
+    # Before anything touches the database; importing app.* never migrates it
+    init_schema(engine)
+
+@app.on_event("startup")
+def warm_up_model():
+    # Load + warm the model in the background so the server accepts traffic immediately
+    start_warm_up()
+    # Explanations still pending from a previous run will never finish
+    explanation_worker.recover_pending()
+
+@app.on_event("shutdown")
+def shutdown_inference_pool():
+    if inference_pool is not None:
+        inference_pool.shutdown()
+    explanation_worker.shutdown()
+
+@app.on_event("shutdown")
+async def close_db_pool():
+    # Queued predictions are written before the pools go away
+    await run_in_threadpool(prediction_journal.close)
+    await tenant_router.close()
+    await async_engine.dispose()
+
 # -----------------------------
 # Routes
 # -----------------------------
 @app.get("/health")
 @app.get("/health/")
 def health():
+    """Liveness: the process is up and serving HTTP."""
     return {"status": "ok"}
 
+@app.get("/ready")
+def ready():
+    """Readiness: the model is loaded and has served a warm-up prediction."""
+    body = {"ready": engine_status["state"] == "ready", **engine_status}
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+@app.get("/health/workers")
+def workers_health():
+    if inference_pool is None:
+        return {"healthy": True, "workers": 0, "detail": "scoring runs in the API process"}
+    return inference_pool.health()
+
+@app.get("/metrics")
+def metrics():
+    engine = loaded_engine()
+    cascade = loaded_cascade()
+    return {
+        "batcher": prediction_batcher.stats(),
+        "prediction_cache": engine.cache.stats() if engine is not None else None,
+        "inference_pool": inference_pool.stats() if inference_pool is not None else None,
+        "cascade": cascade.stats() if cascade is not None else None,
+        "explanations": explanation_worker.stats(),
+        "explanation_cache": explanation_cache.stats(),
+        "llm": llm_client.stats(),
+        "explain_batch": explain_batch_stats(),
+        "db_pool": async_engine.pool.status(),
+        "shards": tenant_router.stats() if SHARDING_ENABLED else None,
+        "journal": prediction_journal.stats() if WRITE_BEHIND else None
+    }
+
+# --- Admin: model registry ---
+@app.get("/admin/models")
+def list_models():
+    return {
+        "models": model_registry.list_models(),
+        "reloading": model_registry.reloading,
+        "last_reload": model_registry.last_reload
+    }
+
+@app.post("/admin/models/reload", status_code=202)
+def reload_model(request: ModelReloadRequest, wait: bool = False):
+    """Load + warm another model in the background and swap it in without dropping traffic."""
+    try:
+        status = model_registry.start_reload(request.version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version '{request.version}'")
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if wait:
+        status = model_registry.wait()
+    return status
+
 # --- Customers ---
 @app.post("/customers", status_code=201)
-def create_customer(customer: CustomerRequest):
-    db = SessionLocal()
-    try:
-        exists = db.query(Customer).filter(Customer.id == customer.id).first()
-        if exists:
-            raise HTTPException(status_code=409, detail="Customer already exists")
-        cust = Customer(id=customer.id, name=customer.name)
-        db.add(cust)
-        db.commit()
-        return {"id": cust.id, "name": cust.name}
-    finally:
-        db.close()
+async def create_customer(customer: CustomerRequest, db: AsyncSession = Depends(get_db)):
+    exists = await db.get(Customer, customer.id)
+    if exists:
+        raise HTTPException(status_code=409, detail="Customer already exists")
+    cust = Customer(id=customer.id, name=customer.name, explainer=customer.explainer)
+    db.add(cust)
+    await db.commit()
+    if SHARDING_ENABLED:
+        # The shard keeps its own copy of the row, so tenant routes never touch the catalog
+        async with tenant_async_session(cust.id) as shard_db:
+            await shard_db.merge(Customer(id=cust.id, name=cust.name, explainer=cust.explainer))
+            await shard_db.commit()
+    return _customer_payload(cust)
+
+@app.patch("/customers/{customer_id}")
+async def update_customer_settings(customer_id: str, settings: CustomerSettings, db: AsyncSession = Depends(get_db)):
+    cust = await _get_customer_or_404(db, customer_id)
+    cust.explainer = settings.explainer
+    await db.commit()
+    if SHARDING_ENABLED:
+        async with tenant_async_session(customer_id) as shard_db:
+            await shard_db.merge(Customer(id=cust.id, name=cust.name, explainer=cust.explainer))
+            await shard_db.commit()
+    return _customer_payload(cust)
 
 @app.get("/customers")
-def list_customers():
-    db = SessionLocal()
-    try:
-        rows = db.query(Customer).all()
-        return [{"id": r.id, "name": r.name} for r in rows]
-    finally:
-        db.close()
+async def list_customers(db: AsyncSession = Depends(get_db)):
+    rows = (await db.scalars(select(Customer))).all()
+    return [_customer_payload(r) for r in rows]
 
 # --- Patients ---
 # --- Patients List ---
 @app.get("/customers/{customer_id}/patients")
-def list_patients(customer_id: str):
-    db = SessionLocal()
-    try:
-        _get_customer_or_404(db, customer_id)
-        patients = (
-            db.query(Patient)
-            .filter(Patient.customer_id == customer_id)
-            .all()
-        )
-        return [
-            {
-                "id": p.id,
-                "name": p.name,
-                "status": p.status,
-                # ✅ denormalize diagnoses before sending
-                "details": denormalize_all_diagnoses(p.details)
-            }
-            for p in patients
-        ]
-    finally:
-        db.close()
+async def list_patients(
+    customer_id: str,
+    status: Optional[str] = Query(None, pattern="^(discharged|not_discharged)$"),
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_tenant_db),
+):
+    """
+    Patients in id order; with ?limit, keyset pages (next page: ?cursor=<X-Next-Cursor>).
+    ?fields=id,name,details.age projects.
+    """
+    await _get_customer_or_404(db, customer_id)
+    limit = _page_limit(limit, cursor)
+    top, detail_keys = _parse_fields(fields, {"id", "name", "status", "details"})
+    rows = (
+        await db.execute(_patients_page_query(customer_id, status, cursor, limit, _patient_columns(top, detail_keys)))
+    ).all()
+    rows, next_cursor = _page(rows, limit, lambda r: (r.id,))
+    return _paged_response([_patient_item(r, top, detail_keys) for r in rows], next_cursor)
 
 
-from sqlalchemy.exc import IntegrityError
+# --- Dashboard: patients with their latest risk, one query per page ---
+@app.get("/customers/{customer_id}/dashboard")
+async def customer_dashboard(
+    customer_id: str,
+    status: Optional[str] = Query(None, pattern="^(discharged|not_discharged)$"),
+    band: Optional[str] = Query(None, pattern="^(low|medium|high)$"),
+    fields: Optional[str] = None,
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_tenant_db),
+):
+    await _get_customer_or_404(db, customer_id)
+    top, detail_keys = _parse_fields(fields, {"id", "name", "status", "details", "latest_risk"})
+    columns = _patient_columns(top, detail_keys) + [
+        PatientLatestRisk.risk_score, PatientLatestRisk.band, PatientLatestRisk.timestamp.label("risk_timestamp")
+    ]
+    q = (
+        _patients_page_query(customer_id, status, cursor, limit, columns)
+        .outerjoin(PatientLatestRisk, PatientLatestRisk.patient_id == Patient.id)
+    )
+    queued = prediction_journal.latest_by_patient(customer_id) if WRITE_BEHIND else {}
+    if band:
+        # Patients whose queued prediction moves them into the band are not in patient_latest_risk yet
+        moved_in = [pid for pid, entry in queued.items() if entry.prediction["band"] == band]
+        q = q.where(or_(PatientLatestRisk.band == band, Patient.id.in_(moved_in)) if moved_in
+                    else PatientLatestRisk.band == band)
+    rows, next_cursor = _page((await db.execute(q)).all(), limit, lambda r: (r.id,))
+
+    out = []
+    for r in rows:
+        latest = {"risk_score": r.risk_score, "band": r.band, "timestamp": r.risk_timestamp} if r.band else None
+        if r.id in queued:
+            row = queued[r.id].prediction
+            latest = {"risk_score": row["risk_score"], "band": row["band"], "timestamp": row["timestamp"]}
+            if band and latest["band"] != band:
+                continue  # its queued prediction moved it out of the band
+        item = _patient_item(r, top, detail_keys)
+        if "latest_risk" in top:
+            item["latest_risk"] = latest
+        out.append(item)
+    return _paged_response(out, next_cursor)
+
+
+# ✅ Dashboard counts: aggregated in SQL, so the page does not have to fetch every patient to show them
+@app.get("/customers/{customer_id}/dashboard/summary")
+async def customer_dashboard_summary(customer_id: str, db: AsyncSession = Depends(get_tenant_db)):
+    await _get_customer_or_404(db, customer_id)
+    gender = Patient.details["gender"].as_string()
+    by_status = (await db.execute(
+        select(Patient.status, func.count()).where(Patient.customer_id == customer_id).group_by(Patient.status)
+    )).all()
+    by_gender = (await db.execute(
+        select(gender, func.count()).where(Patient.customer_id == customer_id).group_by(gender)
+    )).all()
+    return {
+        "patients": sum(n for _, n in by_status),
+        "by_status": {status or "unknown": n for status, n in by_status},
+        "by_gender": {g or "unknown": n for g, n in by_gender},
+    }
+
 
 @app.post("/customers/{customer_id}/patients", status_code=201)
-def add_patient(customer_id: str, request: dict):
-    db = SessionLocal()
+async def add_patient(customer_id: str, request: dict, db: AsyncSession = Depends(get_tenant_db)):
     try:
-        _get_customer_or_404(db, customer_id)
+        await _get_customer_or_404(db, customer_id)
 
         if "id" not in request or "name" not in request:
             raise HTTPException(status_code=400, detail="id and name are required")
@@ -169,10 +534,13 @@ def add_patient(customer_id: str, request: dict):
             id=patient_id,
             name=patient_name,
             details=details,
+            features_hash=details_fingerprint(details),
             customer_id=customer_id
         )
         db.add(patient)
-        db.commit()
+        # ✅ Typed feature-store row, committed with the patient
+        await db.execute(upsert_patient_features, patient_features_row(patient_id, patient.features_hash, details))
+        await db.commit()
 
         return {
             "id": patient.id,
@@ -182,208 +550,506 @@ def add_patient(customer_id: str, request: dict):
         }
 
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         # ✅ Handle duplicate patient ID gracefully
         raise HTTPException(
             status_code=409,
             detail=f"Patient with id '{request['id']}' already exists for customer {customer_id}"
         )
-    finally:
-        db.close()
 
 @app.patch("/customers/{customer_id}/patients/{patient_id}/fields")
-def update_patient_fields(customer_id: str, patient_id: str, update: MultiFieldUpdate):
-    db = SessionLocal()
-    try:
-        # Ensure patient exists
-        patient = _get_patient_or_404(db, customer_id, patient_id)
-
-        # Load current details (could be None if empty)
-        details = dict(patient.details or {})
-
-        # Validate all requested fields exist
-        missing = [f for f in update.updates.keys() if f not in details]
-        if missing:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Fields {missing} do not exist for patient {patient_id}"
-            )
+async def update_patient_fields(customer_id: str, patient_id: str, update: MultiFieldUpdate,
+                                db: AsyncSession = Depends(get_tenant_db)):
+    # Ensure patient exists
+    patient = await _get_patient_or_404(db, customer_id, patient_id)
 
-        # ✅ Apply updates
-        for field, value in update.updates.items():
-            details[field] = value
+    # Load current details (could be None if empty)
+    details = dict(patient.details or {})
 
-        # Normalize drugs / diagnoses if needed
-        details = normalize_drugs(details)
-        details = normalize_all_diagnoses(details)
+    # Validate all requested fields exist
+    missing = [f for f in update.updates.keys() if f not in details]
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Fields {missing} do not exist for patient {patient_id}"
+        )
 
-        # Save back
-        patient.details = details
-        db.commit()
+    # ✅ Apply updates
+    for field, value in update.updates.items():
+        details[field] = value
 
-        return {
-            "id": patient.id,
-            "name": patient.name,
-            "updated_fields": update.updates,
-            "details": details
-        }
-    finally:
-        db.close()
+    # Normalize drugs / diagnoses if needed
+    details = normalize_drugs(details)
+    details = normalize_all_diagnoses(details)
+
+    # Save back
+    patient.details = details
+    patient.features_hash = details_fingerprint(details)
+    await db.execute(upsert_patient_features, patient_features_row(patient.id, patient.features_hash, details))
+    await db.commit()
+
+    return {
+        "id": patient.id,
+        "name": patient.name,
+        "updated_fields": update.updates,
+        "details": details
+    }
 
 
 
 @app.get("/customers/{customer_id}/patients/{patient_id}")
-def get_patient(customer_id: str, patient_id: str):
-    db = SessionLocal()
-    try:
-        patient = _get_patient_or_404(db, customer_id, patient_id)
-        latest_pred = (
-            db.query(Prediction)
-            .filter_by(patient_id=patient.id)
-            .order_by(Prediction.timestamp.desc())
-            .first()
-        )
-        return {
-            "id": patient.id,
-            "name": patient.name,
-            # ✅ denormalize before returning
-            "details": denormalize_all_diagnoses(patient.details),
-            "status": patient.status,
-            "latest_band": latest_pred.band if latest_pred else None
-        }
-    finally:
-        db.close()
+async def get_patient(customer_id: str, patient_id: str, db: AsyncSession = Depends(get_tenant_db)):
+    patient = await _get_patient_or_404(db, customer_id, patient_id)
+    return {
+        "id": patient.id,
+        "name": patient.name,
+        # ✅ denormalize before returning
+        "details": denormalize_all_diagnoses(patient.details),
+        "status": patient.status,
+        "latest_band": await _latest_band(db, customer_id, patient.id)
+    }
 
 
 @app.patch("/customers/{customer_id}/patients/{patient_id}/status")
-def update_status(customer_id: str, patient_id: str, request: StatusUpdate):
-    db = SessionLocal()
+async def update_status(customer_id: str, patient_id: str, request: StatusUpdate, db: AsyncSession = Depends(get_tenant_db)):
+    patient = await _get_patient_or_404(db, customer_id, patient_id)
+    patient.status = request.status
+    await db.commit()
+    return {"patient_id": patient.id, "status": patient.status}
+
+# --- Predictions ---
+async def _merge_for_predict(db: AsyncSession, customer_id: str, patient_id: str, request: PredictRequest):
+    """
+    Merge the request into the stored profile. Returns (merged_details,
+    fingerprint, explainer, reused_response); reused_response is set when the
+    details are unchanged since the latest prediction.
+    """
+    # ✅ Validate customer + patient
+    customer = await _get_customer_or_404(db, customer_id)
+    explainer = _resolve_explainer(request.explainer, customer)
+    patient = await _get_patient_or_404(db, customer_id, patient_id)
+
+    # ✅ Merge new input into existing details
+    new_input = dict(request.input or {})
+    if not new_input:
+        raise HTTPException(status_code=400, detail="Input payload is empty")
+
+    merged_details = dict(patient.details or {})
+    new_input = normalize_drugs(new_input)
+    new_input = normalize_all_diagnoses(new_input)
+    merged_details.update(new_input)
+    fingerprint = details_fingerprint(merged_details)
+
+    # ✅ Save merged profile (only when it actually changed)
+    if fingerprint != patient.features_hash:
+        patient.details = merged_details
+        patient.features_hash = fingerprint
+        await db.execute(upsert_patient_features, patient_features_row(patient.id, fingerprint, merged_details))
+        await db.commit()
+
+    # ✅ Unchanged since the last prediction (same details, same model, same explainer, explanation
+    # at least as good) → return it instead of re-scoring; while the model is still loading it is a miss
+    latest_pred = None if request.force else await _latest_prediction(db, customer_id, patient.id, with_nudges=True)
+    if (
+        latest_pred is not None
+        and latest_pred.features_hash == fingerprint
+        and latest_pred.model_version in serving_model_versions()
+        and latest_pred.explainer == explainer
+        and _tier_rank(latest_pred.explanation_tier) >= _tier_rank(request.explain or EXPLAIN_TIER)
+    ):
+        return merged_details, fingerprint, explainer, {
+            "patient_id": patient_id,
+            "prediction": _prediction_payload(latest_pred, await _top_features(db, latest_pred)),
+            # (queued nudges have no id yet and are already in order)
+            "nudges": [n.suggestion for n in sorted(latest_pred.nudges, key=lambda n: n.id or 0)],
+            "merged_details": merged_details,
+            "reused": True,
+            "exact_pending": False
+        }
+    return merged_details, fingerprint, explainer, None
+
+
+def _refine_exact(customer_id: str, prediction_id: str, details: dict, model_version: str):
+    """
+    Replace a prediction's approximate top_features with exact TreeSHAP, and its
+    nudges with ones generated from them; returns them (None if skipped). Runs
+    on an explanation worker thread, hence the sync session.
+    """
+    ml_result = submit_ml_model(details, "exact").result()
+    if not prediction_journal.wait_written(prediction_id):
+        return None  # the row was dropped or is still queued; the explanation worker reports it
+    db = tenant_session(customer_id)
     try:
-        patient = _get_patient_or_404(db, customer_id, patient_id)
-        patient.status = request.status
+        pred = db.get(Prediction, prediction_id)
+        # The model was swapped in the meantime: these attributions would not match the score
+        if pred is None or ml_result.get("model_version") != model_version:
+            return None
+        row = {"top_features": ml_result["top_features"], "model_version": model_version}
+        pack_rows([row])
+        if row.get("top_features_packed") is not None:
+            db.execute(insert_feature_schemas, schema_rows([row]))
+        pred.top_features, pred.top_features_packed = row["top_features"], row.get("top_features_packed")
+        pred.explanation_tier = ml_result["explanation_tier"]
+        # ✅ Nudges follow the exact drivers too
+        nudges = generate_nudges(details, {"band": pred.band, "top_features": ml_result["top_features"]}) or []
+        stored = db.query(Nudge.suggestion).filter_by(prediction_id=prediction_id).order_by(Nudge.id).all()
+        nudge_rows = _nudge_rows(prediction_id, nudges)
+        if [s for (s,) in stored] != [r["suggestion"] for r in nudge_rows]:
+            db.query(Nudge).filter_by(prediction_id=prediction_id).delete(synchronize_session=False)
+            db.add_all([Nudge(**r) for r in nudge_rows])
         db.commit()
-        return {"patient_id": patient.id, "status": patient.status}
+        return ml_result["top_features"]
     finally:
         db.close()
 
-# --- Predictions ---
+
+async def _save_prediction(db: AsyncSession, customer_id: str, patient_id: str, merged_details: dict,
+                           fingerprint: str, ml_result: dict, refine_exact: bool = False,
+                           explainer: str = "llm") -> dict:
+    """
+    Persist and build the /predict response for a fresh ML result. The LLM
+    explanation follows in the background; the local one is written inline.
+    """
+    raw_score = ml_result.get("risk_score", 0.1)
+    top_features = ml_result.get("top_features", {})
+
+    # Hackathon demo tweak
+    risk_score = demo_adjust(raw_score)
+    band = band_from_score(risk_score)
+
+    ml_result["risk_score"] = risk_score
+    ml_result["band"] = band
+
+    # No drivers to explain on the "none" tier
+    local = explainer == "local" and bool(top_features)
+    if local:
+        explanation, status = explain_locally(merged_details, risk_score, top_features), READY
+    else:
+        explanation, status = _fallback_explanation(band, risk_score, top_features), PENDING if top_features else FALLBACK
+
+    # ✅ Save prediction with the local text, or the template explanation until the LLM text is ready
+    pred_row = {
+        "id": str(uuid.uuid4()),
+        "patient_id": patient_id,
+        "risk_score": risk_score,
+        "band": band,
+        "top_features": top_features,
+        "explanation": explanation,
+        "explanation_status": status,
+        "features_hash": fingerprint,
+        "model_version": ml_result.get("model_version"),
+        "explanation_tier": ml_result.get("explanation_tier"),
+        "explainer": explainer,
+        "timestamp": datetime.utcnow()
+    }
+    # READM_SHAP_STORAGE=packed: the row keeps a float32 vector; the response still gets the dict
+    pack_rows([pred_row])
+    pred = Prediction(**pred_row)
+
+    # ✅ Dynamic nudges, committed with the prediction
+    nudges = generate_nudges(merged_details, ml_result) or []
+    nudge_rows = _nudge_rows(pred.id, nudges)
+    if WRITE_BEHIND:
+        # Committed with the journal's next batch; reads see the queued rows until then
+        try:
+            prediction_journal.append(customer_id, pred_row, nudge_rows)
+        except JournalFull as e:
+            raise HTTPException(status_code=503, detail=f"Prediction queue is full ({e})",
+                                headers={"Retry-After": "1"})
+    else:
+        if pred.top_features_packed is not None:
+            await db.execute(insert_feature_schemas, schema_rows([pred_row]))
+        db.add(pred)
+        db.add_all([Nudge(**row) for row in nudge_rows])
+        await db.commit()
+
+    # ✅ Explanation in the background ("exact" first upgrades the drivers it explains;
+    # local text only needs rewriting when they change)
+    if top_features and (refine_exact or not local):
+        pred_id, refine = pred.id, None
+        if refine_exact:
+            refine = lambda: _refine_exact(customer_id, pred_id, merged_details, ml_result["model_version"])
+        explanation_worker.submit(pred_id, merged_details, risk_score, top_features, refine=refine,
+                                  explainer=explainer, customer_id=customer_id)
+
+    # ✅ Response
+    return {
+        "patient_id": patient_id,
+        "prediction": _prediction_payload(pred, top_features),
+        "nudges": nudges,
+        "merged_details": merged_details,
+        "reused": False,
+        "exact_pending": refine_exact
+    }
+
+
 @app.post("/customers/{customer_id}/patients/{patient_id}/predict", status_code=201)
-def predict(customer_id: str, patient_id: str, request: PredictRequest):
-    db = SessionLocal()
-    try:
-        # ✅ Validate customer + patient
-        _get_customer_or_404(db, customer_id)
-        patient = _get_patient_or_404(db, customer_id, patient_id)
+async def predict(customer_id: str, patient_id: str, request: PredictRequest, db: AsyncSession = Depends(get_tenant_db)):
+    # DB work is awaited on the async session; scoring is awaited off the event loop
+    merged_details, fingerprint, explainer, reused = await _merge_for_predict(db, customer_id, patient_id, request)
+    if reused is not None:
+        return reused
 
-        # ✅ Merge new input into existing details
-        new_input = dict(request.input or {})
-        if not new_input:
-            raise HTTPException(status_code=400, detail="Input payload is empty")
+    # ✅ Run ML: "exact" answers with approximate SHAP now and upgrades the row afterwards
+    tier = request.explain or EXPLAIN_TIER
+    ml_result = await asyncio.wrap_future(submit_ml_model(merged_details, "fast" if tier == "exact" else tier))
+    refine_exact = tier == "exact" and ml_result["explanation_tier"] != "exact"
 
-        merged_details = dict(patient.details or {})
-        new_input = normalize_drugs(new_input)
-        new_input = normalize_all_diagnoses(new_input)
-        merged_details.update(new_input)
+    return await _save_prediction(db, customer_id, patient_id, merged_details, fingerprint, ml_result,
+                                  refine_exact, explainer)
 
-        # ✅ Save merged profile
-        patient.details = merged_details
-        db.commit()
 
-        # ✅ Run ML
-        ml_result = run_ml_model(merged_details)
-        raw_score = ml_result.get("risk_score", 0.1)
-        top_features = ml_result.get("top_features", {})
+def _explanation_body(pred: Optional[Prediction]) -> dict:
+    if not pred:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+    return {
+        "prediction_id": pred.id,
+        "status": pred.explanation_status or READY,
+        "explanation": pred.explanation
+    }
 
-        # Hackathon demo tweak
-        risk_score = demo_adjust(raw_score)
-        band = band_from_score(risk_score)
 
-        ml_result["risk_score"] = risk_score
-        ml_result["band"] = band
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
 
-        # ✅ Explanation
+def _explanation_events(customer_id: str, patient_id: str, body: dict):
+    """SSE: "token" events while the LLM is generating, then one "done" event with the stored text."""
+    prediction_id = body["prediction_id"]
+    live = explanation_worker.stream(prediction_id) if body["status"] == PENDING else None
+    if live is not None:
         try:
-            explanation = explain_with_openai(merged_details, risk_score, top_features)
-        except Exception:
-            explanation = (
-                f"The model assigned a {band} readmission risk "
-                f"(score {risk_score:.2f}). Key factors include {list(top_features)[:3]}."
-            )
+            for delta in live.follow(timeout=EXPLAIN_TIMEOUT):
+                yield _sse("token", {"text": delta})
+        except TimeoutError as e:
+            yield _sse("error", {"prediction_id": prediction_id, "detail": str(e)})
+            return
+        body = dict(body, status=live.status, explanation=live.text)
+    elif body["status"] == PENDING:
+        # Finished between the first read and now: send what was written
+        # (this generator runs on the threadpool, so it uses a sync session)
+        db = tenant_session(customer_id)
+        try:
+            body = _explanation_body(db.query(Prediction).filter_by(id=prediction_id, patient_id=patient_id).first())
+        finally:
+            db.close()
+    yield _sse("done", body)
 
-        # ✅ Save prediction
-        pred = Prediction(
-            id=str(uuid.uuid4()),
-            patient_id=patient.id,
-            risk_score=risk_score,
-            band=band,
-            top_features=top_features,
-            explanation=explanation,
-            timestamp=datetime.utcnow()
+
+@app.get("/customers/{customer_id}/patients/{patient_id}/predictions/{prediction_id}/explanation")
+async def get_explanation(customer_id: str, patient_id: str, prediction_id: str, request: Request,
+                          stream: bool = False, db: AsyncSession = Depends(get_tenant_db)):
+    """Poll (JSON, Retry-After while pending) or stream (?stream=true or Accept: text/event-stream)."""
+    await _get_patient_or_404(db, customer_id, patient_id)
+    queued = prediction_journal.get(prediction_id) if WRITE_BEHIND else None
+    if queued is not None and queued.key == (customer_id, patient_id):
+        body = _explanation_body(_queued_prediction(queued))
+    else:
+        body = _explanation_body(await db.scalar(
+            select(Prediction).filter_by(id=prediction_id, patient_id=patient_id)
+        ))
+
+    if stream or "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            _explanation_events(customer_id, patient_id, body),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"}
         )
-        db.add(pred)
-        db.commit()
+    if body["status"] == PENDING:
+        return JSONResponse(body, headers={"Retry-After": "1"})
+    return body
 
-        # ✅ Dynamic nudges
-        nudges = generate_nudges(merged_details, ml_result) or []
 
-        for n in nudges:
-            if isinstance(n, dict):
-                db.add(Nudge(
-                    prediction_id=pred.id,
-                    suggestion=n.get("body") or n.get("title", ""),
-                    category=",".join(n.get("tags", [])) if isinstance(n.get("tags"), list) else n.get("id", "general")
-                ))
-            else:
-                # fallback if nudges are plain strings
-                db.add(Nudge(
-                    prediction_id=pred.id,
-                    suggestion=str(n),
-                    category="general"
-                ))
-        db.commit()
+BATCH_SCORE_CHUNK = 2048
 
-        # ✅ Response
-        return {
+def _bulk_rows(patient_ids: list, explain: str, llm: bool, local: bool,
+               details: list = None, matrix: tuple = None) -> dict:
+    """
+    Score the patients and build the prediction/nudge rows (CPU work, run on the threadpool),
+    from their `details` or from a (features hashes, numeric, categorical) feature-store `matrix`.
+    """
+    # ✅ Run ML in large vectorized chunks
+    if matrix is not None:
+        hashes, num, cat = matrix
+        ml_results = score_matrix(num, cat, BATCH_SCORE_CHUNK, explain)
+    else:
+        hashes = [details_fingerprint(d) for d in details]
+        ml_results = score_many(details, BATCH_SCORE_CHUNK, explain)
+
+    now = datetime.utcnow()
+    pred_rows, nudge_rows, out, explain_jobs = [], [], [], []
+    bands = {"low": 0, "medium": 0, "high": 0}
+    for i, (patient_id, ml_result) in enumerate(zip(patient_ids, ml_results)):
+        patient_details = details[i] if details is not None else None
+        # Hackathon demo tweak
+        risk_score = demo_adjust(ml_result["risk_score"])
+        band = band_from_score(risk_score)
+        top_features = ml_result["top_features"]
+        ml_result["risk_score"] = risk_score
+        ml_result["band"] = band
+        bands[band] += 1
+
+        # Local bullets, or the template explanation; with ?llm=true it is replaced by a batched LLM one later
+        pred_id = str(uuid.uuid4())
+        wants_llm = llm and not local and bool(top_features)
+        if wants_llm:
+            explain_jobs.append((pred_id, patient_details, risk_score, top_features))
+        if local and top_features:
+            explanation, explanation_status = explain_locally(patient_details, risk_score, top_features), READY
+        else:
+            explanation = _fallback_explanation(band, risk_score, top_features)
+            explanation_status = PENDING if wants_llm else FALLBACK
+        pred_rows.append({
+            "id": pred_id,
             "patient_id": patient_id,
-            "prediction": {
-                "id": pred.id,
-                "risk_score": pred.risk_score,
-                "band": pred.band,
-                "top_features": pred.top_features,
-                "explanation": pred.explanation,
-                "timestamp": pred.timestamp
-            },
-            "nudges": nudges,
-            "merged_details": merged_details
-        }
+            "risk_score": risk_score,
+            "band": band,
+            "top_features": top_features,
+            "explanation": explanation,
+            "explanation_status": explanation_status,
+            "features_hash": hashes[i],
+            "model_version": ml_result.get("model_version"),
+            "explanation_tier": ml_result.get("explanation_tier"),
+            "explainer": "local" if local and top_features else "llm" if wants_llm else None,
+            "timestamp": now
+        })
+        nudge_rows.extend(_nudge_rows(pred_id, generate_nudges(patient_details, ml_result) or []))
+        out.append({"patient_id": patient_id, "prediction_id": pred_id, "risk_score": risk_score, "band": band})
+    pack_rows(pred_rows)
+    return {"pred_rows": pred_rows, "nudge_rows": nudge_rows, "out": out,
+            "explain_jobs": explain_jobs, "bands": bands}
 
-    finally:
-        db.close()
+
+@app.post("/customers/{customer_id}/predictions:batch", status_code=201)
+async def predict_batch(
+    customer_id: str,
+    status: Optional[str] = Query(None, pattern="^(discharged|not_discharged)$"),
+    explain: str = Query(BULK_EXPLAIN_TIER, pattern="^(exact|fast|none)$"),
+    llm: bool = False,
+    explainer: Optional[str] = Query(None, pattern="^(llm|local)$"),
+    db: AsyncSession = Depends(get_tenant_db),
+):
+    """
+    Score every patient of a customer in one vectorized pass (no SHAP by
+    default). When drivers are available, the local explainer writes its
+    bullets inline; with the LLM explainer and ?llm=true, LLM explanations
+    follow in the background as batched multi-patient requests.
+    """
+    customer = await _get_customer_or_404(db, customer_id)
+    local = _resolve_explainer(explainer, customer) == "local"
+
+    # ✅ One query for all patients: the typed feature matrix, or the full profiles when the
+    # drivers get explained (or the cascade's LR screen runs, which reads dicts)
+    details = matrix = None
+    if CASCADE_ENABLED or (explain != "none" and (llm or local)):
+        q = select(Patient.id, Patient.details).where(Patient.customer_id == customer_id)
+        if status:
+            q = q.where(Patient.status == status)
+        patients = (await db.execute(q)).all()
+        patient_ids, details = [p.id for p in patients], [dict(p.details or {}) for p in patients]
+    else:
+        patient_ids, hashes, num, cat = await db.run_sync(load_feature_matrix, customer_id, status)
+        matrix = (hashes, num, cat)
+    if not patient_ids:
+        return {"customer_id": customer_id, "scored": 0, "explanation_tier": explain,
+                "band_distribution": {}, "predictions": []}
+
+    rows = await run_in_threadpool(_bulk_rows, patient_ids, explain, llm, local, details, matrix)
+
+    # ✅ Bulk insert predictions + nudges in one transaction (packed drivers need their schema row)
+    schemas = schema_rows(rows["pred_rows"])
+    if schemas:
+        await db.execute(insert_feature_schemas, schemas)
+    await db.execute(insert(Prediction), rows["pred_rows"])
+    if rows["nudge_rows"]:
+        await db.execute(insert(Nudge), rows["nudge_rows"])
+    await db.commit()
+
+    if rows["explain_jobs"]:
+        explanation_worker.submit_many(rows["explain_jobs"], customer_id)
+
+    return {
+        "customer_id": customer_id,
+        "scored": len(rows["out"]),
+        "explanation_tier": explain,
+        "explainer": "local" if local else "llm",
+        "explanations_pending": len(rows["explain_jobs"]),
+        "band_distribution": rows["bands"],
+        "predictions": rows["out"]
+    }
 
 
 @app.get("/customers/{customer_id}/patients/{patient_id}/predictions")
-def get_predictions(customer_id: str, patient_id: str):
-    db = SessionLocal()
-    try:
-        _get_patient_or_404(db, customer_id, patient_id)
-        preds = (
-            db.query(Prediction)
-            .filter_by(patient_id=patient_id)
-            .order_by(Prediction.timestamp.desc())
-            .all()
-        )
-        return [
-            {
-                "id": p.id,
-                "risk_score": p.risk_score,
-                "band": p.band,
-                "timestamp": p.timestamp,
-                "explanation": p.explanation
-            }
-            for p in preds
-        ]
-    finally:
-        db.close()
+async def get_predictions(
+    customer_id: str,
+    patient_id: str,
+    band: Optional[str] = Query(None, pattern="^(low|medium|high)$"),
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    contributions: Optional[str] = Query(None, pattern="^(dict|packed)$"),
+    db: AsyncSession = Depends(get_tenant_db),
+):
+    """
+    Newest first; with ?limit, in keyset pages (next page: ?cursor=<X-Next-Cursor>).
+    ?contributions=dict adds each row's top_features; ?contributions=packed
+    returns packed rows as base64 float32 top_features_packed instead, to be
+    decoded with GET /customers/{id}/feature-schemas/{model_version}.
+    """
+    await _get_patient_or_404(db, customer_id, patient_id)
+    limit = _page_limit(limit, cursor)
+    # Queued rows are newer than anything stored, so they only belong on the first page
+    queued = [] if cursor or not WRITE_BEHIND else [
+        _queued_prediction(e) for e in prediction_journal.pending(customer_id, patient_id)
+    ]
+    # Only the listed columns: no ORM identity-map or JSON decoding work for the history
+    columns = [Prediction.id, Prediction.risk_score, Prediction.band, Prediction.timestamp,
+               Prediction.explanation, Prediction.explanation_status]
+    if contributions:
+        columns += [Prediction.top_features, Prediction.top_features_packed, Prediction.model_version]
+    q = select(*columns).filter_by(patient_id=patient_id)
+    if band:
+        q = q.where(Prediction.band == band)
+        queued = [p for p in queued if p.band == band]
+    if cursor:
+        q = q.where(tuple_(Prediction.timestamp, Prediction.id) < _history_cursor(cursor))
+    preds = (
+        await db.execute(q.order_by(Prediction.timestamp.desc(), Prediction.id.desc()).limit(_fetch_limit(limit)))
+    ).all()
+    if queued:
+        # An entry written since the journal was read shows up in both
+        stored = {p.id for p in preds}
+        preds = sorted([p for p in queued if p.id not in stored] + list(preds),
+                       key=lambda p: (p.timestamp, p.id), reverse=True)
+    preds, next_cursor = _page(preds, limit, lambda p: (p.timestamp, p.id))
+    items = [
+        {
+            "id": p.id,
+            "risk_score": p.risk_score,
+            "band": p.band,
+            "timestamp": p.timestamp,
+            "explanation": p.explanation,
+            "explanation_status": p.explanation_status or READY
+        }
+        for p in preds
+    ]
+    if contributions:
+        for item, p in zip(items, preds):
+            item["model_version"] = p.model_version
+            if p.top_features_packed is not None and contributions == "packed":
+                item["top_features_packed"] = base64.b64encode(p.top_features_packed).decode()
+            else:
+                item["top_features"] = await _top_features(db, p)
+    return _paged_response(items, next_cursor)
+
+
+@app.get("/customers/{customer_id}/feature-schemas/{model_version}")
+async def get_feature_schema(customer_id: str, model_version: str, db: AsyncSession = Depends(get_tenant_db)):
+    """Feature order of a model version's packed contribution vectors (little-endian float32, NaN = no driver)."""
+    await _get_customer_or_404(db, customer_id)
+    features = await _feature_schema(db, model_version)
+    if features is None:
+        raise HTTPException(status_code=404, detail="Feature schema not found")
+    return {"model_version": model_version, "dtype": "<f4", "features": features}
 
 #@app.get("/customers/{customer_id}/patients/{patient_id}/nudges")
 #def get_nudges(customer_id: str, patient_id: str):
@@ -409,65 +1075,118 @@ def get_predictions(customer_id: str, patient_id: str):
      #   db.close()
 
 # --- Analytics ---
-@app.get("/analytics/customers/{customer_id}")
-def customer_analytics(customer_id: str):
-    db = SessionLocal()
-    try:
-        _get_customer_or_404(db, customer_id)
-        preds = (
-            db.query(Prediction)
-            .join(Patient, Patient.id == Prediction.patient_id)
-            .filter(Patient.customer_id == customer_id)
-            .all()
-        )
-        if not preds:
-            return {"msg": "no predictions yet"}
+def _rollup_payload(r) -> dict:
+    """Analytics body from a customer_risk_rollup row (or the same counters computed in SQL)."""
+    return {
+        "avg_risk": r.risk_sum / r.predictions,
+        "band_distribution": {"low": r.low, "medium": r.medium, "high": r.high},
+        "unique_patients": r.patients,
+        "total_predictions": r.predictions
+    }
 
-        avg_score = sum(p.risk_score for p in preds) / len(preds)
-        bands = {"low": 0, "medium": 0, "high": 0}
-        unique_patients = len({p.patient_id for p in preds})
-        for p in preds:
-            bands[p.band] += 1
+async def _aggregate_predictions(db: AsyncSession, customer_id: str) -> Optional[dict]:
+    """The all-time counters aggregated in SQL, for databases without the rollup trigger."""
+    scope = (
+        select(Prediction.patient_id, Prediction.risk_score, Prediction.band)
+        .join(Patient, Patient.id == Prediction.patient_id)
+        .where(Patient.customer_id == customer_id)
+        .subquery()
+    )
+    total, avg_risk, patients = (await db.execute(
+        select(func.count(), func.avg(scope.c.risk_score), func.count(distinct(scope.c.patient_id)))
+    )).one()
+    if not total:
+        return None
+    bands = {"low": 0, "medium": 0, "high": 0}
+    bands.update((await db.execute(select(scope.c.band, func.count()).group_by(scope.c.band))).all())
+    return {"avg_risk": avg_risk, "band_distribution": bands, "unique_patients": patients, "total_predictions": total}
 
-        return {
-            "avg_risk": avg_score,
-            "band_distribution": bands,
-            "unique_patients": unique_patients,
-            "total_predictions": len(preds)
-        }
-    finally:
-        db.close()
+
+@app.get("/analytics/customers/{customer_id}")
+async def customer_analytics(
+    customer_id: str,
+    bucket: Optional[str] = Query(None, pattern="^(day|week)$"),
+    limit: int = Query(30, ge=1, le=366),
+    db: AsyncSession = Depends(get_tenant_db),
+):
+    """All-time risk summary from the rollup (constant time); ?bucket=day|week adds the newest `limit` buckets."""
+    await _get_customer_or_404(db, customer_id)
+    total = await db.get(CustomerRiskRollup, (customer_id, "all", ""))
+    body = _rollup_payload(total) if total is not None else await _aggregate_predictions(db, customer_id)
+    if body is None:
+        return {"msg": "no predictions yet"}
+
+    if bucket:
+        rows = (
+            await db.scalars(
+                select(CustomerRiskRollup)
+                .where(CustomerRiskRollup.customer_id == customer_id, CustomerRiskRollup.granularity == bucket)
+                .order_by(CustomerRiskRollup.bucket_start.desc())
+                .limit(limit)
+            )
+        ).all()
+        body["buckets"] = [{"start": r.bucket_start, **_rollup_payload(r)} for r in rows]
+    return body
 
 @app.get("/analytics/patients/{customer_id}/{patient_id}")
-def patient_analytics(customer_id: str, patient_id: str):
-    db = SessionLocal()
-    try:
-        _get_patient_or_404(db, customer_id, patient_id)
-        preds = (
-            db.query(Prediction)
-            .filter_by(patient_id=patient_id)
-            .order_by(Prediction.timestamp.asc())
-            .all()
-        )
-        return [
-            {"timestamp": p.timestamp, "risk_score": p.risk_score, "band": p.band}
-            for p in preds
-        ]
-    finally:
-        db.close()
+async def patient_analytics(
+    customer_id: str,
+    patient_id: str,
+    band: Optional[str] = Query(None, pattern="^(low|medium|high)$"),
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_tenant_db),
+):
+    """
+    Risk over time, oldest first, including predictions archived to Parquet
+    (archive_predictions.py); the full history unless ?limit asks for keyset
+    pages (next page: ?cursor=<X-Next-Cursor>).
+    """
+    await _get_patient_or_404(db, customer_id, patient_id)
+    limit = _page_limit(limit, cursor)
+    after = _history_cursor(cursor) if cursor else None
+    # Queued rows are the newest, so they close the history; read before the table,
+    # as an entry only leaves the journal after its commit
+    queued = [] if not WRITE_BEHIND else [
+        _queued_prediction(e) for e in prediction_journal.pending(customer_id, patient_id)
+    ]
+    q = select(Prediction.id, Prediction.timestamp, Prediction.risk_score, Prediction.band).filter_by(patient_id=patient_id)
+    if band:
+        q = q.where(Prediction.band == band)
+        queued = [p for p in queued if p.band == band]
+    if after:
+        q = q.where(tuple_(Prediction.timestamp, Prediction.id) > after)
+        queued = [p for p in queued if (p.timestamp, p.id) > after]
+    preds = (await db.execute(
+        q.order_by(Prediction.timestamp.asc(), Prediction.id.asc()).limit(_fetch_limit(limit))
+    )).all()
+    if queued:
+        # An entry written since the journal was read shows up in both
+        stored = {p.id for p in preds}
+        preds = sorted(list(preds) + [p for p in queued if p.id not in stored], key=lambda p: (p.timestamp, p.id))
+
+    # ✅ Cold rows: only the archive files that can still hold rows after the cursor are opened
+    parts = (await db.execute(cold_parts_query(customer_id, after))).all()
+    if parts:
+        cold = await run_in_threadpool(read_cold_history, parts, patient_id, band, after, _fetch_limit(limit))
+        # A row archived while this page was read can show up in both
+        hot = {p.id for p in preds}
+        preds = sorted([p for p in cold if p.id not in hot] + list(preds), key=lambda p: (p.timestamp, p.id))
+    preds, next_cursor = _page(preds, limit, lambda p: (p.timestamp, p.id))
+    return _paged_response([
+        {"timestamp": p.timestamp, "risk_score": p.risk_score, "band": p.band}
+        for p in preds
+    ], next_cursor)
 
 # --- Chatbot ---
 @app.post("/chatbot/query")
-def chatbot_query(req: ChatbotRequest):
-    db = SessionLocal()
-    try:
-        p = db.query(Patient).filter(Patient.id == req.patient_id).first()
-        if not p:
-            raise HTTPException(status_code=404, detail="Patient not found")
-        return {
-            "patient_id": req.patient_id,
-            "response": f"Hypothetical: `{req.hypothetical_change}` may reduce risk. (Demo)"
-        }
-    finally:
-        db.close()
-
+async def chatbot_query(req: ChatbotRequest):
+    # Sharded deployments need the customer to find the patient
+    async with tenant_async_session(req.customer_id) as db:
+        p = await db.get(Patient, req.patient_id)
+    if not p:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    return {
+        "patient_id": req.patient_id,
+        "response": f"Hypothetical: `{req.hypothetical_change}` may reduce risk. (Demo)"
+    }
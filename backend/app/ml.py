@@ -1,80 +1,350 @@
-import pandas as pd
-import numpy as np
-import shap
-import json
+import hashlib
 import os
-from catboost import CatBoostClassifier
-
-# Load model
-MODEL_PATH = "stack/catboost_model.cbm"
-model = CatBoostClassifier()
-model.load_model(MODEL_PATH)
-
-# Load expected features
-with open("models/feature_names.json") as f:
-    EXPECTED_FEATURES = json.load(f)
-
-# Load categorical features (with fallback)
-if os.path.exists("models/cat_features.json"):
-    with open("models/cat_features.json") as f:
-        CAT_FEATURES = json.load(f)
-else:
-    CAT_FEATURES = [
-        "race", "gender", "weight", "payer_code", "medical_specialty",
-        "diag_1", "diag_2", "diag_3", "max_glu_serum", "A1Cresult",
-        "metformin", "repaglinide", "nateglinide", "chlorpropamide",
-        "glimepiride", "acetohexamide", "glipizide", "glyburide",
-        "tolbutamide", "pioglitazone", "rosiglitazone", "acarbose",
-        "miglitol", "troglitazone", "tolazamide", "examide",
-        "citoglipton", "insulin", "glyburide_metformin",
-        "glipizide_metformin", "glimepiride_pioglitazone",
-        "metformin_rosiglitazone", "metformin_pioglitazone",
-        "change", "diabetesMed"
-    ]
-
-def run_ml_model(input_json: dict):
-    """
-    Run CatBoost model on provided input.
-    - Missing categorical features → "missing"
-    - Missing numeric features → np.nan
-    - Gracefully ignore bad inputs (like string for numeric)
-    """
+import threading
+import time
+import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor
+from app.batching import MicroBatcher
+from app.cache import LRUCache
+from app.workers import InferencePool
+from app.config import (
+    MODEL_PATH, BATCH_ENABLED, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS,
+    PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL,
+    INFERENCE_WORKERS, INFERENCE_START_METHOD,
+    CASCADE_ENABLED, CASCADE_LR_PATH, CASCADE_BAND_LOW, CASCADE_BAND_HIGH,
+    EXPLAIN_TIER,
+)
+from app.features import FEATURE_NAMES_PATH, CAT_FEATURES_PATH, DEFAULT_CAT_FEATURES, FeaturePlan, load_json
 
-    row = {}
-    for f in EXPECTED_FEATURES:
-        val = input_json.get(f, None)
+# Explanation tiers, cheapest first: no attributions, approximate SHAP, full TreeSHAP
+EXPLAIN_TIERS = ("none", "fast", "exact")
+_SHAP_CALC_TYPE = {"fast": "Approximate", "exact": "Regular"}
 
-        if f in CAT_FEATURES:
-            row[f] = str(val) if val is not None and val == val else "missing"
-        else:
-            try:
-                row[f] = float(val) if val is not None else np.nan
-            except (ValueError, TypeError):
-                row[f] = np.nan
 
-    X = pd.DataFrame([row])
+def file_checksum(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
 
-    # Predict probability
-    prob = float(model.predict_proba(X)[:, 1][0])
 
-    # SHAP explanation
-    explainer = shap.TreeExplainer(model)
-    shap_values = explainer.shap_values(X)
-    feature_contribs = dict(zip(EXPECTED_FEATURES, shap_values[0]))
+def model_version_for(model_path: str, checksum: str) -> str:
+    """e.g. "catboost_model-dca8d522cd75": artifact name plus checksum prefix."""
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    return f"{name}-{checksum[:12]}"
 
-    # Only return drivers for features provided
-    top_features = {k: v for k, v in feature_contribs.items() if k in input_json}
 
-    # Risk band
+def band_for_probability(prob: float) -> str:
+    """Risk band on the raw model probability."""
     if prob < 0.33:
-        band = "low"
+        return "low"
     elif prob < 0.66:
-        band = "medium"
+        return "medium"
     else:
-        band = "high"
+        return "high"
+
+
+class InferenceEngine:
+    """
+    Loaded CatBoost model plus the compiled FeaturePlan needed to score
+    patients. Built once at startup and shared by every request; SHAP
+    contributions come from CatBoost's native ShapValues on the same Pool used
+    for predict_proba, so no explainer is rebuilt per call.
+    """
+
+    def __init__(self, model_path=MODEL_PATH,
+                 feature_names_path=FEATURE_NAMES_PATH,
+                 cat_features_path=CAT_FEATURES_PATH,
+                 cache_size=PREDICTION_CACHE_SIZE,
+                 cache_ttl=PREDICTION_CACHE_TTL):
+        self.feature_names = load_json(feature_names_path)
+        self.cat_features = load_json(cat_features_path, DEFAULT_CAT_FEATURES)
+        self.plan = FeaturePlan(self.feature_names, self.cat_features)
+
+        # (model_version, row digest) -> (raw probability, SHAP vector)
+        self.cache = LRUCache(cache_size, cache_ttl)
+        self.load(model_path)
+
+    def load(self, model_path: str):
+        """(Re)load the model; cached scores from the previous model are dropped."""
+        from catboost import CatBoostClassifier  # deferred: heavy import
+
+        model = CatBoostClassifier()
+        model.load_model(model_path)
+        reloading = hasattr(self, "model")
+        self.model = model
+        self.model_path = model_path
+        self.checksum = file_checksum(model_path)
+        self.model_version = model_version_for(model_path, self.checksum)
+        if reloading:
+            self.cache.clear()
+
+    def predict(self, input_json: dict) -> dict:
+        return self.predict_batch([input_json])[0]
+
+    def _score(self, num, cat, tier="exact"):
+        """
+        Raw probabilities and SHAP vectors at `tier` or better, served from the
+        cache where possible. Returns (probs, contribs, tiers); contribs[i] is
+        None when no attributions were needed.
+        """
+        need = EXPLAIN_TIERS.index(tier)
+        n = len(num)
+        keys = [(self.model_version, self.plan.row_key(num[i], cat[i])) for i in range(n)]
+        probs = np.empty(n)
+        contribs = [None] * n
+        quality = [0] * n
+        misses = []
+        for i, key in enumerate(keys):
+            # an exact entry also answers fast/none lookups, but not the other way round
+            hit = self.cache.get(key, accept=lambda entry: entry[2] >= need)
+            if hit is None:
+                misses.append(i)
+            else:
+                probs[i], contribs[i], quality[i] = hit
+
+        if misses:
+            pool = self.plan.pool_from_arrays(num[misses], cat[misses])
+            # Predict probability
+            miss_probs = self.model.predict_proba(pool)[:, 1]
+            miss_shap = None
+            if tier != "none":
+                # SHAP explanation (last column is the expected value, drop it)
+                miss_shap = self.model.get_feature_importance(
+                    pool, type="ShapValues", shap_calc_type=_SHAP_CALC_TYPE[tier]
+                )[:, :-1]
+            for j, i in enumerate(misses):
+                probs[i] = float(miss_probs[j])
+                # A copy: a row view would keep the whole batch's SHAP matrix alive in the cache
+                contribs[i] = miss_shap[j].copy() if miss_shap is not None else None
+                quality[i] = need
+                self.cache.put(keys[i], (probs[i], contribs[i], need))
+        return probs, contribs, [EXPLAIN_TIERS[q] for q in quality]
+
+    def predict_batch(self, inputs: list, tier: str = "exact") -> list:
+        """
+        Score many patients with one predict_proba and one ShapValues call.
+        `tier` picks the attributions: "exact" TreeSHAP, "fast" approximate
+        SHAP (or whatever is cached), "none" skips SHAP. Each result reports
+        the tier it actually got in "explanation_tier".
+        """
+        num, cat = self.plan.to_arrays(inputs)
+        # Only return drivers for features provided
+        return self.predict_arrays(num, cat, tier, [self.plan.provided(row) for row in inputs])
+
+    def predict_arrays(self, num, cat, tier: str = "exact", provided: list = None) -> list:
+        """
+        predict_batch() on already vectorized rows (e.g. read from the feature
+        store). Drivers are keyed per row as in `provided`, by default every
+        feature with a value under its column name.
+        """
+        probs, contribs, tiers = self._score(num, cat, tier)
+
+        results = []
+        for i, (prob, row_contribs, row_tier) in enumerate(zip(probs, contribs, tiers)):
+            prob = float(prob)
+            top_features = {}
+            if tier == "none":
+                row_tier = "none"  # no attributions on this tier, even when a cached SHAP vector exists
+            elif row_contribs is not None:
+                keys = provided[i] if provided is not None else self.plan.present(num[i], cat[i])
+                top_features = {key: row_contribs[j] for j, key in keys}
+            results.append({
+                "risk_score": prob,
+                "band": band_for_probability(prob),
+                "top_features": top_features,
+                "explanation_tier": row_tier,
+                "model_version": self.model_version
+            })
+        return results
+
+# The engine is loaded on first use or by warm_up() from the startup hook,
+# so importing the app stays cheap.
+_engine = None
+_engine_lock = threading.Lock()
+engine_status = {"state": "not_loaded", "load_seconds": None, "warmup_seconds": None, "error": None}
+
+
+def get_engine() -> InferenceEngine:
+    """Shared InferenceEngine, loading it now if warm-up has not finished."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine_status["state"] = "loading"
+                t0 = time.perf_counter()
+                try:
+                    _engine = InferenceEngine()
+                except Exception as e:
+                    engine_status.update(state="failed", error=repr(e))
+                    raise
+                engine_status.update(state="loaded", load_seconds=time.perf_counter() - t0, error=None)
+    return _engine
+
+
+_cascade = None
+
+
+def get_cascade():
+    """LR screen in front of CatBoost, loaded on first use (READM_CASCADE_ENABLED=1)."""
+    global _cascade
+    if _cascade is None:
+        with _engine_lock:
+            if _cascade is None:
+                from app.cascade import CascadeScorer, LRScreen
+                _cascade = CascadeScorer(LRScreen(CASCADE_LR_PATH), CASCADE_BAND_LOW, CASCADE_BAND_HIGH)
+    return _cascade
+
+
+def loaded_cascade():
+    return _cascade
+
+
+def loaded_engine():
+    """The engine if it is already loaded, else None (never triggers a load)."""
+    return _engine
+
+
+def swap_engine(engine: InferenceEngine):
+    """
+    Atomically make `engine` the serving engine. In-flight calls finish on the
+    engine they already hold; worker processes are first restarted on the new
+    model version and warmed, so no request lands on a cold worker.
+    """
+    global _engine
+    if inference_pool is not None:
+        inference_pool.load_model(engine.model_path, engine.model_version)
+    with _engine_lock:
+        _engine = engine
+        engine_status.update(state="ready", error=None)
+
+
+def serving_model_versions() -> set:
+    """
+    Versions that can produce a fresh prediction right now (CatBoost, plus the
+    LR screen in cascade mode). Never triggers a load: a model still warming
+    up is left out, so callers see a miss rather than block on it.
+    """
+    engine, cascade = loaded_engine(), loaded_cascade()
+    versions = {engine.model_version} if engine is not None else set()
+    if CASCADE_ENABLED and cascade is not None:
+        versions.add(cascade.screen.model_version)
+    return versions
+
+
+def warm_engine(engine: InferenceEngine) -> float:
+    """Run one dummy prediction through `engine`; returns the seconds it took."""
+    t0 = time.perf_counter()
+    engine.predict_batch([{}])
+    return time.perf_counter() - t0
+
+
+def warm_up():
+    """Load the engine and run one dummy prediction so the first request is not cold."""
+    try:
+        engine = get_engine()
+        warmup_seconds = warm_engine(engine)
+        if inference_pool is not None:
+            inference_pool.load_model(engine.model_path, engine.model_version)
+        if CASCADE_ENABLED:
+            get_cascade()
+    except Exception as e:
+        engine_status.update(state="failed", error=repr(e))
+        return
+    engine_status.update(state="ready", warmup_seconds=warmup_seconds)
+
+
+def start_warm_up() -> threading.Thread:
+    t = threading.Thread(target=warm_up, name="model-warm-up", daemon=True)
+    t.start()
+    return t
+
+
+# Optional pool of worker processes; scoring runs in-process when disabled
+inference_pool = (
+    InferencePool(INFERENCE_WORKERS, MODEL_PATH, INFERENCE_START_METHOD)
+    if INFERENCE_WORKERS > 0 else None
+)
+
+
+def _score_full(inputs: list, tier: str = "exact") -> list:
+    """CatBoost + SHAP, in the worker pool if configured, else in this process."""
+    if inference_pool is not None:
+        return inference_pool.score_batch(inputs, tier)
+    return get_engine().predict_batch(inputs, tier)
+
+
+def _score_full_many(inputs: list, chunk_size: int, tier: str = "exact") -> list:
+    chunks = [inputs[i:i + chunk_size] for i in range(0, len(inputs), chunk_size)]
+    if inference_pool is not None:
+        futures = [inference_pool.submit_batch(c, tier) for c in chunks]
+        return [r for f in futures for r in f.result()]
+    engine = get_engine()
+    return [r for c in chunks for r in engine.predict_batch(c, tier)]
+
+
+def score_matrix(num, cat, chunk_size: int = 2048, tier: str = "none") -> list:
+    """
+    Bulk scoring of feature-store rows, without building per-patient dicts.
+    The cascade's LR screen reads dicts, so callers use score_many() with it on.
+    """
+    chunks = [(num[i:i + chunk_size], cat[i:i + chunk_size]) for i in range(0, len(num), chunk_size)]
+    if inference_pool is not None:
+        futures = [inference_pool.submit_arrays(n, c, tier) for n, c in chunks]
+        return [r for f in futures for r in f.result()]
+    engine = get_engine()
+    return [r for n, c in chunks for r in engine.predict_arrays(n, c, tier)]
+
+
+def score_batch(inputs: list, tier: str = "exact") -> list:
+    """Score a batch, screening with the LR cascade first when enabled."""
+    if CASCADE_ENABLED:
+        return get_cascade().predict_batch(inputs, lambda rows: _score_full(rows, tier), tier)
+    return _score_full(inputs, tier)
+
+
+def score_many(inputs: list, chunk_size: int = 2048, tier: str = "exact") -> list:
+    """Bulk scoring; with a worker pool the chunks run in parallel across processes."""
+    if CASCADE_ENABLED:
+        return get_cascade().predict_batch(inputs, lambda rows: _score_full_many(rows, chunk_size, tier), tier)
+    return _score_full_many(inputs, chunk_size, tier)
+
+
+def _score_submitted(items: list) -> list:
+    """Batcher callback: items are (input, tier); each tier is scored in one call."""
+    by_tier = {}
+    for i, (_, tier) in enumerate(items):
+        by_tier.setdefault(tier, []).append(i)
+    results = [None] * len(items)
+    for tier, idx in by_tier.items():
+        for i, result in zip(idx, score_batch([items[i][0] for i in idx], tier)):
+            results[i] = result
+    return results
+
+
+# Batches in flight at once: one per worker process (the in-process engine scores one at a time)
+SCORING_CONCURRENCY = max(1, INFERENCE_WORKERS)
+
+# Concurrent /predict calls are coalesced into vectorized engine calls
+prediction_batcher = MicroBatcher(
+    _score_submitted,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS,
+    concurrency=SCORING_CONCURRENCY,
+)
+
+# READM_BATCH_ENABLED=0: each call is scored on its own, still off the caller's (event loop) thread
+_direct_scoring = ThreadPoolExecutor(max_workers=SCORING_CONCURRENCY, thread_name_prefix="scoring")
+
+
+def submit_ml_model(input_json: dict, tier: str = EXPLAIN_TIER) -> Future:
+    """Non-blocking variant of run_ml_model, for async route handlers."""
+    if BATCH_ENABLED:
+        return prediction_batcher.submit((input_json, tier))
+    return _direct_scoring.submit(lambda: score_batch([input_json], tier)[0])
+
 
-    return {
-        "risk_score": prob,
-        "band": band,
-        "top_features": top_features
-    }
+def run_ml_model(input_json: dict, tier: str = EXPLAIN_TIER):
+    """Run the shared CatBoost engine on provided input."""
+    return submit_ml_model(input_json, tier).result()
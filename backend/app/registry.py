@@ -0,0 +1,114 @@
+import glob
+import os
+import threading
+import time
+from datetime import datetime
+
+from app import ml
+from app.config import MODEL_DIR
+
+
+def _rss_bytes():
+    """Resident set size of this process (Linux /proc; None elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ModelRegistry:
+    """
+    Versioned CatBoost artifacts under MODEL_DIR (stack/*.cbm) with checksums,
+    plus background reload: the new model is loaded and warmed off the request
+    path, then swapped in atomically via ml.swap_engine().
+    """
+
+    def __init__(self, model_dir: str = MODEL_DIR):
+        self.model_dir = model_dir
+        self._checksums = {}  # path -> (mtime, size, sha256)
+        self._reload_lock = threading.Lock()
+        self._thread = None
+        self.last_reload = None
+
+    def _checksum(self, path: str) -> str:
+        st = os.stat(path)
+        cached = self._checksums.get(path)
+        if cached and cached[:2] == (st.st_mtime, st.st_size):
+            return cached[2]
+        checksum = ml.file_checksum(path)
+        self._checksums[path] = (st.st_mtime, st.st_size, checksum)
+        return checksum
+
+    def list_models(self) -> list:
+        active = ml.loaded_engine()
+        out = []
+        for path in sorted(glob.glob(os.path.join(self.model_dir, "*.cbm"))):
+            checksum = self._checksum(path)
+            version = ml.model_version_for(path, checksum)
+            st = os.stat(path)
+            out.append({
+                "name": os.path.splitext(os.path.basename(path))[0],
+                "version": version,
+                "path": path,
+                "sha256": checksum,
+                "size_bytes": st.st_size,
+                "modified": datetime.utcfromtimestamp(st.st_mtime),
+                "active": active is not None and active.model_version == version,
+            })
+        return out
+
+    def resolve(self, version: str) -> str:
+        """Artifact path for a name ("catboost_tuned") or full version string."""
+        for m in self.list_models():
+            if version in (m["name"], m["version"]):
+                return m["path"]
+        raise KeyError(version)
+
+    @property
+    def reloading(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start_reload(self, version: str) -> dict:
+        """Begin loading `version` in the background. Raises KeyError / RuntimeError."""
+        path = self.resolve(version)
+        with self._reload_lock:
+            if self.reloading:
+                raise RuntimeError("A model reload is already in progress")
+            self.last_reload = {"requested": version, "path": path, "state": "loading",
+                                "started_at": datetime.utcnow()}
+            self._thread = threading.Thread(target=self._reload, args=(path,), name="model-reload", daemon=True)
+            self._thread.start()
+        return self.last_reload
+
+    def wait(self, timeout: float = None) -> dict:
+        t = self._thread
+        if t is not None:
+            t.join(timeout)
+        return self.last_reload
+
+    def _reload(self, path: str):
+        status = self.last_reload
+        previous = ml.loaded_engine()
+        rss_before = _rss_bytes()
+        try:
+            t0 = time.perf_counter()
+            engine = ml.InferenceEngine(path)
+            status["load_seconds"] = time.perf_counter() - t0
+            status["warmup_seconds"] = ml.warm_engine(engine)
+            ml.swap_engine(engine)
+        except Exception as e:
+            status.update(state="failed", error=repr(e), finished_at=datetime.utcnow())
+            return
+
+        rss_after = _rss_bytes()
+        status.update(
+            state="active",
+            previous_version=previous.model_version if previous is not None else None,
+            model_version=engine.model_version,
+            rss_delta_mb=(rss_after - rss_before) / 2**20 if rss_before is not None and rss_after is not None else None,
+            finished_at=datetime.utcnow(),
+        )
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,240 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import SHARDING_ENABLED, SHARD_DIR, SHARD_MAX_OPEN, SHARD_POOL_SIZE
+from app.db import AsyncSessionLocal, SessionLocal, Customer, init_schema, make_async_engine, make_engine
+
+
+def shard_filename(customer_id: str) -> str:
+    """Filesystem-safe file name for a customer's shard; the hash keeps sanitized ids from colliding."""
+    safe = re.sub(r"[^A-Za-z0-9_-]", "_", customer_id)[:48]
+    return f"{safe}-{hashlib.sha256(customer_id.encode()).hexdigest()[:8]}.db"
+
+
+class PinnedSession(Session):
+    """Sync shard session that releases its shard pin (info["unpin"]) when closed."""
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            unpin = self.info.pop("unpin", None)
+            if unpin is not None:
+                unpin()
+
+
+class Shard:
+    """
+    One customer's database file: the full schema (including a copy of its
+    Customer row), a sync engine for background threads and an async engine
+    for request handlers. `pins` counts the sessions using it (guarded by the
+    router's lock); `checked_out` counts connections in use on both engines.
+    """
+
+    def __init__(self, customer_id: str, path: str, pool_size: int = SHARD_POOL_SIZE):
+        self.customer_id = customer_id
+        self.path = path
+        self.engine = make_engine(f"sqlite:///{path}")
+        init_schema(self.engine)
+        self.async_engine = make_async_engine(f"sqlite+aiosqlite:///{path}", pool_size=pool_size)
+        self.Session = sessionmaker(bind=self.engine, class_=PinnedSession, autoflush=False, autocommit=False)
+        self.AsyncSession = async_sessionmaker(self.async_engine, autoflush=False, expire_on_commit=False)
+
+        self.pins = 0
+        self.checked_out = 0
+        self._lock = threading.Lock()
+        for eng in (self.engine, self.async_engine.sync_engine):
+            event.listen(eng, "checkout", self._on_checkout)
+            event.listen(eng, "checkin", self._on_checkin)
+
+    def _on_checkout(self, *_):
+        with self._lock:
+            self.checked_out += 1
+
+    def _on_checkin(self, *_):
+        with self._lock:
+            self.checked_out -= 1
+
+    async def dispose(self):
+        await self.async_engine.dispose()
+        self.engine.dispose()
+
+
+class TenantRouter:
+    """
+    Maps customer_id -> Shard, opening shard files lazily. Callers pin() a
+    shard for as long as they use it and unpin() it afterwards. At most
+    `max_open` shards keep engines open; past that the least recently used
+    unpinned shard is retired, and its pools are closed on the next reap()
+    (async engines can only be disposed from the event loop).
+    """
+
+    def __init__(self, shard_dir: str = SHARD_DIR, max_open: int = SHARD_MAX_OPEN):
+        self.shard_dir = shard_dir
+        self.max_open = max(1, max_open)
+        self._shards = OrderedDict()
+        self._retired = []
+        self._creating = {}  # customer_id -> [lock held while its shard is opened, threads using the lock]
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.evicted = 0
+
+    def path_for(self, customer_id: str) -> str:
+        return os.path.join(self.shard_dir, shard_filename(customer_id))
+
+    def pin(self, customer_id: str, create: bool = True):
+        """
+        The customer's shard, pinned until unpin(): it is not retired while
+        pinned. Creates the file and schema on first use (blocking); with
+        create=False returns None instead of opening it.
+        """
+        shard = self._pin_open(customer_id)
+        if shard is not None or not create:
+            return shard
+        # Opening a shard (file, schema, backfills) only holds up callers for the
+        # same customer: the router lock is taken just to insert it
+        with self._lock:
+            creating = self._creating.setdefault(customer_id, [threading.Lock(), 0])
+            creating[1] += 1
+        try:
+            with creating[0]:
+                shard = self._pin_open(customer_id)  # opened while this thread waited
+                if shard is not None:
+                    return shard
+                os.makedirs(self.shard_dir, exist_ok=True)
+                shard = Shard(customer_id, self.path_for(customer_id))
+                with self._lock:
+                    self._shards[customer_id] = shard
+                    self.opened += 1
+                    shard.pins += 1
+                    self._evict_idle()
+                return shard
+        finally:
+            with self._lock:
+                creating[1] -= 1
+                if not creating[1]:
+                    del self._creating[customer_id]
+
+    def _pin_open(self, customer_id: str):
+        with self._lock:
+            shard = self._shards.get(customer_id)
+            if shard is None:
+                return None
+            self._shards.move_to_end(customer_id)
+            shard.pins += 1
+            self._evict_idle()
+            return shard
+
+    def unpin(self, shard: Shard):
+        with self._lock:
+            shard.pins -= 1
+            self._evict_idle()  # shards kept past max_open while pinned
+
+    def session(self, customer_id: str) -> PinnedSession:
+        """Sync session on the customer's shard, which stays pinned until the session is closed."""
+        shard = self.pin(customer_id)
+        try:
+            db = shard.Session()
+        except Exception:
+            self.unpin(shard)
+            raise
+        db.info["unpin"] = lambda: self.unpin(shard)
+        return db
+
+    def _evict_idle(self):
+        if len(self._shards) <= self.max_open:
+            return
+        for customer_id in list(self._shards):
+            if len(self._shards) <= self.max_open:
+                return
+            shard = self._shards[customer_id]
+            if shard.pins == 0:
+                self._retired.append(self._shards.pop(customer_id))
+                self.evicted += 1
+
+    async def reap(self):
+        """Close the pools of retired shards."""
+        with self._lock:
+            retired, self._retired = self._retired, []
+        for shard in retired:
+            await shard.dispose()
+
+    async def close(self):
+        with self._lock:
+            self._retired.extend(self._shards.values())
+            self._shards.clear()
+        await self.reap()
+
+    def existing_customers(self, customer_ids) -> list:
+        """The customers among `customer_ids` that already have a shard file."""
+        return [c for c in customer_ids if os.path.exists(self.path_for(c))]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "open": len(self._shards),
+                "max_open": self.max_open,
+                "pinned": sum(s.pins for s in self._shards.values()),
+                "checked_out": sum(s.checked_out for s in self._shards.values()),
+                "opened": self.opened,
+                "evicted": self.evicted,
+            }
+
+
+tenant_router = TenantRouter()
+_known_customers = set()  # customers never get deleted, so a positive catalog lookup is cached
+
+
+async def _customer_exists(customer_id: str) -> bool:
+    if customer_id in _known_customers:
+        return True
+    async with AsyncSessionLocal() as catalog:
+        if await catalog.get(Customer, customer_id) is None:
+            return False
+    _known_customers.add(customer_id)
+    return True
+
+
+@asynccontextmanager
+async def tenant_async_session(customer_id: str):
+    """AsyncSession on the customer's shard; the shared database if not sharded."""
+    if not SHARDING_ENABLED or customer_id is None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+    shard = tenant_router.pin(customer_id, create=False) or await run_in_threadpool(tenant_router.pin, customer_id)
+    try:
+        await tenant_router.reap()
+        async with shard.AsyncSession() as db:
+            yield db
+    finally:
+        tenant_router.unpin(shard)
+
+
+async def get_tenant_db(customer_id: str):
+    """
+    FastAPI dependency for routes with a {customer_id} path parameter:
+    the session is bound to that customer's shard. Unknown customers are a
+    404 before any shard file is created.
+    """
+    if SHARDING_ENABLED and not await _customer_exists(customer_id):
+        raise HTTPException(status_code=404, detail="Customer not found")
+    async with tenant_async_session(customer_id) as db:
+        yield db
+
+
+def tenant_session(customer_id: str = None):
+    """Sync session on the customer's shard, for background threads; the shared database if not sharded. Close it."""
+    if not SHARDING_ENABLED or customer_id is None:
+        return SessionLocal()
+    return tenant_router.session(customer_id)
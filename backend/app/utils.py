@@ -1,3 +1,5 @@
+import hashlib
+import json
 import random
 
 def demo_rescale(score: float) -> float:
@@ -16,4 +18,9 @@ def band_from_score(score: float) -> str:
     elif score < 0.6:
         return "medium"
     else:
-        return "high"
\ No newline at end of file
+        return "high"
+
+def details_fingerprint(details: dict) -> str:
+    """Stable hash of a patient's details, used to skip re-scoring unchanged profiles."""
+    canonical = json.dumps(details or {}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
@@ -0,0 +1,198 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Engine used inside each worker process, and the barrier its pool's rendezvous tasks meet at
+_worker_engine = None
+_worker_barrier = None
+
+
+def _init_worker(model_path: str, model_version, barrier):
+    """
+    Load and warm the model once per worker. A worker pool serves exactly one
+    model version: a hot swap starts new workers instead of reloading in place.
+    With the fork start method the parent's already-loaded engine is inherited
+    and shared copy-on-write.
+    """
+    global _worker_engine, _worker_barrier
+    from app import ml
+    engine = ml.loaded_engine()
+    if engine is None or engine.model_path != model_path or (
+            model_version is not None and engine.model_version != model_version):
+        engine = ml.InferenceEngine(model_path)
+    if model_version is not None and engine.model_version != model_version:
+        # The artifact was rewritten after the parent loaded it
+        raise RuntimeError(f"{model_path} is {engine.model_version}, expected {model_version}")
+    ml.warm_engine(engine)
+    _worker_engine, _worker_barrier = engine, barrier
+
+
+def _score_batch_in_worker(inputs: list, tier: str = "exact") -> list:
+    return _worker_engine.predict_batch(inputs, tier)
+
+
+def _score_arrays_in_worker(num, cat, tier: str = "none") -> list:
+    return _worker_engine.predict_arrays(num, cat, tier)
+
+
+def _rendezvous(timeout: float) -> int:
+    """
+    Wait until every worker of the pool is running one of these. A worker
+    blocked here takes no other task, so `workers` of them land on `workers`
+    distinct, started (hence warmed) processes.
+    """
+    _worker_barrier.wait(timeout)
+    return os.getpid()
+
+
+class InferencePool:
+    """
+    Pool of worker processes running InferenceEngine.predict_batch, so CatBoost
+    and SHAP work scales across cores instead of competing for the API
+    process's GIL. A crashed worker breaks the executor; the pool is then
+    rebuilt and the call retried once. load_model() moves the pool to another
+    model version without sending requests to cold workers.
+    """
+
+    def __init__(self, workers: int, model_path: str, start_method: str = "forkserver", model_version: str = None):
+        self.workers = workers
+        self.model_path = model_path
+        self.model_version = model_version  # None: whatever model is at model_path
+        self.start_method = start_method
+        self._executor = None
+        self._lock = threading.Lock()
+        self._health_lock = threading.Lock()  # one rendezvous at a time: each needs every worker
+        self.restarts = 0
+        self.model_loads = 0
+        self.tasks = 0
+        self.failures = 0
+
+    def _new_executor(self, model_path: str, model_version):
+        context = multiprocessing.get_context(self.start_method)
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(model_path, model_version, context.Barrier(self.workers)),
+        )
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._new_executor(self.model_path, self.model_version)
+            return self._executor
+
+    def _rendezvous(self, executor, timeout: float) -> set:
+        """One barrier task per worker; the pids of all workers once each has started."""
+        futures = [executor.submit(_rendezvous, timeout) for _ in range(self.workers)]
+        return {f.result(timeout=2 * timeout) for f in futures}
+
+    def load_model(self, model_path: str, model_version: str, timeout: float = 120.0):
+        """
+        Start workers on `model_version` and wait until every one has loaded and
+        warmed it, then send new batches to them. Batches already queued finish
+        on the previous workers, which exit afterwards.
+        """
+        executor = self._new_executor(model_path, model_version)
+        try:
+            self._rendezvous(executor, timeout)
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        with self._lock:
+            previous, self._executor = self._executor, executor
+            self.model_path, self.model_version = model_path, model_version
+            self.model_loads += 1
+        if previous is not None:
+            previous.shutdown(wait=False)
+
+    def _restart(self, broken):
+        with self._lock:
+            # Another caller may already have replaced the broken executor
+            if self._executor is not broken:
+                return
+            self._executor = None
+            self.restarts += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, fn, *args, retries: int = 1) -> Future:
+        """Run `fn(*args)` in a worker; restart the pool and retry if it crashed."""
+        outer = Future()
+        self.tasks += 1
+
+        def attempt(remaining):
+            executor = self._get_executor()
+            try:
+                inner = executor.submit(fn, *args)
+            except (BrokenProcessPool, RuntimeError) as e:
+                return on_broken(executor, remaining, e)
+
+            def done(f):
+                try:
+                    outer.set_result(f.result())
+                except BrokenProcessPool as e:
+                    on_broken(executor, remaining, e)
+                except BaseException as e:
+                    self.failures += 1
+                    outer.set_exception(e)
+            inner.add_done_callback(done)
+
+        def on_broken(executor, remaining, e):
+            self._restart(executor)
+            if remaining > 0:
+                attempt(remaining - 1)
+            else:
+                self.failures += 1
+                outer.set_exception(e)
+
+        attempt(retries)
+        return outer
+
+    def submit_batch(self, inputs: list, tier: str = "exact") -> Future:
+        return self.submit(_score_batch_in_worker, inputs, tier)
+
+    def submit_arrays(self, num, cat, tier: str = "none") -> Future:
+        return self.submit(_score_arrays_in_worker, num, cat, tier)
+
+    def score_batch(self, inputs: list, tier: str = "exact") -> list:
+        return self.submit_batch(inputs, tier).result()
+
+    def health(self, timeout: float = 5.0) -> dict:
+        """Ping each worker exactly once (one barrier task per worker); a pool that cannot answer is restarted."""
+        t0 = time.perf_counter()
+        pids, error = set(), None
+        with self._health_lock:
+            executor = self._get_executor()
+            try:
+                pids = self._rendezvous(executor, timeout)
+            except Exception as e:
+                error = repr(e)
+                self._restart(executor)
+        return {
+            "healthy": error is None,
+            "workers": self.workers,
+            "responding_pids": sorted(pids),
+            "latency_ms": (time.perf_counter() - t0) * 1000,
+            "error": error,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "start_method": self.start_method,
+            "model_version": self.model_version,
+            "started": self._executor is not None,
+            "model_loads": self.model_loads,
+            "tasks": self.tasks,
+            "failures": self.failures,
+            "restarts": self.restarts,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,67 @@
+"""
+Move predictions older than READM_ARCHIVE_AFTER_DAYS, with their nudges, out
+of each customer's database into zstd Parquet files under READM_ARCHIVE_DIR
+(predictions/ and nudges/, partitioned customer=<id>/month=YYYY-MM), recorded
+in prediction_archive. Patient analytics reads them back transparently; each
+patient's newest prediction always stays hot. Safe to run alongside the API
+(e.g. nightly); --vacuum then returns the freed pages to the filesystem.
+
+Run from backend/:
+    python archive_predictions.py                 # every customer
+    python archive_predictions.py --customer CUST1 --days 90 --vacuum
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, text
+
+from app.archive import MIN_AGE_DAYS, archive_customer
+from app.config import ARCHIVE_AFTER_DAYS, ARCHIVE_DIR
+from app.db import Customer, SessionLocal, engine, init_schema
+from app.shards import tenant_session
+
+
+def main(customer_ids: list, days: int, vacuum: bool, archive_dir: str = ARCHIVE_DIR):
+    if days < MIN_AGE_DAYS:
+        raise SystemExit(f"--days must be at least {MIN_AGE_DAYS} (the day/week rollups would lose rows)")
+    init_schema(engine)
+    db = SessionLocal()
+    try:
+        all_ids = db.scalars(select(Customer.id).order_by(Customer.id)).all()
+    finally:
+        db.close()
+    unknown = set(customer_ids or []) - set(all_ids)
+    if unknown:
+        raise SystemExit(f"Unknown customers: {sorted(unknown)}")
+
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    binds = {}
+    for customer_id in customer_ids or all_ids:
+        t0 = time.perf_counter()
+        db = tenant_session(customer_id)
+        try:
+            counts = archive_customer(db, customer_id, cutoff, archive_dir)
+            binds[str(db.get_bind().url)] = db.get_bind()
+        finally:
+            db.close()
+        print(f"{customer_id}: {counts['predictions']} predictions, {counts['nudges']} nudges older than "
+              f"{cutoff:%Y-%m-%d} -> {counts['months']} month(s), {counts['bytes'] / 1024:.0f} KB "
+              f"({time.perf_counter() - t0:.2f}s)")
+
+    if vacuum:
+        for url, bind in binds.items():
+            t0 = time.perf_counter()
+            with bind.connect() as conn:
+                conn.execute(text("VACUUM"))
+            print(f"vacuumed {url} ({time.perf_counter() - t0:.2f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old predictions and nudges to Parquet")
+    parser.add_argument("--customer", action="append", dest="customers", help="archive only this customer (repeatable)")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS, help="defaults to READM_ARCHIVE_AFTER_DAYS")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM each database afterwards")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR, help="defaults to READM_ARCHIVE_DIR")
+    args = parser.parse_args()
+    main(args.customers, args.days, args.vacuum, args.archive_dir)
@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# Benchmarks never touch the checked-in database: those that do not set up their own get a scratch one
+_scratch = tempfile.mkdtemp(prefix="readm-bench-")
+os.environ.setdefault("READM_DATABASE_URL", f"sqlite:///{_scratch}/readm.db")
+os.environ.setdefault("READM_SHARD_DIR", f"{_scratch}/shards")
+os.environ.setdefault("READM_ARCHIVE_DIR", f"{_scratch}/archive")
+os.environ.setdefault("READM_EXPLAIN_CACHE_PATH", f"{_scratch}/explanation_cache.db")
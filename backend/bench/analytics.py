@@ -0,0 +1,145 @@
+"""
+Customer analytics as history grows: the old handler (fetch every
+prediction row, aggregate in Python loops), the same numbers aggregated in
+SQL, and the customer_risk_rollup read the endpoint now does. Also checks
+the trigger-maintained counters against a recomputation and measures what
+the predictions triggers cost on bulk inserts.
+
+Run from backend/:  python -m bench.analytics --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp()
+os.environ["READM_DATABASE_URL"] = f"sqlite:///{_tmpdir}/import.db"
+
+from sqlalchemy import distinct, func, insert, select, text
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Customer, CustomerRiskRollup, Patient, Prediction, init_schema, make_engine
+
+PATIENTS = 2000
+DAYS = 180
+CHUNK = 50000
+
+
+def _rows(n: int, rng: random.Random, start: datetime) -> list:
+    rows = []
+    for _ in range(n):
+        score = rng.random()
+        rows.append({"id": str(uuid.uuid4()), "patient_id": f"p{rng.randrange(PATIENTS)}", "risk_score": score,
+                     "band": "low" if score < 0.4 else "medium" if score < 0.7 else "high", "top_features": {},
+                     "explanation": "-", "timestamp": start + timedelta(seconds=rng.randrange(DAYS * 86400))})
+    return rows
+
+
+def _seed(path: str, n: int, triggers: bool = True) -> tuple:
+    """Fresh database with `n` predictions for one customer; returns (engine, insert seconds)."""
+    eng = make_engine(f"sqlite:///{path}")
+    init_schema(eng)
+    rng = random.Random(n)
+    with eng.begin() as conn:
+        if not triggers:
+            # Baseline: what the same inserts cost without maintaining patient_latest_risk and the rollups
+            conn.execute(text("DROP TRIGGER trg_predictions_latest_risk"))
+            conn.execute(text("DROP TRIGGER trg_predictions_rollup"))
+        conn.execute(insert(Customer), [{"id": "bench", "name": "Bench"}])
+        conn.execute(insert(Patient), [{"id": f"p{i}", "name": "P", "details": {}, "customer_id": "bench"}
+                                       for i in range(PATIENTS)])
+    start = datetime(2025, 1, 1)
+    t0 = time.perf_counter()
+    for done in range(0, n, CHUNK):
+        with eng.begin() as conn:
+            conn.execute(insert(Prediction), _rows(min(CHUNK, n - done), rng, start))
+    return eng, time.perf_counter() - t0
+
+
+def python_loops(db) -> dict:
+    preds = db.execute(
+        select(Prediction.patient_id, Prediction.risk_score, Prediction.band)
+        .join(Patient, Patient.id == Prediction.patient_id)
+        .where(Patient.customer_id == "bench")
+    ).all()
+    bands = {"low": 0, "medium": 0, "high": 0}
+    for p in preds:
+        bands[p.band] += 1
+    return {"total": len(preds), "avg": sum(p.risk_score for p in preds) / len(preds),
+            "patients": len({p.patient_id for p in preds}), "bands": bands}
+
+
+def sql_aggregate(db) -> dict:
+    scope = (select(Prediction.patient_id, Prediction.risk_score, Prediction.band)
+             .join(Patient, Patient.id == Prediction.patient_id)
+             .where(Patient.customer_id == "bench").subquery())
+    total, avg, patients = db.execute(
+        select(func.count(), func.avg(scope.c.risk_score), func.count(distinct(scope.c.patient_id)))).one()
+    bands = {"low": 0, "medium": 0, "high": 0}
+    bands.update(db.execute(select(scope.c.band, func.count()).group_by(scope.c.band)).all())
+    return {"total": total, "avg": avg, "patients": patients, "bands": bands}
+
+
+def rollup(db) -> dict:
+    r = db.get(CustomerRiskRollup, ("bench", "all", ""))
+    return {"total": r.predictions, "avg": r.risk_sum / r.predictions, "patients": r.patients,
+            "bands": {"low": r.low, "medium": r.medium, "high": r.high}}
+
+
+def _check_buckets(conn):
+    """Trigger-maintained day/week counters against a GROUP BY over predictions."""
+    for granularity, expr in (("day", "date(timestamp)"), ("week", "date(timestamp, 'weekday 0', '-6 days')")):
+        expected = conn.execute(text(
+            f"SELECT {expr}, COUNT(*), COUNT(DISTINCT patient_id), SUM(band = 'high') FROM predictions GROUP BY 1"
+        )).all()
+        stored = conn.execute(text(
+            "SELECT bucket_start, predictions, patients, high FROM customer_risk_rollup "
+            "WHERE granularity = :g ORDER BY bucket_start"), {"g": granularity}).all()
+        assert [tuple(r) for r in expected] == [tuple(r) for r in stored], granularity
+
+
+def _timed(fn, Session, repeat: int) -> tuple:
+    waits = []
+    for _ in range(repeat):
+        db = Session()
+        try:
+            t0 = time.perf_counter()
+            out = fn(db)
+            waits.append(time.perf_counter() - t0)
+        finally:
+            db.close()
+    return out, statistics.median(waits) * 1000
+
+
+def main(sizes: list, repeat: int):
+    print(f"{PATIENTS} patients, predictions spread over {DAYS} days; median of {repeat} runs")
+    print(f"{'predictions':>12}{'python ms':>12}{'sql ms':>10}{'rollup ms':>11}{'insert/s':>11}{'no trig/s':>11}")
+    for n in sizes:
+        eng, seconds = _seed(f"{_tmpdir}/a{n}.db", n)
+        Session = sessionmaker(bind=eng)
+        results = {}
+        for name, fn in (("python", python_loops), ("sql", sql_aggregate), ("rollup", rollup)):
+            results[name] = _timed(fn, Session, repeat if name != "python" or n < 500000 else max(1, repeat // 5))
+        outs = [out for out, _ in results.values()]
+        assert all(o["total"] == outs[0]["total"] and o["patients"] == outs[0]["patients"]
+                   and o["bands"] == outs[0]["bands"] and abs(o["avg"] - outs[0]["avg"]) < 1e-9 for o in outs)
+        with eng.connect() as conn:
+            _check_buckets(conn)
+        eng.dispose()
+
+        bare, bare_seconds = _seed(f"{_tmpdir}/b{n}.db", n, triggers=False)
+        bare.dispose()
+        print(f"{n:>12}{results['python'][1]:>12.2f}{results['sql'][1]:>10.2f}{results['rollup'][1]:>11.3f}"
+              f"{n / seconds:>11.0f}{n / bare_seconds:>11.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Customer analytics: Python loops vs SQL aggregation vs rollups")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    main(args.sizes, args.repeat)
@@ -0,0 +1,149 @@
+"""
+Hot/cold tiering: a customer with two years of predictions (and a nudge
+each), before and after archive_predictions moves everything older than
+READM_ARCHIVE_AFTER_DAYS to Parquet. Reports the database file size (after
+VACUUM) and the predictions/nudges share of it (dbstat) against the archive
+size, the archive run time, and patient analytics pages read through
+TestClient: the oldest page (now served from Parquet), a page in the hot
+range (no archive file opened) and a full walk of one patient's history.
+Checks that every page is identical before and after.
+
+Run from backend/:  python -m bench.archive --predictions 300000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp()
+os.environ["READM_DATABASE_URL"] = f"sqlite:///{_tmpdir}/readm.db"
+os.environ["READM_ARCHIVE_DIR"] = f"{_tmpdir}/archive"
+os.environ["READM_WRITE_BEHIND"] = "0"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, text
+
+import archive_predictions
+from app.config import ARCHIVE_AFTER_DAYS
+from app.db import Customer, Nudge, Patient, Prediction, SessionLocal, engine, init_schema
+from bench.fixtures import patient_population
+
+PATIENTS = 2000
+DAYS = 730
+CHUNK = 20000
+PAGE = 100
+
+
+def _seed(n: int):
+    rng = random.Random(5)
+    details = patient_population(200)
+    now = datetime.utcnow()
+    init_schema(engine)
+    db = SessionLocal()
+    try:
+        db.execute(insert(Customer), [{"id": "bench", "name": "Bench"}])
+        db.execute(insert(Patient), [{"id": f"p{i:05d}", "name": "P", "details": details[i % len(details)],
+                                      "customer_id": "bench"} for i in range(PATIENTS)])
+        for start in range(0, n, CHUNK):
+            preds, nudges = [], []
+            for i in range(start, min(n, start + CHUNK)):
+                pred_id = str(uuid.uuid4())
+                ts = now - timedelta(minutes=rng.randrange(DAYS * 24 * 60))
+                preds.append({"id": pred_id, "patient_id": f"p{i % PATIENTS:05d}", "risk_score": rng.random(),
+                              "band": rng.choice(["low", "medium", "high"]),
+                              "top_features": {"number_inpatient": rng.gauss(0, 0.3), "age": rng.gauss(0, 0.3)},
+                              "explanation": "- bench explanation", "explanation_status": "ready",
+                              "features_hash": "0" * 16, "model_version": "bench", "explanation_tier": "fast",
+                              "timestamp": ts})
+                nudges.append({"prediction_id": pred_id, "suggestion": "Schedule a follow-up call",
+                               "category": "follow_up", "timestamp": ts})
+            db.execute(insert(Prediction), preds)
+            db.execute(insert(Nudge), nudges)
+            db.commit()
+    finally:
+        db.close()
+
+
+def _sizes() -> tuple:
+    """(database file MB after VACUUM, predictions + nudges tables and indexes MB)."""
+    with engine.connect() as conn:
+        conn.execute(text("VACUUM"))
+        tables = conn.execute(text(
+            "SELECT SUM(pgsize) FROM dbstat WHERE name IN ('predictions', 'nudges') OR name LIKE 'ix_predictions%' "
+            "OR name LIKE 'ix_nudges%' OR name LIKE 'sqlite_autoindex_predictions%'"
+        )).scalar_one()
+    return os.path.getsize(f"{_tmpdir}/readm.db") / 2**20, tables / 2**20
+
+
+def _walk(client, url: str) -> list:
+    out, cursor = [], None
+    while True:
+        r = client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        assert r.status_code == 200, r.text
+        out.append(r.json())
+        cursor = r.headers.get("x-next-cursor")
+        if not cursor:
+            return out
+
+
+def _timed(fetch, repeat: int) -> tuple:
+    waits = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        body = fetch()
+        waits.append(time.perf_counter() - t0)
+    return body, statistics.median(waits) * 1000
+
+
+def _cases(client, hot_cursor: str) -> dict:
+    base = f"/analytics/patients/bench/p00007?limit={PAGE}"
+    return {
+        "oldest page": lambda: [client.get(base).json()],
+        "page in hot range": lambda: [client.get(f"{base}&cursor={hot_cursor}").json()],
+        "oldest page, band=high": lambda: [client.get(f"{base}&band=high").json()],
+        "full history walk": lambda: _walk(client, base),
+    }
+
+
+def main(n: int, repeat: int):
+    import app.main as api
+
+    _seed(n)
+    print(f"{n} predictions + {n} nudges over {DAYS} days, {PATIENTS} patients; "
+          f"archive after {ARCHIVE_AFTER_DAYS} days; median of {repeat}")
+    db_mb, tables_mb = _sizes()
+    print(f"before: database {db_mb:.1f} MB (predictions + nudges {tables_mb:.1f} MB)")
+
+    with TestClient(api.app) as client:
+        # A cursor a month past the archive cutoff, so the page after it is entirely hot
+        hot_cursor = api._encode_cursor(datetime.utcnow() - timedelta(days=ARCHIVE_AFTER_DAYS - 30), "")
+        before = {name: _timed(fetch, repeat) for name, fetch in _cases(client, hot_cursor).items()}
+
+        t0 = time.perf_counter()
+        archive_predictions.main(["bench"], ARCHIVE_AFTER_DAYS, vacuum=False)
+        archive_s = time.perf_counter() - t0
+        db_mb, tables_mb = _sizes()
+        archive_mb = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(f"{_tmpdir}/archive")
+                         for f in files) / 2**20
+        print(f"after:  database {db_mb:.1f} MB (predictions + nudges {tables_mb:.1f} MB), "
+              f"Parquet archive {archive_mb:.1f} MB; archive run {archive_s:.2f}s")
+
+        after = {name: _timed(fetch, repeat) for name, fetch in _cases(client, hot_cursor).items()}
+
+    print(f"{'patient analytics':28}{'all hot ms':>12}{'hot+cold ms':>13}{'pages':>7}")
+    for name, (body, ms) in before.items():
+        cold_body, cold_ms = after[name]
+        assert body == cold_body, name
+        print(f"{name:28}{ms:>12.2f}{cold_ms:>13.2f}{len(body):>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Predictions history before/after archiving to Parquet")
+    parser.add_argument("--predictions", type=int, default=300000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.predictions, args.repeat)
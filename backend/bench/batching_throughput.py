@@ -0,0 +1,71 @@
+"""
+Throughput and tail latency of run_ml_model under a bursty concurrent load,
+unbatched (one engine call per request) vs. the MicroBatcher.
+
+Run from backend/:  python -m bench.batching_throughput --clients 48 --requests 20
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from app.batching import MicroBatcher
+from app.ml import get_engine
+from bench.fixtures import PATIENT
+
+
+def _burst(score, clients: int, per_client: int):
+    latencies = []
+    lock = threading.Lock()
+    start = threading.Barrier(clients)
+
+    def worker(i):
+        row = dict(PATIENT, number_inpatient=i % 7)
+        start.wait()
+        local = []
+        for _ in range(per_client):
+            t0 = time.perf_counter()
+            score(row)
+            local.append((time.perf_counter() - t0) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": latencies[len(latencies) // 2],
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "mean": statistics.fmean(latencies),
+    }
+
+
+def main(clients: int, per_client: int, max_batch_size: int, max_wait_ms: float):
+    inference_engine = get_engine()
+    inference_engine.predict(PATIENT)  # warm-up
+    unbatched = _burst(inference_engine.predict, clients, per_client)
+
+    batcher = MicroBatcher(inference_engine.predict_batch, max_batch_size, max_wait_ms)
+    batched = _burst(batcher.score, clients, per_client)
+
+    print(f"{'':10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, s in (("unbatched", unbatched), ("batched", batched)):
+        print(f"{name:10}{s['rps']:>10.1f}{s['p50']:>10.2f}{s['p99']:>10.2f}")
+    print("batcher:", batcher.stats())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the /predict micro-batcher")
+    parser.add_argument("--clients", type=int, default=48)
+    parser.add_argument("--requests", type=int, default=20, help="requests per client")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    main(args.clients, args.requests, args.max_batch_size, args.max_wait_ms)
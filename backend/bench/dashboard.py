@@ -0,0 +1,109 @@
+"""
+The dashboard page load before and after patient_latest_risk:
+
+- n+1: GET /customers/{id}/patients, then GET /analytics/patients/{id}/{pid}
+  for every patient (whole history, client keeps the last row), as
+  Dashboard.jsx used to
+- dashboard: one GET /customers/{id}/dashboard
+
+plus the latest-band lookup of GET /customers/{id}/patients/{pid}: the old
+ORDER BY on predictions without the composite index, with it, and the
+patient_latest_risk primary-key read. Runs in-process (TestClient), so the
+n+1 numbers leave out network round trips.
+
+Run from backend/:  python -m bench.dashboard --patients 500 --history 40
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp()
+os.environ["READM_DATABASE_URL"] = f"sqlite:///{_tmpdir}/dashboard.db"
+os.environ["READM_SHARDING_ENABLED"] = "0"
+os.environ["READM_WRITE_BEHIND"] = "0"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from app.db import Customer, Patient, Prediction, engine, init_schema
+from bench.db_concurrency import _prediction_row
+
+
+def _seed(patients: int, history: int):
+    now = datetime.utcnow()
+    init_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Customer), [{"id": "bench", "name": "Bench"}])
+        conn.execute(insert(Patient), [{"id": f"p{i}", "name": f"P{i}", "details": {"age": "[60-70)", "gender": "Male"},
+                                        "customer_id": "bench"} for i in range(patients)])
+        # Interleaved so one patient's rows are spread across the table
+        conn.execute(insert(Prediction), [_prediction_row(f"p{i % patients}", now - timedelta(minutes=i))
+                                          for i in range(patients * history)])
+
+
+def _timed(fn, repeat: int) -> list:
+    waits = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        waits.append(time.perf_counter() - t0)
+    return waits
+
+
+def _row(name, waits, unit=1000, fmt=".2f"):
+    lat = sorted(waits)
+    return f"{name:28}{statistics.median(lat) * unit:>12{fmt}}{lat[int(len(lat) * 0.9)] * unit:>12{fmt}}"
+
+
+def main(patients: int, history: int, repeat: int):
+    _seed(patients, history)
+    import app.main as api
+
+    print(f"{patients} patients x {history} predictions")
+    print(f"{'page load':28}{'p50 ms':>12}{'p90 ms':>12}")
+    with TestClient(api.app) as client:
+        def n_plus_one():
+            listed = client.get("/customers/bench/patients").json()
+            latest = {}
+            for p in listed:
+                history_rows = client.get(f"/analytics/patients/bench/{p['id']}").json()
+                latest[p["id"]] = history_rows[-1] if history_rows else None
+            return latest
+
+        def dashboard():
+            return {p["id"]: p["latest_risk"] for p in client.get("/customers/bench/dashboard").json()}
+
+        old, new = n_plus_one(), dashboard()
+        assert all(old[k]["band"] == new[k]["band"] and old[k]["risk_score"] == new[k]["risk_score"] for k in old)
+        print(_row(f"n+1 ({patients + 1} requests)", _timed(n_plus_one, max(1, repeat // 10))))
+        print(_row("dashboard (1 request)", _timed(dashboard, repeat)))
+
+    conn = sqlite3.connect(f"{_tmpdir}/dashboard.db")
+    ids = [f"p{i}" for i in range(0, patients, max(1, patients // 200))]
+    order_by = "SELECT band FROM predictions WHERE patient_id = ? ORDER BY timestamp DESC LIMIT 1"
+    by_key = "SELECT band FROM patient_latest_risk WHERE patient_id = ?"
+
+    def lookups(sql):
+        return lambda: [conn.execute(sql, (pid,)).fetchone() for pid in ids]
+
+    print(f"\n{'latest band, per lookup':28}{'p50 us':>12}{'p90 us':>12}")
+    per = 1e6 / len(ids)
+    with_index = _timed(lookups(order_by), repeat)
+    conn.execute("DROP INDEX ix_predictions_patient_timestamp")
+    without_index = _timed(lookups(order_by), repeat)
+    print(_row("ORDER BY, patient_id index", without_index, per, ".1f"))
+    print(_row("ORDER BY, composite index", with_index, per, ".1f"))
+    print(_row("patient_latest_risk", _timed(lookups(by_key), repeat), per, ".1f"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dashboard N+1 vs the one-query dashboard endpoint")
+    parser.add_argument("--patients", type=int, default=500)
+    parser.add_argument("--history", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    main(args.patients, args.history, args.repeat)
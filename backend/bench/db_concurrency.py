@@ -0,0 +1,165 @@
+"""
+Concurrent reads and writes against SQLite, the way the API issues them.
+
+- before: default engine (rollback journal, no pragmas), sync sessions on a
+  40-thread pool like the threadpool that ran the old sync handlers
+- sync+wal: the same threads, with WAL and the tuned pragmas
+- async: AsyncSession from the pooled aiosqlite engine with the tuned
+  pragmas, 40 concurrent tasks on one event loop
+
+Writes insert a prediction with one nudge and commit (as /predict does);
+reads fetch a patient's latest prediction and its history. Each setup
+gets its own fresh database file seeded with the same rows.
+
+Run from backend/:  python -m bench.db_concurrency --ops 4000 --write-ratio 0.2
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp()
+os.environ["READM_DATABASE_URL"] = f"sqlite:///{_tmpdir}/import.db"
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base, Customer, Nudge, Patient, Prediction, make_async_engine, make_engine, sqlite_pragmas
+
+CONCURRENCY = 40
+PATIENTS = 200
+
+
+def _seed(path: str, history: int):
+    eng = make_engine(f"sqlite:///{path}", pragmas=[])
+    Base.metadata.create_all(eng)
+    now = datetime.utcnow()
+    with eng.begin() as conn:
+        conn.execute(insert(Customer), [{"id": "bench", "name": "Bench"}])
+        conn.execute(insert(Patient), [{"id": f"p{i}", "name": f"P{i}", "details": {}, "customer_id": "bench"}
+                                       for i in range(PATIENTS)])
+        conn.execute(insert(Prediction), [_prediction_row(f"p{i % PATIENTS}", now - timedelta(minutes=i))
+                                          for i in range(history)])
+    eng.dispose()
+
+
+def _prediction_row(patient_id: str, ts: datetime) -> dict:
+    return {"id": str(uuid.uuid4()), "patient_id": patient_id, "risk_score": 0.4, "band": "medium",
+            "top_features": {"number_inpatient": 0.3, "num_medications": 0.1},
+            "explanation": "- bench explanation", "explanation_status": "ready", "timestamp": ts}
+
+
+def _ops(n: int, write_ratio: float) -> list:
+    rng = random.Random(3)
+    return [("write" if rng.random() < write_ratio else "read", f"p{rng.randrange(PATIENTS)}") for _ in range(n)]
+
+
+def _latest_query(patient_id):
+    return select(Prediction).filter_by(patient_id=patient_id).order_by(Prediction.timestamp.desc()).limit(1)
+
+
+def _history_query(patient_id):
+    return select(Prediction.timestamp, Prediction.risk_score).filter_by(patient_id=patient_id)
+
+
+def _write_objects(patient_id):
+    row = _prediction_row(patient_id, datetime.utcnow())
+    return [Prediction(**row), Nudge(prediction_id=row["id"], suggestion="bench", category="general")]
+
+
+def run_sync(path: str, ops: list, pragmas: list) -> dict:
+    eng = make_engine(f"sqlite:///{path}", pragmas=pragmas)
+    Session = sessionmaker(bind=eng, autoflush=False)
+
+    def op(kind_pid):
+        kind, pid = kind_pid
+        t0 = time.perf_counter()
+        db = Session()
+        try:
+            if kind == "write":
+                db.add_all(_write_objects(pid))
+                db.commit()
+            else:
+                db.scalar(_latest_query(pid))
+                db.execute(_history_query(pid)).all()
+            return kind, time.perf_counter() - t0, None
+        except Exception as e:
+            return kind, time.perf_counter() - t0, e
+        finally:
+            db.close()
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(CONCURRENCY) as pool:
+        results = list(pool.map(op, ops))
+    wall = time.perf_counter() - t0
+    eng.dispose()
+    return _summary(results, wall)
+
+
+def run_async(path: str, ops: list) -> dict:
+    async def main():
+        eng = make_async_engine(f"sqlite+aiosqlite:///{path}")
+        Session = async_sessionmaker(eng, autoflush=False, expire_on_commit=False)
+        gate = asyncio.Semaphore(CONCURRENCY)
+
+        async def op(kind, pid):
+            async with gate:
+                t0 = time.perf_counter()
+                try:
+                    async with Session() as db:
+                        if kind == "write":
+                            db.add_all(_write_objects(pid))
+                            await db.commit()
+                        else:
+                            await db.scalar(_latest_query(pid))
+                            (await db.execute(_history_query(pid))).all()
+                    return kind, time.perf_counter() - t0, None
+                except Exception as e:
+                    return kind, time.perf_counter() - t0, e
+
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*(op(kind, pid) for kind, pid in ops))
+        wall = time.perf_counter() - t0
+        await eng.dispose()
+        return _summary(results, wall)
+
+    return asyncio.run(main())
+
+
+def _summary(results: list, wall: float) -> dict:
+    out = {"ops_per_s": len(results) / wall, "errors": sum(e is not None for _, _, e in results)}
+    for kind in ("read", "write"):
+        lat = sorted(t for k, t, e in results if k == kind and e is None)
+        out[kind] = (statistics.median(lat) * 1000, lat[int(len(lat) * 0.99)] * 1000) if lat else (0.0, 0.0)
+    return out
+
+
+def main(n_ops: int, write_ratio: float, history: int):
+    ops = _ops(n_ops, write_ratio)
+    print(f"{n_ops} ops, {write_ratio:.0%} writes, {CONCURRENCY} concurrent, {history} seeded predictions")
+    print(f"{'setup':10}{'ops/s':>9}{'read p50':>10}{'read p99':>10}{'write p50':>11}{'write p99':>11}{'errors':>8}")
+    for name in ("before", "sync+wal", "async"):
+        path = f"{_tmpdir}/{name.replace('+', '_')}.db"
+        _seed(path, history)
+        if name == "async":
+            r = run_async(path, ops)
+        else:
+            r = run_sync(path, ops, [] if name == "before" else sqlite_pragmas())
+        print(f"{name:10}{r['ops_per_s']:>9.0f}{r['read'][0]:>10.2f}{r['read'][1]:>10.2f}"
+              f"{r['write'][0]:>11.2f}{r['write'][1]:>11.2f}{r['errors']:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent SQLite read/write benchmark")
+    parser.add_argument("--ops", type=int, default=4000)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--history", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.ops, args.write_ratio, args.history)
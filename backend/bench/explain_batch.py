@@ -0,0 +1,66 @@
+"""
+Ward-level explanations: one chat completion per patient (explain_with_openai,
+8 in parallel like the background worker pool allows) against explain_many()
+packing patients into structured multi-patient requests.
+
+Both run against bench.fake_openai with the persistent explanation cache off,
+so every prompt reaches the "LLM". Reports round trips, prompt characters
+sent (~4 chars per token) and wall time.
+
+Run from backend/:  python -m bench.explain_batch --patients 200
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PORT = 8017
+
+os.environ["READM_EXPLAIN_CACHE_ENABLED"] = "0"
+os.environ["READM_EXPLAIN_CACHE_PATH"] = f"{tempfile.mkdtemp()}/explanation_cache.db"
+os.environ["OPENAI_API_KEY"] = "fake"
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+
+from app import explain
+from app.ml import get_engine
+from bench.fake_openai import serve_in_thread
+from bench.fixtures import patient_population
+
+
+def _measure(state, fn):
+    calls, chars = state.calls, state.prompt_chars
+    t0 = time.perf_counter()
+    out = fn()
+    return out, state.calls - calls, state.prompt_chars - chars, time.perf_counter() - t0
+
+
+def main(patients: int, delay: float):
+    server, _ = serve_in_thread(PORT, delay=delay, token_delay=0.0)
+    state = server.config.app.state
+    rows = patient_population(patients)
+    items = [(r, res["risk_score"], res["top_features"])
+             for r, res in zip(rows, get_engine().predict_batch(rows, "fast"))]
+    explain.explain_with_openai(*items[0])  # client import + connection warm-up
+
+    with ThreadPoolExecutor(8) as pool:
+        single, s_calls, s_chars, s_wall = _measure(state, lambda: list(pool.map(lambda it: explain.explain_with_openai(*it), items)))
+    batched, b_calls, b_chars, b_wall = _measure(state, lambda: explain.explain_many(items))
+
+    print(f"{patients} patients, fake LLM latency {delay:.2f} s, "
+          f"batch limits {explain.EXPLAIN_BATCH_MAX_PATIENTS} patients / {explain.EXPLAIN_BATCH_MAX_PROMPT_CHARS} chars")
+    print(f"{'':10}{'round trips':>12}{'prompt chars':>14}{'~tokens':>10}{'wall s':>9}")
+    print(f"{'single':10}{s_calls:>12}{s_chars:>14}{s_chars // 4:>10}{s_wall:>9.2f}")
+    print(f"{'batched':10}{b_calls:>12}{b_chars:>14}{b_chars // 4:>10}{b_wall:>9.2f}")
+    print(f"reduction: {s_calls / max(b_calls, 1):.1f}x round trips, {s_chars / max(b_chars, 1):.1f}x prompt chars")
+    print(f"generated ok: single {sum(not t.endswith('.)') for t in single)}/{patients}, "
+          f"batched {sum(ok for _, ok in batched)}/{patients}")
+    print(f"batch stats: {explain.batch_stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batched multi-patient explanations")
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.3)
+    args = parser.parse_args()
+    main(args.patients, args.delay)
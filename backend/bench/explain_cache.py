@@ -0,0 +1,69 @@
+"""
+Explanation cache: latency of a repeat explanation (cache hit) against an
+LLM round trip, and how many distinct prompts a varied patient population
+actually produces once drivers are bucketed.
+
+The LLM is bench.fake_openai with a fixed delay; the population is the
+fixture patient with randomized utilization/lab fields scored by the real
+engine on the fast tier.
+
+Run from backend/:  python -m bench.explain_cache --patients 2000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+PORT = 8013
+
+_tmpdir = tempfile.mkdtemp()
+os.environ["READM_EXPLAIN_CACHE_PATH"] = f"{_tmpdir}/explanation_cache.db"
+os.environ["OPENAI_API_KEY"] = "fake"
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+
+from app import explain
+from app.explain_cache import ExplanationCache
+from app.ml import get_engine
+from bench.fake_openai import serve_in_thread
+from bench.fixtures import patient_population
+
+
+def main(patients: int, delay: float):
+    serve_in_thread(PORT, delay=delay, token_delay=0.0)
+    rows = patient_population(patients)
+    results = get_engine().predict_batch(rows, "fast")
+
+    keys = [ExplanationCache.key_for(explain.prompt_inputs(r, res["risk_score"], res["top_features"]))
+            for r, res in zip(rows, results)]
+    distinct = len(set(keys))
+    print(f"{patients} patients -> {distinct} distinct prompts; "
+          f"steady-state hit rate {1 - distinct / patients:.1%}")
+
+    # First sight of each prompt pays the LLM; repeats are served from SQLite
+    explain.explanation_cache.clear()
+    sample = list(zip(rows, results))[:50]
+    miss, hit = [], []
+    for r, res in sample:
+        t0 = time.perf_counter()
+        explain.explain_with_openai(r, res["risk_score"], res["top_features"])
+        miss.append(time.perf_counter() - t0)
+    for _ in range(20):
+        for r, res in sample:
+            t0 = time.perf_counter()
+            explain.explain_with_openai(r, res["risk_score"], res["top_features"])
+            hit.append(time.perf_counter() - t0)
+
+    stats = explain.explanation_cache.stats()
+    print(f"LLM (miss)  p50 {statistics.median(miss) * 1000:8.2f} ms")
+    print(f"cache hit   p50 {statistics.median(hit) * 1000:8.3f} ms   "
+          f"p99 {sorted(hit)[int(len(hit) * 0.99)] * 1000:8.3f} ms")
+    print(f"cache stats: {stats['hits']} hits / {stats['misses']} misses, {stats['size']} rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the persistent explanation cache")
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--delay", type=float, default=0.5, help="fake LLM latency in seconds")
+    args = parser.parse_args()
+    main(args.patients, args.delay)
@@ -0,0 +1,77 @@
+"""
+Local rule/template explanations against the LLM path: per-explanation
+latency of explain_locally() and of explain_with_openai() (bench.fake_openai
+at a fixed delay, persistent cache off so every call reaches the "LLM"),
+plus rule coverage of the model's features and DIAGNOSIS_MAP, and how many
+bullets the local engine produced across a patient population.
+
+Run from backend/:  python -m bench.explain_local --patients 1000
+"""
+import argparse
+import collections
+import os
+import statistics
+import tempfile
+import time
+
+PORT = 8016
+
+os.environ["READM_EXPLAIN_CACHE_ENABLED"] = "0"
+os.environ["READM_EXPLAIN_CACHE_PATH"] = f"{tempfile.mkdtemp()}/explanation_cache.db"
+os.environ["OPENAI_API_KEY"] = "fake"
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+
+from app import explain
+from app.diagnosis_normalizer import DIAGNOSIS_MAP
+from app.local_explain import explain_locally, get_local_explainer
+from app.ml import get_engine
+from bench.fake_openai import serve_in_thread
+from bench.fixtures import patient_population
+
+
+def _timed(fn, items):
+    out, waits = [], []
+    for item in items:
+        t0 = time.perf_counter()
+        out.append(fn(*item))
+        waits.append(time.perf_counter() - t0)
+    return out, waits
+
+
+def _row(name, waits):
+    lat = sorted(waits)
+    return (f"{name:8}{statistics.median(lat) * 1000:>12.3f}{lat[int(len(lat) * 0.99)] * 1000:>12.3f}"
+            f"{sum(lat):>10.2f}")
+
+
+def main(patients: int, llm_calls: int, delay: float):
+    serve_in_thread(PORT, delay=delay, token_delay=0.0)
+    rows = patient_population(patients)
+    items = [(r, res["risk_score"], res["top_features"])
+             for r, res in zip(rows, get_engine().predict_batch(rows, "fast"))]
+
+    explainer = get_local_explainer()
+    print(f"rules: {len(explainer.feature_names)} model features, {len(DIAGNOSIS_MAP)} DIAGNOSIS_MAP terms "
+          f"in {len({explainer.diagnosis_group(c) for c in DIAGNOSIS_MAP.values()})} groups, all covered")
+
+    explain_locally(*items[0])
+    explain.explain_with_openai(*items[0])  # client import + connection warm-up
+    local, local_waits = _timed(explain_locally, items)
+    _, llm_waits = _timed(explain.explain_with_openai, items[:llm_calls])
+
+    print(f"fake LLM latency {delay:.2f} s")
+    print(f"{'':8}{'p50 ms':>12}{'p99 ms':>12}{'total s':>10}")
+    print(_row("local", local_waits) + f"   ({patients} patients)")
+    print(_row("llm", llm_waits) + f"   ({llm_calls} patients)")
+    print(f"speedup at p50: {statistics.median(llm_waits) / statistics.median(local_waits):,.0f}x")
+    bullets = collections.Counter(text.count("\n- ") + 1 for text in local)
+    print("local bullets per explanation: " + ", ".join(f"{k}: {v}" for k, v in sorted(bullets.items())))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark local rule-based explanations against the LLM")
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--llm-calls", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.5, help="fake LLM latency in seconds")
+    args = parser.parse_args()
+    main(args.patients, args.llm_calls, args.delay)
@@ -0,0 +1,93 @@
+"""
+/predict latency with a slow LLM: the explanation is generated in the
+background, so the response no longer waits for the completion. Runs
+against bench.fake_openai with a fixed time-to-first-token and reports:
+
+- inline: one blocking explain_with_openai() call (what /predict used to add)
+- /predict: response latency now
+- ready: time from the request until polling shows status "ready"
+- SSE: time to the first streamed token and to the "done" event
+
+Run from backend/:  python -m bench.explain_pipeline --delay 1.5 --runs 10
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+PORT = 8011
+API_PORT = 8012
+
+_tmpdir = tempfile.mkdtemp()
+os.environ.setdefault("READM_DATABASE_URL", f"sqlite:///{_tmpdir}/bench.db")
+os.environ["OPENAI_API_KEY"] = "fake"
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+os.environ["READM_EXPLAIN_CACHE_ENABLED"] = "0"  # every explanation pays for the LLM
+
+import httpx
+import uvicorn
+
+import app.main as api
+from app.explain import explain_with_openai
+from bench.fake_openai import serve_in_thread
+from bench.fixtures import PATIENT
+
+
+def _ms(samples):
+    return f"p50 {statistics.median(samples) * 1000:8.1f} ms   max {max(samples) * 1000:8.1f} ms"
+
+
+def main(runs: int, delay: float):
+    serve_in_thread(PORT, delay=delay, token_delay=0.005)
+    # A real server rather than TestClient, which buffers streamed responses
+    server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=API_PORT, log_level="warning"))
+    threading.Thread(target=server.run, name="api", daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    with httpx.Client(base_url=f"http://127.0.0.1:{API_PORT}", timeout=60) as client:
+        while client.get("/ready").status_code != 200:
+            time.sleep(0.01)
+        client.post("/customers", json={"id": "BENCH", "name": "Bench Hospital"})
+        client.post("/customers/BENCH/patients", json={"id": "BENCH-P1", "name": "Bench", **PATIENT})
+        url = "/customers/BENCH/patients/BENCH-P1"
+
+        explain_with_openai(PATIENT, 0.5, {"number_inpatient": 0.3})  # client import + connection warm-up
+        inline, respond, ready, first_token, done = [], [], [], [], []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            explain_with_openai(PATIENT, 0.5, {"number_inpatient": 0.3})
+            inline.append(time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            r = client.post(f"{url}/predict", json={"input": {"id": "BENCH"}, "force": True, "explain": "fast"})
+            respond.append(time.perf_counter() - t0)
+            assert r.status_code == 201 and r.json()["prediction"]["explanation_status"] == "pending", r.text
+            pred_id = r.json()["prediction"]["id"]
+
+            with client.stream("GET", f"{url}/predictions/{pred_id}/explanation?stream=true") as s:
+                for line in s.iter_lines():
+                    if line == "event: token" and len(first_token) < len(respond):
+                        first_token.append(time.perf_counter() - t0)
+                    if line == "event: done":
+                        done.append(time.perf_counter() - t0)
+
+            while client.get(f"{url}/predictions/{pred_id}/explanation").json()["status"] == "pending":
+                time.sleep(0.01)
+            ready.append(time.perf_counter() - t0)
+
+    print(f"LLM time to first token: {delay:.2f} s, runs: {runs}")
+    print(f"inline LLM call      {_ms(inline)}")
+    print(f"/predict response    {_ms(respond)}")
+    print(f"SSE first token      {_ms(first_token)}")
+    print(f"SSE done             {_ms(done)}")
+    print(f"poll shows ready     {_ms(ready)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark /predict with background LLM explanations")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--delay", type=float, default=1.5)
+    args = parser.parse_args()
+    main(args.runs, args.delay)
@@ -0,0 +1,53 @@
+"""
+Scoring cost per explanation tier: "none" (predict_proba only), "fast"
+(approximate SHAP) and "exact" (full TreeSHAP), with the prediction cache
+disabled so every call pays for the model. Also reports how far the fast
+attributions are from the exact ones on the same rows.
+
+Run from backend/:  python -m bench.explain_tiers
+"""
+import time
+
+import numpy as np
+
+from app.ml import EXPLAIN_TIERS, InferenceEngine
+from bench.fixtures import PATIENT
+
+
+def _per_row_ms(engine, rows, tier, repeat):
+    engine.predict_batch(rows, tier)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        engine.predict_batch(rows, tier)
+    return (time.perf_counter() - t0) / (repeat * len(rows)) * 1000
+
+
+def _top(contribs, k):
+    return set(sorted(contribs, key=lambda name: -abs(contribs[name]))[:k])
+
+
+def main():
+    engine = InferenceEngine(cache_size=0)
+    print(f"{'rows':>6}" + "".join(f"{t + ' ms/row':>16}" for t in EXPLAIN_TIERS))
+    for n, repeat in ((1, 300), (32, 30), (1000, 2)):
+        rows = [dict(PATIENT, number_inpatient=i % 7, time_in_hospital=i % 13) for i in range(n)]
+        cells = [_per_row_ms(engine, rows, tier, repeat) for tier in EXPLAIN_TIERS]
+        print(f"{n:>6}" + "".join(f"{c:>16.3f}" for c in cells))
+
+    rows = [dict(PATIENT, number_inpatient=i % 7, time_in_hospital=i % 13) for i in range(200)]
+    fast = engine.predict_batch(rows, "fast")
+    exact = engine.predict_batch(rows, "exact")
+    err, same_top1, top3_overlap = [], 0, 0
+    for f, e in zip(fast, exact):
+        f, e = f["top_features"], e["top_features"]
+        fv = np.array([f[k] for k in e])
+        ev = np.array([e[k] for k in e])
+        err.append(np.abs(fv - ev).sum() / max(np.abs(ev).sum(), 1e-12))
+        same_top1 += _top(f, 1) == _top(e, 1)
+        top3_overlap += len(_top(f, 3) & _top(e, 3)) / 3
+    print(f"\nfast vs exact on {len(rows)} rows: mean relative L1 error {np.mean(err):.3f}, "
+          f"same top driver {same_top1 / len(rows):.0%}, top-3 overlap {top3_overlap / len(rows):.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Minimal OpenAI-compatible chat completions server for local testing of the
+explanation pipeline without network access or an API key. Supports plain
+and streamed (SSE) responses with a configurable delay and token rate.
+
+Run from backend/:  python -m bench.fake_openai --port 8011 --delay 1.5
+then start the API with  OPENAI_BASE_URL=http://127.0.0.1:8011/v1 OPENAI_API_KEY=fake
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+REPLY = (
+    "- Multiple prior inpatient admissions point to unstable disease and limited post-discharge support.\n"
+    "- Poor glycemic control raises the risk of metabolic decompensation after discharge.\n"
+    "- A high medication burden increases the chance of adherence errors and adverse events."
+)
+
+
+def create_app(delay: float = 1.0, token_delay: float = 0.01, fail_rate: float = 0.0) -> FastAPI:
+    app = FastAPI(title="fake-openai")
+    # Mutable at runtime (server.config.app.state) to simulate outages and recovery
+    app.state.calls = 0
+    app.state.prompt_chars = 0
+    app.state.delay = delay
+    app.state.fail_rate = fail_rate
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt = "".join(m.get("content") or "" for m in body.get("messages", []))
+        app.state.calls += 1
+        app.state.prompt_chars += len(prompt)
+        await asyncio.sleep(app.state.delay)
+        if random.random() < app.state.fail_rate:
+            return JSONResponse({"error": {"message": "fake overload", "type": "server_error"}}, status_code=503)
+
+        cid, created, model = f"chatcmpl-{uuid.uuid4().hex[:12]}", int(time.time()), body.get("model", "fake")
+        content = REPLY
+        # Multi-patient prompt (app.explain.BATCH_PROMPT): answer per "### <id>" section as JSON
+        ids = re.findall(r"^### (\S+)$", prompt, re.MULTILINE)
+        if ids and "JSON object" in prompt:
+            bullets = [line.lstrip("- ") for line in REPLY.splitlines()]
+            content = json.dumps({pid: bullets for pid in ids})
+        if not body.get("stream"):
+            return {
+                "id": cid, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }
+
+        async def events():
+            for word in content.split(" "):
+                chunk = {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(token_delay)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def serve_in_thread(port: int, **kwargs):
+    """Start the fake server in a daemon thread; returns (server, base_url) once it accepts connections."""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(create_app(**kwargs), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="fake-openai", daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{port}/v1"
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible server")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--delay", type=float, default=1.0, help="seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of calls answered with 503")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.delay, args.token_delay, args.fail_rate), host="127.0.0.1", port=args.port)
@@ -0,0 +1,138 @@
+"""
+Reading a customer's feature matrix: the old path (select every details
+blob, decode the JSON, build arrays with FeaturePlan.to_arrays), selecting
+the typed feature columns, and load_feature_matrix (the packed vectors of
+patient_features). Checks that all three produce identical arrays. Also measures the cost of keeping the store in sync: a
+full backfill and the per-write upsert that add_patient, update_patient_fields
+and predict now do. Last, a feature filter in SQL: json_extract over details
+against the typed column, with and without an index.
+
+Run from backend/:  python -m bench.feature_store --patients 10000 100000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp()
+os.environ["READM_DATABASE_URL"] = f"sqlite:///{_tmpdir}/features.db"
+
+import numpy as np
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.orm import sessionmaker
+
+from app.db import (
+    Customer, Patient, PatientFeatures, feature_plan, init_schema, load_feature_matrix, make_engine,
+    patient_features_row, sync_patient_features, upsert_patient_features,
+)
+from app.utils import details_fingerprint
+from bench.fixtures import patient_population
+
+CHUNK = 20000
+
+
+def _seed(path: str, n: int):
+    eng = make_engine(f"sqlite:///{path}")
+    init_schema(eng)
+    population = patient_population(min(n, 5000))
+    with eng.begin() as conn:
+        conn.execute(insert(Customer), [{"id": "bench", "name": "Bench"}])
+        for start in range(0, n, CHUNK):
+            rows = []
+            for i in range(start, min(n, start + CHUNK)):
+                details = population[i % len(population)]
+                rows.append({"id": f"p{i:07d}", "name": "P", "details": details,
+                             "features_hash": details_fingerprint(details), "customer_id": "bench"})
+            conn.execute(insert(Patient), rows)
+    return eng
+
+
+def from_details(db) -> tuple:
+    rows = db.execute(select(Patient.id, Patient.details).where(Patient.customer_id == "bench")
+                      .order_by(Patient.id)).all()
+    num, cat = feature_plan.to_arrays([r.details for r in rows])
+    return [r.id for r in rows], num, cat
+
+
+def from_typed_columns(db) -> tuple:
+    columns = PatientFeatures.__table__.c
+    rows = db.execute(select(Patient.id, *[columns[c] for c in feature_plan.num_columns + feature_plan.cat_columns])
+                      .join(PatientFeatures, PatientFeatures.patient_id == Patient.id)
+                      .where(Patient.customer_id == "bench").order_by(Patient.id)).all()
+    table = np.array([tuple(r) for r in rows], dtype=object)
+    n_num = len(feature_plan.num_columns)
+    return table[:, 0].tolist(), table[:, 1:1 + n_num].astype(np.float32), table[:, 1 + n_num:]
+
+
+def from_store(db) -> tuple:
+    ids, _, num, cat = load_feature_matrix(db, "bench")
+    return ids, num, cat
+
+
+def _timed(fn, repeat: int) -> tuple:
+    waits = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        waits.append(time.perf_counter() - t0)
+    return out, statistics.median(waits) * 1000
+
+
+def main(sizes: list, repeat: int):
+    print(f"{len(feature_plan.num_columns)} numeric + {len(feature_plan.cat_columns)} categorical features; "
+          f"median of {repeat} runs")
+    print(f"{'patients':>9}{'json ms':>10}{'columns ms':>12}{'packed ms':>11}{'backfill/s':>12}{'upsert us':>11}"
+          f"{'json filt ms':>14}{'col filt ms':>13}{'idx filt ms':>13}")
+    for n in sizes:
+        eng = _seed(f"{_tmpdir}/f{n}.db", n)
+        Session = sessionmaker(bind=eng)
+
+        # Backfill from scratch (what init_schema does for patients stored before the table)
+        with eng.begin() as conn:
+            conn.execute(delete(PatientFeatures))
+            t0 = time.perf_counter()
+            synced = sync_patient_features(conn)
+            backfill = synced / (time.perf_counter() - t0)
+
+        db = Session()
+        try:
+            (ids_a, num_a, cat_a), json_ms = _timed(lambda: from_details(db), repeat)
+            typed, columns_ms = _timed(lambda: from_typed_columns(db), repeat)
+            packed, store_ms = _timed(lambda: from_store(db), repeat)
+            for ids_b, num_b, cat_b in (typed, packed):
+                assert ids_a == ids_b and np.array_equal(num_a, num_b, equal_nan=True) and (cat_a == cat_b).all()
+
+            # One write path's extra work: build the row and upsert it
+            details = patient_population(1)[0]
+
+            def write_one():
+                db.execute(upsert_patient_features, patient_features_row("p0000000", details_fingerprint(details), details))
+            _, upsert_ms = _timed(write_one, repeat * 10)
+            db.rollback()
+        finally:
+            db.close()
+
+        # "Patients with 3+ inpatient visits": JSON scan, typed column scan, typed column index
+        filters = {
+            "json": "SELECT COUNT(*) FROM patients WHERE json_extract(details, '$.number_inpatient') >= 3",
+            "column": "SELECT COUNT(*) FROM patient_features WHERE number_inpatient >= 3",
+        }
+        with eng.connect() as conn:
+            (counts_json,), json_filter_ms = _timed(lambda: conn.execute(text(filters["json"])).one(), repeat)
+            (counts_col,), col_filter_ms = _timed(lambda: conn.execute(text(filters["column"])).one(), repeat)
+            conn.execute(text("CREATE INDEX ix_bench_inpatient ON patient_features (number_inpatient)"))
+            (counts_idx,), idx_filter_ms = _timed(lambda: conn.execute(text(filters["column"])).one(), repeat)
+            assert counts_json == counts_col == counts_idx
+        eng.dispose()
+
+        print(f"{n:>9}{json_ms:>10.1f}{columns_ms:>12.1f}{store_ms:>11.1f}{backfill:>12.0f}{upsert_ms * 1000:>11.1f}"
+              f"{json_filter_ms:>14.2f}{col_filter_ms:>13.2f}{idx_filter_ms:>13.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Feature matrix from details JSON vs the patient_features store")
+    parser.add_argument("--patients", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.patients, args.repeat)
@@ -0,0 +1,31 @@
+"""Shared inputs for the benchmarks."""
+import random
+
+PATIENT = {
+    "race": "Caucasian", "gender": "Female", "weight": "70-80", "payer_code": "MC",
+    "medical_specialty": "Cardiology", "diag_1": "Heart Failure", "diag_2": "Hypertension",
+    "diag_3": "Diabetes", "max_glu_serum": "200", "A1Cresult": "8", "metformin": "Yes",
+    "insulin": "Up", "change": "Ch", "diabetesMed": "Yes", "time_in_hospital": 9,
+    "num_lab_procedures": 55, "num_procedures": 2, "num_medications": 21,
+    "number_outpatient": 1, "number_emergency": 2, "number_inpatient": 3,
+    "number_diagnoses": 8, "age": 75,
+}
+
+
+def patient_population(n: int, seed: int = 7) -> list:
+    """PATIENT with randomized utilization, lab, A1C and age fields (deterministic per seed)."""
+    rng = random.Random(seed)
+    return [
+        dict(
+            PATIENT,
+            time_in_hospital=rng.randint(1, 14),
+            num_lab_procedures=rng.randint(10, 90),
+            num_medications=rng.randint(3, 40),
+            number_inpatient=rng.choice([0, 0, 0, 1, 1, 2, 3, 5]),
+            number_emergency=rng.choice([0, 0, 0, 1, 2]),
+            number_outpatient=rng.choice([0, 0, 1, 2]),
+            A1Cresult=rng.choice(["None", "Norm", ">7", ">8"]),
+            age=rng.randint(30, 95),
+        )
+        for _ in range(n)
+    ]
@@ -0,0 +1,86 @@
+"""
+Explanation latency during an LLM outage, before/after the resilient client.
+
+"before" is a plain OpenAI client as app/explain.py used to build it (SDK
+defaults: 2 retries with its own backoff, 600 s timeout); "after" is
+ResilientLLMClient. Each scenario runs sequential calls against
+bench.fake_openai and reports how long each caller waited before it could
+fall back to the template text.
+
+- 503: upstream answers every call with 503 after 50 ms
+- hang: upstream takes 30 s to answer (the plain client is given a 5 s
+  timeout here, or one call would take 30 minutes of retries)
+- recovery: the upstream heals while the breaker is open; the half-open
+  trial closes it again
+
+Run from backend/:  python -m bench.llm_outage --calls 20
+"""
+import argparse
+import os
+import statistics
+import time
+
+from openai import OpenAI
+
+from app.llm import CircuitBreaker, ResilientLLMClient
+from bench.fake_openai import serve_in_thread
+
+PORT = 8015
+REQUEST = {"model": "fake", "messages": [{"role": "user", "content": "explain"}], "max_tokens": 10}
+
+
+def _resilient(base_url):
+    os.environ["OPENAI_BASE_URL"], os.environ["OPENAI_API_KEY"] = base_url, "fake"
+    return ResilientLLMClient(deadline=3.0, attempt_timeout=1.0, retries=2, backoff_base=0.1,
+                              breaker=CircuitBreaker(failure_threshold=5, reset_timeout=2.0))
+
+
+def _time_calls(call, n):
+    waits = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        try:
+            call()
+        except Exception:
+            pass
+        waits.append(time.perf_counter() - t0)
+    return waits
+
+
+def _row(name, waits):
+    return (f"{name:28}{statistics.median(waits) * 1000:>10.1f}{max(waits) * 1000:>10.1f}"
+            f"{sum(waits):>10.2f}")
+
+
+def main(calls: int):
+    server, base_url = serve_in_thread(PORT, delay=0.05, fail_rate=1.0)
+    state = server.config.app.state
+    print(f"{'scenario':28}{'p50 ms':>10}{'max ms':>10}{'total s':>10}")
+
+    plain = OpenAI(api_key="fake", base_url=base_url)
+    print(_row("503 / before", _time_calls(lambda: plain.chat.completions.create(**REQUEST), calls)))
+    client = _resilient(base_url)
+    print(_row("503 / after", _time_calls(lambda: client.complete(**REQUEST), calls)))
+
+    state.delay, state.fail_rate = 30.0, 0.0
+    plain = OpenAI(api_key="fake", base_url=base_url, timeout=5.0)
+    print(_row("hang / before (5 s timeout)", _time_calls(lambda: plain.chat.completions.create(**REQUEST), 2)))
+    client = _resilient(base_url)
+    print(_row("hang / after", _time_calls(lambda: client.complete(**REQUEST), calls)))
+    print(f"breaker after outage: {client.breaker.stats()}")
+
+    # Upstream heals; the first call after reset_timeout is the half-open trial
+    state.delay = 0.05
+    time.sleep(client.breaker.reset_timeout)
+    print(_row("recovery / after", _time_calls(lambda: client.complete(**REQUEST), calls)))
+    stats = client.stats()
+    print(f"breaker after recovery: state={stats['breaker']['state']} opens={stats['breaker']['opens']} "
+          f"half_opens={stats['breaker']['half_opens']} rejected={stats['breaker']['rejected']} "
+          f"retries={stats['retries']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Explanation latency during an LLM outage")
+    parser.add_argument("--calls", type=int, default=20)
+    args = parser.parse_args()
+    main(args.calls)
@@ -0,0 +1,160 @@
+"""
+List endpoints as a customer grows: the old unpaged patient list (every
+patient, full details; reproduced from the old handler since limit is now
+capped) against keyset pages with a field projection, including a page deep
+in the list and status/band-filtered pages, plus the first and a deep page
+of one patient's long prediction history. Also walks the whole list at the
+maximum page size. Runs in-process through TestClient; "KB" is the body size.
+
+Run from backend/:  python -m bench.pagination --patients 10000 50000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp()
+os.environ["READM_SHARDING_ENABLED"] = "1"  # one shard file per customer size
+os.environ["READM_SHARD_DIR"] = f"{_tmpdir}/shards"
+os.environ["READM_DATABASE_URL"] = f"sqlite:///{_tmpdir}/catalog.db"
+os.environ["READM_WRITE_BEHIND"] = "0"
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select
+
+from app.db import Customer, Patient, Prediction, SessionLocal, engine, init_schema
+from app.diagnosis_normalizer import denormalize_all_diagnoses
+from app.shards import tenant_session
+from bench.db_concurrency import _prediction_row
+from bench.fixtures import patient_population
+
+HISTORY = 5000
+PAGE = 100
+DASHBOARD_FIELDS = "id,name,status,details.age,details.gender,latest_risk"
+
+
+def _seed(customer_id: str, patients: int):
+    init_schema(engine)
+    db = SessionLocal()
+    try:
+        db.add(Customer(id=customer_id, name=customer_id))
+        db.commit()
+    finally:
+        db.close()
+    rng = random.Random(patients)
+    details = patient_population(min(patients, 2000))
+    now = datetime.utcnow()
+    db = tenant_session(customer_id)
+    try:
+        db.execute(insert(Customer), [{"id": customer_id, "name": customer_id}])
+        db.execute(insert(Patient), [{
+            "id": f"p{i:06d}", "name": f"P{i}", "details": details[i % len(details)], "customer_id": customer_id,
+            "status": "discharged" if rng.random() < 0.3 else "not_discharged",
+        } for i in range(patients)])
+        # One prediction per patient (latest risk), and a long history for p000000
+        rows = [_prediction_row(f"p{i:06d}", now) for i in range(patients)]
+        rows += [_prediction_row("p000000", now - timedelta(minutes=i + 1)) for i in range(HISTORY)]
+        for row in rows:
+            row["band"] = rng.choice(["low", "medium", "high"])
+        db.execute(insert(Prediction), rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _history_key(customer_id: str, offset: int) -> tuple:
+    db = tenant_session(customer_id)
+    try:
+        return tuple(db.execute(
+            select(Prediction.timestamp, Prediction.id).where(Prediction.patient_id == "p000000")
+            .order_by(Prediction.timestamp.desc(), Prediction.id.desc()).offset(offset).limit(1)
+        ).one())
+    finally:
+        db.close()
+
+
+def _old_list(customer_id: str) -> bytes:
+    """What GET /customers/{id}/patients used to do: every patient, full details, through FastAPI's encoder."""
+    db = tenant_session(customer_id)
+    try:
+        patients = db.scalars(select(Patient).where(Patient.customer_id == customer_id)).all()
+        return json.dumps(jsonable_encoder([{"id": p.id, "name": p.name, "status": p.status,
+                            "details": denormalize_all_diagnoses(p.details)} for p in patients])).encode()
+    finally:
+        db.close()
+
+
+def _walk(client, url: str) -> bytes:
+    """Follow X-Next-Cursor to the end; returns the concatenated bodies."""
+    body, cursor = b"", None
+    while True:
+        r = client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        assert r.status_code == 200, r.text
+        body += r.content
+        cursor = r.headers.get("x-next-cursor")
+        if not cursor:
+            return body
+
+
+def _timed(fetch, repeat: int) -> tuple:
+    waits = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        body = fetch()
+        waits.append(time.perf_counter() - t0)
+    return statistics.median(waits) * 1000, len(body) / 1024
+
+
+def _get(client, url: str):
+    def fetch():
+        r = client.get(url)
+        assert r.status_code == 200, r.text
+        return r.content
+    return fetch
+
+
+def main(sizes: list, repeat: int):
+    import app.main as api
+
+    for n in sizes:
+        _seed(f"c{n}", n)
+    print(f"page size {PAGE}; one patient with {HISTORY} predictions; median of {repeat}")
+    print(f"{'patients':>9}  {'request':44}{'ms':>9}{'KB':>10}")
+    with TestClient(api.app) as client:
+        for n in sizes:
+            base = f"/customers/c{n}"
+            # Cursors 90% of the way through the patient list and p000000's history
+            deep = api._encode_cursor(f"p{int(n * 0.9):06d}")
+            history_deep = api._encode_cursor(*_history_key(f"c{n}", int(HISTORY * 0.9)))
+            dash = f"{base}/dashboard?limit={PAGE}&fields={DASHBOARD_FIELDS}"
+            few = max(1, repeat // 10)
+            cases = [
+                ("all patients, full details (old handler)", lambda: _old_list(f"c{n}"), few),
+                ("all patients, 1000/page walk", lambda: _walk(client, f"{base}/patients?limit=1000"), few),
+                ("all patients projected, 1000/page walk",
+                 lambda: _walk(client, f"{base}/dashboard?limit=1000&fields={DASHBOARD_FIELDS}"), few),
+                ("patients page, full details", _get(client, f"{base}/patients?limit={PAGE}"), repeat),
+                ("dashboard page, projected", _get(client, dash), repeat),
+                ("dashboard page at 90%", _get(client, f"{dash}&cursor={deep}"), repeat),
+                ("dashboard page, status=discharged", _get(client, f"{dash}&status=discharged"), repeat),
+                ("dashboard page, band=high", _get(client, f"{dash}&band=high"), repeat),
+                ("history first page", _get(client, f"{base}/patients/p000000/predictions?limit={PAGE}"), repeat),
+                ("history page at 90%",
+                 _get(client, f"{base}/patients/p000000/predictions?limit={PAGE}&cursor={history_deep}"), repeat),
+            ]
+            for name, fetch, times in cases:
+                ms, kb = _timed(fetch, times)
+                print(f"{n:>9}  {name:44}{ms:>9.2f}{kb:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Unpaged vs keyset-paged list endpoints")
+    parser.add_argument("--patients", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.patients, args.repeat)
@@ -0,0 +1,109 @@
+"""
+Before/after latency of POST /customers/{cid}/patients/{pid}/predict.
+
+"before" re-creates the original path (one-row DataFrame + a fresh
+shap.TreeExplainer per call), "after" is the shared InferenceEngine.
+The OpenAI call is forced onto the template fallback so only the
+model path is measured.
+
+Run from backend/:  python -m bench.predict_latency --runs 200
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import Future
+
+_tmpdir = tempfile.mkdtemp()
+os.environ.setdefault("READM_DATABASE_URL", f"sqlite:///{_tmpdir}/bench.db")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+import numpy as np
+import pandas as pd
+import shap
+from fastapi.testclient import TestClient
+
+import app.main as api
+from app import explain
+from app.ml import get_engine, band_for_probability
+from bench.fixtures import PATIENT
+
+
+
+def legacy_run_ml_model(input_json: dict):
+    """The pre-InferenceEngine implementation, kept here for comparison."""
+    engine = get_engine()
+    model, EXPECTED_FEATURES, CAT_FEATURES = engine.model, engine.feature_names, engine.cat_features
+    row = {}
+    for f in EXPECTED_FEATURES:
+        val = input_json.get(f, None)
+        if f in CAT_FEATURES:
+            row[f] = str(val) if val is not None and val == val else "missing"
+        else:
+            try:
+                row[f] = float(val) if val is not None else np.nan
+            except (ValueError, TypeError):
+                row[f] = np.nan
+    X = pd.DataFrame([row])
+    prob = float(model.predict_proba(X)[:, 1][0])
+    explainer = shap.TreeExplainer(model)
+    shap_values = explainer.shap_values(X)
+    feature_contribs = dict(zip(EXPECTED_FEATURES, shap_values[0]))
+    top_features = {k: v for k, v in feature_contribs.items() if k in input_json}
+    return {"risk_score": prob, "band": band_for_probability(prob), "top_features": top_features,
+            "explanation_tier": "exact"}
+
+
+def _legacy_submit(input_json: dict, tier: str = None) -> Future:
+    fut = Future()
+    fut.set_result(legacy_run_ml_model(input_json))
+    return fut
+
+
+def _no_llm(*args, **kwargs):
+    raise RuntimeError("LLM disabled for benchmark")
+
+
+def _time_route(client, url, runs):
+    client.post(url, json={"input": {"id": "BENCH"}, "force": True})  # warm-up
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        r = client.post(url, json={"input": {"id": "BENCH"}, "force": True})
+        samples.append((time.perf_counter() - t0) * 1000)
+        assert r.status_code == 201, r.text
+    samples.sort()
+    return {
+        "mean": statistics.fmean(samples),
+        "p50": samples[len(samples) // 2],
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+def main(runs: int):
+    explain.stream_explanation = _no_llm
+    with TestClient(api.app) as client:  # runs the startup hooks (schema, warm-up)
+        while client.get("/ready").status_code != 200:
+            time.sleep(0.1)
+        client.post("/customers", json={"id": "BENCH", "name": "Bench Hospital"})
+        client.post("/customers/BENCH/patients", json={"id": "BENCH-P1", "name": "Bench", **PATIENT})
+        url = "/customers/BENCH/patients/BENCH-P1/predict"
+
+        engine_submit = api.submit_ml_model
+        api.submit_ml_model = _legacy_submit
+        before = _time_route(client, url, runs)
+        api.submit_ml_model = engine_submit
+        after = _time_route(client, url, runs)
+
+    print(f"{'':8}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, s in (("before", before), ("after", after)):
+        print(f"{name:8}{s['mean']:>10.2f}{s['p50']:>10.2f}{s['p99']:>10.2f}")
+    print(f"speedup (mean): {before['mean'] / after['mean']:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark /predict latency before/after InferenceEngine")
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+    main(args.runs)
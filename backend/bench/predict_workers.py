@@ -0,0 +1,68 @@
+"""
+/predict scoring throughput against the number of inference worker
+processes: concurrent clients submit single rows to a MicroBatcher that
+dispatches to an InferencePool, as app.ml wires them (one dispatch thread
+per worker), with `--dispatchers 1` for comparison (the old single
+dispatch thread). Reports req/s, p50/p99 and the peak number of batches in
+flight. The prediction cache is off. Scaling is bounded by the CPUs
+available to this process.
+
+Run from backend/:  python -m bench.predict_workers --workers 1 2 4
+"""
+import argparse
+import os
+import threading
+
+os.environ["READM_PREDICTION_CACHE_SIZE"] = "0"  # every request is scored, none served from the SHAP cache
+
+from app.batching import MicroBatcher
+from app.config import MODEL_PATH
+from app.ml import get_engine
+from app.workers import InferencePool
+from bench.batching_throughput import _burst
+
+
+def _run(workers: int, dispatchers: int, clients: int, per_client: int, tier: str) -> dict:
+    pool = InferencePool(workers, MODEL_PATH)
+    engine = get_engine()
+    in_flight = {"now": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def score_batch(items):
+        with lock:
+            in_flight["now"] += 1
+            in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        try:
+            return pool.score_batch(items, tier)
+        finally:
+            with lock:
+                in_flight["now"] -= 1
+
+    try:
+        pool.load_model(MODEL_PATH, engine.model_version)  # start and warm every worker
+        batcher = MicroBatcher(score_batch, max_batch_size=32, max_wait_ms=5.0, concurrency=dispatchers)
+        result = _burst(batcher.score, clients, per_client)
+    finally:
+        pool.shutdown()
+    return dict(result, peak_in_flight=in_flight["peak"])
+
+
+def main(worker_counts: list, clients: int, per_client: int, tier: str):
+    get_engine()  # the model version the workers are started on
+    print(f"{len(os.sched_getaffinity(0))} CPU(s) available; {clients} clients x {per_client} requests, tier={tier}")
+    print(f"{'workers':>8}{'dispatchers':>13}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'in flight':>11}")
+    for workers in worker_counts:
+        for dispatchers in sorted({1, workers}):
+            s = _run(workers, dispatchers, clients, per_client, tier)
+            print(f"{workers:>8}{dispatchers:>13}{s['rps']:>10.1f}{s['p50']:>10.2f}{s['p99']:>10.2f}"
+                  f"{s['peak_in_flight']:>11}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="/predict scoring throughput vs inference workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=20, help="requests per client")
+    parser.add_argument("--tier", default="exact", choices=["exact", "fast", "none"])
+    args = parser.parse_args()
+    main(args.workers, args.clients, args.requests, args.tier)
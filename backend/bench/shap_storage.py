@@ -0,0 +1,123 @@
+"""
+Per-prediction SHAP contributions stored as the top_features JSON dict
+against READM_SHAP_STORAGE=packed (a float32 vector in top_features_packed,
+decoded with the model version's feature_schemas row). Two driver profiles:
+the features a typical patient provides (what /predict and bulk scoring
+write) and all model features. Reports the predictions table size (SQLite
+dbstat, scaled to 1M rows), the bulk insert time, encode/decode cost per row
+(json.dumps/loads vs pack/unpack) and the per-row response size
+(?contributions=dict vs packed, base64).
+
+Run from backend/:  python -m bench.shap_storage --rows 200000
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp()
+os.environ["READM_DATABASE_URL"] = f"sqlite:///{_tmpdir}/catalog.db"
+os.environ["READM_SHAP_STORAGE"] = "packed"
+
+from sqlalchemy import insert, text
+
+from app.contributions import insert_feature_schemas, pack, pack_rows, schema_rows, unpack
+from app.db import Customer, Patient, Prediction, feature_plan, init_schema, make_engine
+from bench.fixtures import patient_population
+
+CHUNK = 20000
+MODEL_VERSION = "bench-model"
+
+
+def _drivers(profile: str, n: int) -> list:
+    rng = random.Random(11)
+    if profile == "full":
+        keys = [list(feature_plan.column_names)] * n
+    else:
+        keys = [[key for _, key in feature_plan.provided(d)] for d in patient_population(min(n, 2000))]
+    # SHAP values come out of CatBoost as float64, hence the full repr in the JSON form
+    return [{key: rng.gauss(0, 0.3) for key in keys[i % len(keys)]} for i in range(n)]
+
+
+def _rows(drivers: list) -> list:
+    now = datetime.utcnow()
+    return [{"id": f"r{i:08d}", "patient_id": f"p{i % 1000:04d}", "risk_score": 0.4, "band": "medium",
+             "top_features": top, "explanation": "- bench explanation", "explanation_status": "ready",
+             "features_hash": "0" * 16, "model_version": MODEL_VERSION, "explanation_tier": "fast",
+             "timestamp": now - timedelta(seconds=i)} for i, top in enumerate(drivers)]
+
+
+def _store(path: str, rows: list, packed: bool) -> tuple:
+    """Insert the rows (packing them first when `packed`); returns (insert seconds, predictions bytes)."""
+    eng = make_engine(f"sqlite:///{path}")
+    init_schema(eng)
+    with eng.begin() as conn:
+        conn.execute(insert(Customer), [{"id": "bench", "name": "Bench"}])
+        conn.execute(insert(Patient), [{"id": f"p{i:04d}", "name": "P", "details": {}, "customer_id": "bench"}
+                                       for i in range(1000)])
+    t0 = time.perf_counter()
+    with eng.begin() as conn:
+        for start in range(0, len(rows), CHUNK):
+            chunk = [dict(r) for r in rows[start:start + CHUNK]]
+            if packed:
+                pack_rows(chunk)
+                conn.execute(insert_feature_schemas, schema_rows(chunk))
+            conn.execute(insert(Prediction), chunk)
+    seconds = time.perf_counter() - t0
+    with eng.connect() as conn:
+        conn.execute(text("VACUUM"))
+        size = conn.execute(text("SELECT SUM(pgsize) FROM dbstat WHERE name = 'predictions'")).scalar_one()
+    eng.dispose()
+    return seconds, size
+
+
+def _per_row_us(fn, items: list, repeat: int) -> float:
+    waits = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for item in items:
+            fn(item)
+        waits.append(time.perf_counter() - t0)
+    return statistics.median(waits) / len(items) * 1e6
+
+
+def main(n: int, repeat: int):
+    names = list(feature_plan.column_names)
+    print(f"{n} predictions per run, {len(names)} model features; sizes from dbstat, scaled to 1M rows")
+    print(f"{'drivers':>14}{'storage':>9}{'MB/1M':>9}{'insert s':>10}{'encode us':>11}{'decode us':>11}{'resp B':>8}")
+    for profile in ("provided", "full"):
+        drivers = _drivers(profile, n)
+        rows = _rows(drivers)
+        sample = drivers[:20000]
+        blobs = [pack(d, names) for d in sample]
+        texts = [json.dumps(d) for d in sample]
+        # Decoded keys are the schema spelling, values float32
+        assert all(abs(unpack(b, names)[k.replace("-", "_")] - v) < 1e-6 for b, d in zip(blobs[:100], sample)
+                   for k, v in d.items())
+        avg_keys = statistics.mean(len(d) for d in sample)
+
+        for storage in ("json", "packed"):
+            seconds, size = _store(f"{_tmpdir}/{profile}-{storage}.db", rows, storage == "packed")
+            if storage == "json":
+                encode = _per_row_us(json.dumps, sample, repeat)
+                decode = _per_row_us(json.loads, texts, repeat)
+                resp = statistics.mean(len(t) for t in texts)
+            else:
+                encode = _per_row_us(lambda d: pack(d, names), sample, repeat)
+                decode = _per_row_us(lambda b: unpack(b, names), blobs, repeat)
+                resp = statistics.mean(len(base64.b64encode(b)) + 2 for b in blobs)
+            print(f"{profile + f' ({avg_keys:.0f})':>14}{storage:>9}{size / n * 1e6 / 2**20:>9.1f}{seconds:>10.2f}"
+                  f"{encode:>11.2f}{decode:>11.2f}{resp:>8.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="top_features JSON vs packed float32 contributions")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
@@ -0,0 +1,123 @@
+"""
+One database file for every customer against one shard per customer, with
+one customer running a bulk import while the others keep making small
+writes (a prediction plus a nudge per commit, as /predict does).
+
+- single: every customer in one WAL database with the tuned pragmas
+- sharded: TenantRouter shards, one file (and write lock) per customer
+
+The bulk customer commits `--bulk-batch` predictions at a time for the
+whole run. Reported: small-write throughput and latency across the other
+customers, and the bulk import's rows/s.
+
+Run from backend/:  python -m bench.sharding --customers 8 --writes 3000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+_tmpdir = tempfile.mkdtemp()
+os.environ["READM_DATABASE_URL"] = f"sqlite:///{_tmpdir}/catalog.db"
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Customer, Nudge, Patient, Prediction, init_schema, make_engine
+from app.shards import TenantRouter
+from bench.db_concurrency import _prediction_row
+
+CONCURRENCY = 16
+PATIENTS = 50
+
+
+def _seed(session_for, customers: list):
+    for cid in customers:
+        db = session_for(cid)
+        try:
+            db.execute(insert(Customer), [{"id": cid, "name": cid}])
+            db.execute(insert(Patient), [{"id": f"{cid}-p{i}", "name": "P", "details": {}, "customer_id": cid}
+                                         for i in range(PATIENTS)])
+            db.commit()
+        finally:
+            db.close()
+
+
+def run(session_for, customers: list, writes: int, bulk_batch: int) -> dict:
+    bulk, others = customers[0], customers[1:]
+    _seed(session_for, customers)
+    stop = threading.Event()
+    bulk_rows = [0]
+
+    def bulk_import():
+        while not stop.is_set():
+            db = session_for(bulk)
+            try:
+                db.execute(insert(Prediction), [_prediction_row(f"{bulk}-p{i % PATIENTS}", datetime.utcnow())
+                                                for i in range(bulk_batch)])
+                db.commit()
+                bulk_rows[0] += bulk_batch
+            finally:
+                db.close()
+
+    def small_write(i):
+        cid = others[i % len(others)]
+        row = _prediction_row(f"{cid}-p{i % PATIENTS}", datetime.utcnow())
+        t0 = time.perf_counter()
+        db = session_for(cid)
+        try:
+            db.add_all([Prediction(**row), Nudge(prediction_id=row["id"], suggestion="bench", category="general")])
+            db.commit()
+            return time.perf_counter() - t0, None
+        except Exception as e:
+            return time.perf_counter() - t0, e
+        finally:
+            db.close()
+
+    importer = threading.Thread(target=bulk_import)
+    importer.start()
+    time.sleep(0.2)  # let the import get going
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(CONCURRENCY) as pool:
+        results = list(pool.map(small_write, range(writes)))
+    wall = time.perf_counter() - t0
+    stop.set()
+    importer.join()
+
+    lat = sorted(t for t, e in results if e is None)
+    return {"writes_per_s": len(results) / wall, "p50": statistics.median(lat) * 1000,
+            "p99": lat[int(len(lat) * 0.99)] * 1000, "errors": sum(e is not None for _, e in results),
+            "bulk_rows_per_s": bulk_rows[0] / wall}
+
+
+def main(n_customers: int, writes: int, bulk_batch: int):
+    customers = [f"cust{i}" for i in range(n_customers)]
+    print(f"{n_customers} customers ({customers[0]} bulk-importing {bulk_batch} rows/commit), "
+          f"{writes} small writes from {CONCURRENCY} threads")
+    print(f"{'setup':9}{'writes/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}{'bulk rows/s':>13}")
+
+    eng = make_engine(f"sqlite:///{_tmpdir}/single.db")
+    init_schema(eng)
+    Session = sessionmaker(bind=eng, autoflush=False)
+    single = run(lambda cid: Session(), customers, writes, bulk_batch)
+    eng.dispose()
+
+    router = TenantRouter(f"{_tmpdir}/shards", max_open=n_customers)
+    sharded = run(router.session, customers, writes, bulk_batch)
+
+    for name, r in (("single", single), ("sharded", sharded)):
+        print(f"{name:9}{r['writes_per_s']:>10.0f}{r['p50']:>9.2f}{r['p99']:>9.2f}{r['errors']:>8}"
+              f"{r['bulk_rows_per_s']:>13.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Single database vs per-customer shards under a bulk import")
+    parser.add_argument("--customers", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=3000)
+    parser.add_argument("--bulk-batch", type=int, default=5000)
+    args = parser.parse_args()
+    main(args.customers, args.writes, args.bulk_batch)
@@ -0,0 +1,44 @@
+"""
+Cold-start numbers: time to import app.main, and time until /ready answers
+200 (model loaded + warm-up prediction) when the app starts.
+
+Each run happens in a fresh interpreter so nothing is already imported.
+
+Run from backend/:  python -m bench.startup --runs 3
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import os, tempfile, time
+os.environ.setdefault("READM_DATABASE_URL", "sqlite:///" + tempfile.mkdtemp() + "/startup.db")
+t0 = time.perf_counter()
+import app.main as api
+imported = time.perf_counter() - t0
+from fastapi.testclient import TestClient
+with TestClient(api.app) as client:
+    while client.get("/ready").status_code != 200:
+        time.sleep(0.01)
+    ready = time.perf_counter() - t0
+print(f"{imported * 1000:.1f} {ready * 1000:.1f}")
+"""
+
+
+def main(runs: int):
+    imports, readies = [], []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, check=True)
+        imported, ready = map(float, out.stdout.split())
+        imports.append(imported)
+        readies.append(ready)
+    print(f"import app.main : median {statistics.median(imports):.0f} ms  (runs: {', '.join(f'{x:.0f}' for x in imports)})")
+    print(f"time to /ready  : median {statistics.median(readies):.0f} ms  (runs: {', '.join(f'{x:.0f}' for x in readies)})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure API import time and time-to-ready")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    main(args.runs)
@@ -0,0 +1,63 @@
+"""
+Microbenchmark: patient dict(s) → model input.
+
+"legacy" is the original per-row loop (list membership test per feature,
+one-row pandas DataFrame, Pool built inside predict_proba); "plan" is the
+compiled FeaturePlan emitting a FeaturesData Pool.
+
+Run from backend/:  python -m bench.vectorize
+"""
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from catboost import Pool
+
+from app.features import FeaturePlan
+from bench.fixtures import PATIENT
+
+with open("models/feature_names.json") as f:
+    EXPECTED_FEATURES = json.load(f)
+with open("models/cat_features.json") as f:
+    CAT_FEATURES = json.load(f)
+
+
+def legacy(rows):
+    records = []
+    for input_json in rows:
+        row = {}
+        for f in EXPECTED_FEATURES:
+            val = input_json.get(f, None)
+            if f in CAT_FEATURES:
+                row[f] = str(val) if val is not None and val == val else "missing"
+            else:
+                try:
+                    row[f] = float(val) if val is not None else np.nan
+                except (ValueError, TypeError):
+                    row[f] = np.nan
+        records.append(row)
+    X = pd.DataFrame(records)
+    return Pool(X, cat_features=CAT_FEATURES)
+
+
+def _per_call_us(fn, rows, repeat):
+    fn(rows)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(rows)
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def main():
+    plan = FeaturePlan(EXPECTED_FEATURES, CAT_FEATURES)
+    print(f"{'rows':>6}{'legacy us':>12}{'plan us':>12}{'speedup':>10}")
+    for n, repeat in ((1, 2000), (32, 500), (1000, 20)):
+        rows = [dict(PATIENT, number_inpatient=i % 7) for i in range(n)]
+        before = _per_call_us(legacy, rows, repeat)
+        after = _per_call_us(plan.to_pool, rows, repeat)
+        print(f"{n:>6}{before:>12.1f}{after:>12.1f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Saving /predict rows: one commit per request against the write-behind
+journal.
+
+- per-request: AsyncSession add prediction + nudges, commit (40 concurrent
+  tasks on one event loop, as the handlers do with READM_WRITE_BEHIND=0)
+- write-behind: PredictionJournal.append() from the same tasks; the
+  journal's thread commits batches on a sync engine
+
+Both use the tuned pragmas, once with synchronous=NORMAL (the default) and
+once with FULL (an fsync per commit). "acked/s" is how fast saves return to
+the handler; "stored/s" counts until the last row is committed.
+
+Run from backend/:  python -m bench.write_behind --saves 5000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+_tmpdir = tempfile.mkdtemp()
+os.environ["READM_DATABASE_URL"] = f"sqlite:///{_tmpdir}/import.db"
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Customer, Nudge, Patient, Prediction, init_schema, make_async_engine, make_engine, sqlite_pragmas
+from app.journal import PredictionJournal
+from bench.db_concurrency import _prediction_row
+
+CONCURRENCY = 40
+PATIENTS = 200
+NUDGES = 3
+
+
+def _pragmas(synchronous: str) -> list:
+    return [p if not p.startswith("synchronous=") else f"synchronous={synchronous}" for p in sqlite_pragmas()]
+
+
+def _seed(path: str):
+    eng = make_engine(f"sqlite:///{path}")
+    init_schema(eng)
+    with eng.begin() as conn:
+        conn.execute(insert(Customer), [{"id": "bench", "name": "Bench"}])
+        conn.execute(insert(Patient), [{"id": f"p{i}", "name": "P", "details": {}, "customer_id": "bench"}
+                                       for i in range(PATIENTS)])
+    eng.dispose()
+
+
+def _rows(i: int):
+    row = _prediction_row(f"p{i % PATIENTS}", datetime.utcnow())
+    return row, [{"prediction_id": row["id"], "suggestion": f"nudge {k}", "category": "general"} for k in range(NUDGES)]
+
+
+async def _drive(save, saves: int) -> list:
+    gate = asyncio.Semaphore(CONCURRENCY)
+
+    async def one(i):
+        async with gate:
+            t0 = time.perf_counter()
+            await save(i)
+            return time.perf_counter() - t0
+
+    return await asyncio.gather(*(one(i) for i in range(saves)))
+
+
+def run_per_request(path: str, saves: int, synchronous: str) -> dict:
+    async def main():
+        eng = make_async_engine(f"sqlite+aiosqlite:///{path}", pragmas=_pragmas(synchronous))
+        Session = async_sessionmaker(eng, autoflush=False, expire_on_commit=False)
+
+        async def save(i):
+            row, nudges = _rows(i)
+            async with Session() as db:
+                db.add(Prediction(**row))
+                db.add_all([Nudge(**n) for n in nudges])
+                await db.commit()
+
+        t0 = time.perf_counter()
+        waits = await _drive(save, saves)
+        wall = time.perf_counter() - t0
+        await eng.dispose()
+        return _summary(waits, wall, wall, saves)
+
+    return asyncio.run(main())
+
+
+def run_write_behind(path: str, saves: int, synchronous: str) -> dict:
+    eng = make_engine(f"sqlite:///{path}", pragmas=_pragmas(synchronous))
+    Session = sessionmaker(bind=eng, autoflush=False)
+    journal = PredictionJournal(session_for=lambda customer_id: Session(), max_queue=saves)
+
+    async def save(i):
+        journal.append("bench", *_rows(i))
+
+    t0 = time.perf_counter()
+    waits = asyncio.run(_drive(save, saves))
+    acked = time.perf_counter() - t0
+    journal.close()
+    stored = time.perf_counter() - t0
+    stats = journal.stats()
+    eng.dispose()
+    return _summary(waits, acked, stored, stats["transactions"], stats["failed"])
+
+
+def _summary(waits: list, acked: float, stored: float, transactions: int, failed: int = 0) -> dict:
+    lat = sorted(waits)
+    return {"acked": len(lat) / acked, "stored": len(lat) / stored, "p50": statistics.median(lat) * 1000,
+            "p99": lat[int(len(lat) * 0.99)] * 1000, "transactions": transactions, "failed": failed}
+
+
+def main(saves: int):
+    print(f"{saves} saves (1 prediction + {NUDGES} nudges each), {CONCURRENCY} concurrent")
+    print(f"{'setup':26}{'acked/s':>9}{'stored/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'commits':>9}{'failed':>8}")
+    for synchronous in ("NORMAL", "FULL"):
+        for name, run in (("per-request", run_per_request), ("write-behind", run_write_behind)):
+            path = f"{_tmpdir}/{name}-{synchronous}.db"
+            _seed(path)
+            r = run(path, saves, synchronous)
+            print(f"{name + ' ' + synchronous:26}{r['acked']:>9.0f}{r['stored']:>10.0f}{r['p50']:>9.3f}{r['p99']:>9.3f}"
+                  f"{r['transactions']:>9}{r['failed']:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-request commits vs the write-behind prediction journal")
+    parser.add_argument("--saves", type=int, default=5000)
+    args = parser.parse_args()
+    main(args.saves)
@@ -0,0 +1,122 @@
+"""
+Copy each customer's patients, predictions, nudges and rollups from the single
+database (READM_DATABASE_URL) into its own shard file under READM_SHARD_DIR,
+then verify the row counts. The source keeps every customer row and becomes
+the catalog; --delete-source also removes the migrated rows from it.
+
+Run from backend/ with the API stopped:
+    python migrate_shards.py                 # every customer
+    python migrate_shards.py --customer CUST1 --delete-source
+Then start the API with READM_SHARDING_ENABLED=1.
+"""
+import argparse
+import os
+import time
+
+from sqlalchemy import delete, func, insert, select
+
+from app.db import (
+    Customer, CustomerRiskRollup, FeatureSchema, Nudge, Patient, PatientFeatures, PatientLatestRisk, Prediction,
+    PredictionArchive,
+    engine as source_engine, init_schema, make_engine,
+)
+from app.shards import TenantRouter
+
+CHUNK = 5000
+
+
+def _customer_queries(customer_id: str) -> dict:
+    """Per table: the select of the customer's rows (Customer first, children after parents)."""
+    patient_ids = select(Patient.id).where(Patient.customer_id == customer_id)
+    prediction_ids = select(Prediction.id).where(Prediction.patient_id.in_(patient_ids))
+    return {
+        Customer: select(Customer.__table__).where(Customer.id == customer_id),
+        Patient: select(Patient.__table__).where(Patient.customer_id == customer_id),
+        PatientFeatures: select(PatientFeatures.__table__).where(PatientFeatures.patient_id.in_(patient_ids)),
+        # Shared by every customer (a few rows), so every shard gets them all and the source keeps them
+        FeatureSchema: select(FeatureSchema.__table__),
+        Prediction: select(Prediction.__table__).where(Prediction.patient_id.in_(patient_ids)),
+        Nudge: select(Nudge.__table__).where(Nudge.prediction_id.in_(prediction_ids)),
+        # The Parquet files themselves stay where they are (READM_ARCHIVE_DIR)
+        PredictionArchive: select(PredictionArchive.__table__).where(PredictionArchive.customer_id == customer_id),
+        # After Prediction: replaces what its triggers counted, as the source's counters include archived predictions
+        CustomerRiskRollup: select(CustomerRiskRollup.__table__).where(CustomerRiskRollup.customer_id == customer_id),
+    }
+
+
+def _count(conn, query) -> int:
+    return conn.execute(select(func.count()).select_from(query.subquery())).scalar_one()
+
+
+def migrate_customer(customer_id: str, router: TenantRouter, force: bool = False, delete_source: bool = False) -> dict:
+    os.makedirs(router.shard_dir, exist_ok=True)
+    shard_engine = make_engine(f"sqlite:///{router.path_for(customer_id)}")
+    init_schema(shard_engine)
+    queries = _customer_queries(customer_id)
+    counts = {}
+    try:
+        with source_engine.connect() as src, shard_engine.begin() as dst:
+            if _count(dst, select(Patient.__table__)) and not force:
+                raise RuntimeError(f"shard for {customer_id} already has data (use --force to replace it)")
+            # patient_latest_risk is rebuilt by the predictions trigger as rows are copied
+            for model in [PatientLatestRisk] + list(reversed(queries)):
+                dst.execute(delete(model))
+
+            for model, query in queries.items():
+                if model is CustomerRiskRollup:
+                    dst.execute(delete(model))
+                result = src.execution_options(yield_per=CHUNK).execute(query)
+                n = 0
+                for rows in result.partitions():
+                    dst.execute(insert(model), [dict(r._mapping) for r in rows])
+                    n += len(rows)
+                counts[model.__tablename__] = n
+
+            # Verify before anything is removed from the source
+            for model in queries:
+                copied = _count(dst, select(model.__table__))
+                if copied != counts[model.__tablename__]:
+                    raise RuntimeError(f"{customer_id}: {model.__tablename__} copied {copied} of {counts[model.__tablename__]}")
+    finally:
+        shard_engine.dispose()
+
+    if delete_source:
+        with source_engine.begin() as src:
+            patient_ids = queries[Patient].with_only_columns(Patient.id)
+            src.execute(delete(PatientLatestRisk).where(PatientLatestRisk.patient_id.in_(patient_ids)))
+            src.execute(delete(PatientFeatures).where(PatientFeatures.patient_id.in_(patient_ids)))
+            src.execute(delete(CustomerRiskRollup).where(CustomerRiskRollup.customer_id == customer_id))
+            src.execute(delete(PredictionArchive).where(PredictionArchive.customer_id == customer_id))
+            for model in (Nudge, Prediction, Patient):  # children first
+                src.execute(delete(model).where(model.id.in_(queries[model].with_only_columns(model.id))))
+    return counts
+
+
+def main(customer_ids: list, force: bool, delete_source: bool, shard_dir: str = None):
+    init_schema(source_engine)
+    router = TenantRouter(shard_dir) if shard_dir else TenantRouter()
+    with source_engine.connect() as conn:
+        all_ids = [c for (c,) in conn.execute(select(Customer.id).order_by(Customer.id))]
+    unknown = set(customer_ids or []) - set(all_ids)
+    if unknown:
+        raise SystemExit(f"Unknown customers: {sorted(unknown)}")
+
+    for customer_id in customer_ids or all_ids:
+        t0 = time.perf_counter()
+        try:
+            counts = migrate_customer(customer_id, router, force=force, delete_source=delete_source)
+        except RuntimeError as e:
+            raise SystemExit(str(e))
+        print(f"{customer_id} -> {router.path_for(customer_id)}: "
+              f"{counts['patients']} patients, {counts['predictions']} predictions, {counts['nudges']} nudges "
+              f"({time.perf_counter() - t0:.2f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split the single database into per-customer shards")
+    parser.add_argument("--customer", action="append", dest="customers", help="migrate only this customer (repeatable)")
+    parser.add_argument("--force", action="store_true", help="replace shards that already hold data")
+    parser.add_argument("--delete-source", action="store_true", help="remove migrated rows from the source database")
+    parser.add_argument("--shard-dir", help="defaults to READM_SHARD_DIR")
+    args = parser.parse_args()
+    main(args.customers, args.force, args.delete_source, args.shard_dir)
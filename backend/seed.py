@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
 # seed.py
 import uuid
-from app.db import SessionLocal, Customer, Patient
+from app.db import SessionLocal, Customer, Patient, engine, init_schema
 import sqlalchemy
+init_schema(engine)
 db = SessionLocal()
 
 # 🧹 Clean old data
@@ -0,0 +1,82 @@
+"""
+Offline report for the LR -> CatBoost cascade: AUC of each model and of the
+cascade for several LR uncertainty bands, from the saved validation
+predictions (train_lr.py / predict_catboost.py), plus per-row serving
+latency of each stage. The latency section is skipped when the CatBoost
+model (READM_MODEL_PATH) is not there.
+
+Run from backend/:  python -m stack.cascade_report [--latency-rows 200]
+"""
+import argparse
+import os
+import time
+import numpy as np
+from sklearn.metrics import roc_auc_score
+
+BANDS = [(0.05, 0.30), (0.08, 0.35), (0.10, 0.40), (0.10, 0.30), (0.12, 0.30)]
+
+
+def _latency_rows(n):
+    """Validation rows as serving dicts; falls back to a synthetic profile without the raw CSV."""
+    try:
+        from stack.preprocess_tabular import preprocess
+        _, X_val, _, _, _ = preprocess()
+        return X_val.head(n).to_dict("records")
+    except FileNotFoundError:
+        from bench.fixtures import PATIENT
+        return [dict(PATIENT, number_inpatient=i % 7, time_in_hospital=i % 13) for i in range(n)]
+
+
+def _per_row_ms(fn, rows, repeat=5):
+    fn(rows[:1])
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for r in rows:
+            fn([r])
+    return (time.perf_counter() - t0) / (repeat * len(rows)) * 1000
+
+
+def report(latency_rows=200):
+    # Saved validation predictions from train_lr.py / predict_catboost.py
+    val_idx = np.load("stack/val_idx.npy")
+    y_val = np.load("stack/y_val.npy")
+    p_lr = np.load("stack/p_lr.npy")
+    p_cat = np.load("stack/p_catboost.npy")
+    assert len(val_idx) == len(y_val) == len(p_lr) == len(p_cat), "validation artifacts are out of sync"
+
+    auc_cat = roc_auc_score(y_val, p_cat)
+    print(f"\n=== CASCADE REPORT (validation split, n={len(y_val)}) ===")
+    print(f"CatBoost only AUC : {auc_cat:.4f}")
+    print(f"LR only AUC       : {roc_auc_score(y_val, p_lr):.4f}")
+
+    # Serving latency of each stage (single-row calls, as /predict sees them)
+    t_lr = t_cat = None
+    try:
+        from app.ml import InferenceEngine
+        from app.cascade import LRScreen
+        from app.config import CASCADE_LR_PATH, MODEL_PATH
+        if not os.path.exists(MODEL_PATH):
+            raise FileNotFoundError(f"no CatBoost model at {MODEL_PATH}")
+        rows = _latency_rows(latency_rows)
+        # cache disabled so every call pays for CatBoost + SHAP
+        t_cat = _per_row_ms(InferenceEngine(cache_size=0).predict_batch, rows)
+        t_lr = _per_row_ms(LRScreen(CASCADE_LR_PATH).predict_batch, rows)
+        print(f"Latency per row   : LR {t_lr:.2f} ms | CatBoost+SHAP {t_cat:.2f} ms")
+    except (OSError, ImportError) as e:
+        print(f"(latency skipped: {e})")
+
+    print(f"\n{'band':>12} {'short-circuit':>14} {'AUC':>8} {'dAUC':>8} {'ms saved/req':>13}")
+    for lo, hi in BANDS:
+        uncertain = (p_lr >= lo) & (p_lr <= hi)
+        share = 1 - uncertain.mean()
+        auc = roc_auc_score(y_val, np.where(uncertain, p_cat, p_lr))
+        saved = f"{t_cat - (t_lr + (1 - share) * t_cat):.2f}" if t_cat is not None else "n/a"
+        print(f"{lo:.2f}-{hi:.2f}".rjust(12), f"{share:>13.1%}", f"{auc:>8.4f}", f"{auc - auc_cat:>+8.4f}", f"{saved:>13}")
+    print("==========================================\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline report for the LR -> CatBoost cascade")
+    parser.add_argument("--latency-rows", type=int, default=200)
+    args = parser.parse_args()
+    report(args.latency_rows)
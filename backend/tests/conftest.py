@@ -0,0 +1,72 @@
+import os
+import tempfile
+
+# Set before any app module is imported (app.config reads the environment once): the tests never
+# touch the checked-in database, shards, archive or explanation cache
+_scratch = tempfile.mkdtemp(prefix="readm-tests-")
+os.environ["READM_DATABASE_URL"] = f"sqlite:///{_scratch}/readm.db"
+os.environ["READM_SHARD_DIR"] = f"{_scratch}/shards"
+os.environ["READM_ARCHIVE_DIR"] = f"{_scratch}/archive"
+os.environ["READM_EXPLAIN_CACHE_PATH"] = f"{_scratch}/explanation_cache.db"
+
+import numpy as np
+import pytest
+
+
+def _baseline_frame(rows: list):
+    """
+    Model input as the original per-row scorer built it: one DataFrame row per
+    patient, features looked up by their feature_names.json spelling only.
+    """
+    import pandas as pd
+    from app.features import load_feature_plan
+
+    plan = load_feature_plan()
+    cat_set = set(plan.cat_names)
+    frame = []
+    for row in rows:
+        out = {}
+        for f in plan.feature_names:
+            val = row.get(f, None)
+            if f in cat_set:
+                out[f] = str(val) if val is not None and val == val else "missing"
+            else:
+                try:
+                    out[f] = float(val) if val is not None else np.nan
+                except (ValueError, TypeError):
+                    out[f] = np.nan
+        frame.append(out)
+    return pd.DataFrame(frame, columns=plan.feature_names)
+
+
+@pytest.fixture
+def baseline_frame():
+    return _baseline_frame
+
+
+@pytest.fixture(scope="session")
+def model_path(tmp_path_factory):
+    """A small CatBoost model on the real feature layout, trained on synthetic patients (stack/*.cbm is not checked in)."""
+    from catboost import CatBoostClassifier
+    from app.features import load_feature_plan
+    from bench.fixtures import patient_population
+
+    rows = patient_population(300)
+    labels = [int(r["number_inpatient"] + r["number_emergency"] >= 2 or r["time_in_hospital"] > 10) for r in rows]
+    model = CatBoostClassifier(iterations=30, depth=4, random_seed=0, thread_count=1,
+                               verbose=False, allow_writing_files=False)
+    model.fit(_baseline_frame(rows), labels, cat_features=load_feature_plan().cat_names)
+    path = tmp_path_factory.mktemp("model") / "catboost_test.cbm"
+    model.save_model(str(path))
+    return str(path)
+
+
+@pytest.fixture
+def client(model_path, monkeypatch):
+    """TestClient on the app (startup and shutdown hooks run), scoring with the test model."""
+    from fastapi.testclient import TestClient
+    from app import main, ml
+
+    monkeypatch.setattr(ml, "_engine", ml.InferenceEngine(model_path))
+    with TestClient(main.app) as c:
+        yield c
@@ -0,0 +1,64 @@
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+from app.archive import archive_customer
+from app.db import Nudge, Prediction, engine
+from app.shards import tenant_session
+
+
+def _customer_with_history(client) -> tuple:
+    """A patient with 40 daily predictions (one with a nudge) ending today, and a second patient."""
+    customer_id = f"arch-{uuid.uuid4().hex[:8]}"
+    client.post("/customers", json={"id": customer_id, "name": "Archive", "explainer": "local"})
+    for patient_id in ("p1", "p2"):
+        client.post(f"/customers/{customer_id}/patients", json={"id": f"{customer_id}-{patient_id}", "name": "P"})
+    now = datetime.utcnow()
+    rows = [
+        {"id": f"{customer_id}-r{i:02d}", "patient_id": f"{customer_id}-p1", "risk_score": i / 40,
+         "band": ("low", "medium", "high")[i % 3], "top_features": {}, "explanation": "x",
+         "timestamp": now - timedelta(days=39 - i)}
+        for i in range(40)
+    ] + [{"id": f"{customer_id}-q", "patient_id": f"{customer_id}-p2", "risk_score": 0.5, "band": "medium",
+          "top_features": {}, "explanation": "x", "timestamp": now - timedelta(days=60)}]
+    with engine.begin() as conn:
+        conn.execute(insert(Prediction.__table__), rows)
+        conn.execute(insert(Nudge.__table__), [{"prediction_id": f"{customer_id}-r00", "suggestion": "s",
+                                                "category": "c", "timestamp": now}])
+    return customer_id, f"{customer_id}-p1"
+
+
+def _hot(customer_id: str) -> int:
+    with engine.connect() as conn:
+        return conn.scalar(select(func.count()).select_from(Prediction)
+                           .where(Prediction.id.like(f"{customer_id}-%")))
+
+
+def test_archived_predictions_come_back_through_patient_analytics(client):
+    customer_id, patient_id = _customer_with_history(client)
+    url = f"/analytics/patients/{customer_id}/{patient_id}"
+    before = client.get(url).json()
+    high_before = client.get(url, params={"band": "high"}).json()
+    assert len(before) == 40
+
+    db = tenant_session(customer_id)
+    try:
+        counts = archive_customer(db, customer_id, datetime.utcnow() - timedelta(days=14, hours=12))
+    finally:
+        db.close()
+    # The other patient's only prediction is their newest, so it stays hot
+    assert counts["predictions"] == 25 and counts["nudges"] == 1 and _hot(customer_id) == 16
+
+    assert client.get(url).json() == before
+    assert client.get(url, params={"band": "high"}).json() == high_before
+
+    # Paging crosses from the Parquet files to the hot rows
+    items, cursor = [], None
+    while True:
+        r = client.get(url, params={"limit": 7, **({"cursor": cursor} if cursor else {})})
+        items += r.json()
+        cursor = r.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert items == before
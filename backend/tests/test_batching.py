@@ -0,0 +1,50 @@
+import threading
+
+import pytest
+
+from app.batching import MicroBatcher
+
+
+def test_concurrent_calls_share_a_batch():
+    calls = []
+
+    def score_batch(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+
+    # A full batch is scored at once; the long wait only bounds a partial one
+    batcher = MicroBatcher(score_batch, max_batch_size=6, max_wait_ms=5000)
+    results = [None] * 6
+
+    def call(i):
+        results[i] = batcher.score(i)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert results == [0, 2, 4, 6, 8, 10]
+    assert len(calls) == 1 and sorted(calls[0]) == list(range(6))
+    assert batcher.stats()["batches"] == 1
+
+
+def test_failed_batch_falls_back_to_single_items():
+    def score_batch(items):
+        if "bad" in items:
+            raise ValueError("bad input")
+        return [item.upper() for item in items]
+
+    batcher = MicroBatcher(score_batch, max_batch_size=3, max_wait_ms=5000)
+    futures = [batcher.submit(item) for item in ("a", "bad", "c")]
+    assert futures[0].result(5) == "A" and futures[2].result(5) == "C"
+    with pytest.raises(ValueError, match="bad input"):
+        futures[1].result(5)
+    stats = batcher.stats()
+    assert stats["fallbacks"] == 1 and stats["errors"] == 1 and stats["items_scored"] == 3
+
+
+def test_wrong_result_count_is_an_error():
+    batcher = MicroBatcher(lambda items: [], max_batch_size=1)
+    with pytest.raises(RuntimeError, match="0 results for 1 items"):
+        batcher.score("x")
@@ -0,0 +1,59 @@
+from app import cache as cache_module
+from app.cache import LRUCache
+from app.ml import InferenceEngine
+from bench.fixtures import PATIENT
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the oldest
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = LRUCache(max_entries=4, ttl_seconds=10)
+    cache.put("a", 1)
+    now[0] += 9
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["expirations"] == 1 and stats["size"] == 0
+
+
+def test_rejected_entry_counts_as_a_miss_and_zero_size_disables():
+    cache = LRUCache(max_entries=4)
+    cache.put("a", "fast")
+    assert cache.get("a", accept=lambda v: v == "exact") is None
+    assert cache.get("a", accept=lambda v: v == "fast") == "fast"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    off = LRUCache(max_entries=0)
+    off.put("a", 1)
+    assert off.get("a") is None and off.stats()["size"] == 0
+
+
+def test_engine_cache_serves_only_equal_or_better_tiers(model_path):
+    engine = InferenceEngine(model_path, cache_size=16)
+    fast = engine.predict_batch([PATIENT], "fast")[0]
+    assert fast["explanation_tier"] == "fast" and engine.cache.hits == 0
+
+    # A fast entry cannot answer an exact request; the exact result replaces it
+    exact = engine.predict_batch([PATIENT], "exact")[0]
+    assert exact["explanation_tier"] == "exact" and engine.cache.hits == 0
+
+    # ... and then answers fast and none lookups too
+    again = engine.predict_batch([PATIENT], "fast")[0]
+    assert again["explanation_tier"] == "exact" and again["top_features"] == exact["top_features"]
+    assert engine.predict_batch([PATIENT], "none")[0]["top_features"] == {}
+    assert engine.cache.hits == 2 and engine.cache.stats()["size"] == 1
+
+    engine.load(model_path)  # a reload drops scores from the previous model
+    assert engine.cache.stats()["size"] == 0
+
@@ -0,0 +1,69 @@
+import base64
+import uuid
+
+import numpy as np
+import pytest
+
+from app import contributions
+from app.contributions import pack, pack_rows, schema_rows, unpack
+from app.db import feature_plan
+from app.ml import InferenceEngine
+from bench.fixtures import PATIENT, patient_population
+
+
+def _top(drivers: dict, k: int = 5) -> list:
+    return sorted(drivers, key=lambda name: -abs(drivers[name]))[:k]
+
+
+def test_packed_vectors_round_trip_to_the_same_top_features(model_path):
+    names = feature_plan.column_names
+    engine = InferenceEngine(model_path, cache_size=0)
+    for result in engine.predict_batch(patient_population(20, seed=4)):
+        drivers = result["top_features"]
+        restored = unpack(pack(drivers, names), names)
+        assert set(restored) == set(drivers)
+        assert _top(restored) == _top(drivers)
+        for name, value in drivers.items():
+            assert restored[name] == pytest.approx(value, rel=1e-6, abs=1e-7)
+
+
+def test_aliases_pack_and_unknown_features_keep_json():
+    names = ["age", "glyburide-metformin"]
+    assert unpack(pack({"glyburide_metformin": 0.25}, names), names) == {"glyburide-metformin": 0.25}
+    assert np.frombuffer(pack({}, names), dtype="<f4").size == 2
+    assert pack({"not_a_feature": 1.0}, names) is None
+
+
+def test_pack_rows_moves_drivers_into_the_vector(monkeypatch):
+    monkeypatch.setattr(contributions, "SHAP_STORAGE", "packed")
+    version = f"test-{uuid.uuid4().hex[:8]}"
+    rows = [{"top_features": {"age": 0.5, "number_inpatient": -0.25}, "model_version": version},
+            {"top_features": {}, "model_version": version},
+            {"top_features": {"unknown": 1.0}, "model_version": version}]
+    pack_rows(rows)
+    assert rows[0]["top_features"] == {} and rows[0]["top_features_packed"] is not None
+    assert rows[1]["top_features_packed"] is None
+    assert rows[2]["top_features"] == {"unknown": 1.0} and rows[2]["top_features_packed"] is None
+    assert unpack(rows[0]["top_features_packed"], feature_plan.column_names) == {"age": 0.5, "number_inpatient": -0.25}
+    assert schema_rows(rows) == [{"model_version": version, "features": feature_plan.column_names}]
+
+
+def test_packed_history_decodes_with_the_feature_schema(client, monkeypatch):
+    monkeypatch.setattr(contributions, "SHAP_STORAGE", "packed")
+    customer_id = f"packed-{uuid.uuid4().hex[:8]}"
+    patient_id = f"{customer_id}-p1"  # patient ids are unique across customers
+    client.post("/customers", json={"id": customer_id, "name": "Packed", "explainer": "local"})
+    client.post(f"/customers/{customer_id}/patients", json={"id": patient_id, "name": "P", **PATIENT})
+    scored = client.post(f"/customers/{customer_id}/patients/{patient_id}/predict",
+                         json={"input": {"num_lab_procedures": 30}, "explain": "fast"}).json()["prediction"]
+
+    item = client.get(f"/customers/{customer_id}/patients/{patient_id}/predictions",
+                      params={"contributions": "packed"}).json()[0]
+    schema = client.get(f"/customers/{customer_id}/feature-schemas/{item['model_version']}").json()
+    restored = unpack(base64.b64decode(item["top_features_packed"]), schema["features"])
+    assert _top(restored) == _top(scored["top_features"])
+
+    # ?contributions=dict unpacks on the server
+    as_dict = client.get(f"/customers/{customer_id}/patients/{patient_id}/predictions",
+                         params={"contributions": "dict"}).json()[0]["top_features"]
+    assert set(as_dict) == set(scored["top_features"])
@@ -0,0 +1,54 @@
+import time
+import uuid
+
+import pytest
+
+from app import ml
+from app.db import Prediction, SessionLocal
+from bench.fixtures import PATIENT
+
+
+def _new_patient(client) -> tuple:
+    customer_id = f"tiers-{uuid.uuid4().hex[:8]}"
+    patient_id = f"{customer_id}-p1"  # patient ids are unique across customers
+    assert client.post("/customers", json={"id": customer_id, "name": "Tiers", "explainer": "local"}).status_code == 201
+    assert client.post(f"/customers/{customer_id}/patients", json={"id": patient_id, "name": "P", **PATIENT}).status_code == 201
+    return customer_id, patient_id
+
+
+def test_engine_tiers(model_path):
+    engine = ml.InferenceEngine(model_path, cache_size=0)
+    none, fast, exact = (engine.predict_batch([PATIENT], tier)[0] for tier in ml.EXPLAIN_TIERS)
+    assert none["top_features"] == {} and none["explanation_tier"] == "none"
+    assert fast["explanation_tier"] == "fast" and exact["explanation_tier"] == "exact"
+    assert set(fast["top_features"]) == set(exact["top_features"])
+    assert none["risk_score"] == fast["risk_score"] == exact["risk_score"]
+
+
+def test_exact_request_answers_fast_then_upgrades_the_row(client):
+    customer_id, patient_id = _new_patient(client)
+    r = client.post(f"/customers/{customer_id}/patients/{patient_id}/predict",
+                    json={"input": {"num_lab_procedures": 44}, "explain": "exact"})
+    assert r.status_code == 201
+    body = r.json()
+    assert body["exact_pending"] and body["prediction"]["explanation_tier"] == "fast"
+
+    prediction_id = body["prediction"]["id"]
+    deadline = time.monotonic() + 10
+    while True:
+        with SessionLocal() as db:
+            pred = db.get(Prediction, prediction_id)
+            if pred.explanation_tier == "exact" or time.monotonic() > deadline:
+                break
+        time.sleep(0.05)
+    assert pred.explanation_tier == "exact"
+    expected = ml.InferenceEngine(ml.loaded_engine().model_path, cache_size=0).predict_batch(
+        [body["merged_details"]], "exact")[0]["top_features"]
+    assert set(pred.top_features) == set(expected)
+    for name, value in expected.items():
+        assert pred.top_features[name] == pytest.approx(value, abs=1e-6)
+
+    # The upgraded row now answers an unchanged exact request
+    again = client.post(f"/customers/{customer_id}/patients/{patient_id}/predict",
+                        json={"input": {"num_lab_procedures": 44}, "explain": "exact"}).json()
+    assert again["reused"] and again["prediction"]["explanation_tier"] == "exact"
@@ -0,0 +1,51 @@
+import numpy as np
+from sqlalchemy import insert, select, update
+
+from app.db import (Customer, Patient, PatientFeatures, feature_plan, init_schema, load_feature_matrix,
+                    make_engine, patient_features_row, sync_patient_features, upsert_patient_features)
+from bench.fixtures import patient_population
+
+ODD = {"age": "n/a", "race": None, "glyburide_metformin": "Up", "diag_1": "a\x1fb"}
+
+
+def _assert_arrays_equal(actual, expected):
+    assert np.array_equal(actual[0], expected[0], equal_nan=True)
+    assert (actual[1] == expected[1]).all()
+
+
+def test_packed_row_unpacks_to_the_vectorized_row():
+    rows = patient_population(5) + [ODD, {}]
+    packed = [feature_plan.to_columns(r) for r in rows]
+    unpacked = feature_plan.unpack([p["num_vector"] for p in packed], [p["cat_vector"] for p in packed])
+    _assert_arrays_equal(unpacked, feature_plan.to_arrays(rows))
+
+    # Typed columns hold the same values, NaN as NULL
+    assert packed[-2]["age"] is None and packed[-2]["race"] == "missing"
+    assert packed[-2]["glyburide_metformin"] == "Up"
+
+
+def test_feature_matrix_equals_the_details_and_stale_rows_are_rebuilt(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path}/features.db")
+    init_schema(engine)
+    details = {f"p{i}": d for i, d in enumerate(patient_population(6) + [ODD])}
+    with engine.begin() as conn:
+        conn.execute(insert(Customer.__table__), [{"id": "c", "name": "C"}])
+        # Bulk-inserted without features_hash or a feature-store row
+        conn.execute(insert(Patient.__table__),
+                     [{"id": pid, "name": "n", "customer_id": "c", "details": d} for pid, d in details.items()])
+        ids, hashes, num, cat = load_feature_matrix(conn, "c")
+    assert ids == sorted(details) and all(hashes)
+    _assert_arrays_equal((num, cat), feature_plan.to_arrays([details[pid] for pid in ids]))
+
+    with engine.begin() as conn:
+        # Details changed behind the store's back, and a row written under another layout
+        changed = dict(details["p1"], age=30)
+        conn.execute(update(Patient.__table__).where(Patient.id == "p1").values(details=changed, features_hash="h1"))
+        conn.execute(upsert_patient_features, [dict(patient_features_row("p2", hashes[2], details["p2"]),
+                                                    layout="old")])
+        assert sync_patient_features(conn) == 2
+        assert sync_patient_features(conn) == 0
+        _, _, num, cat = load_feature_matrix(conn, "c")
+        age = conn.execute(select(PatientFeatures.age).where(PatientFeatures.patient_id == "p1")).scalar()
+    assert age == 30
+    _assert_arrays_equal((num, cat), feature_plan.to_arrays([changed if pid == "p1" else details[pid] for pid in ids]))
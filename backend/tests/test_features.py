@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from app.features import MISSING_CATEGORY, load_feature_plan
+from bench.fixtures import PATIENT, patient_population
+
+ODD_ROWS = [
+    {},
+    {"age": "not a number", "time_in_hospital": None, "race": None, "gender": float("nan")},
+    {"num_lab_procedures": "41", "diag_1": 428, "glyburide-metformin": "Steady"},
+]
+
+
+def _assert_same_input(plan, rows, frame):
+    num, cat = plan.to_arrays(rows)
+    expected_num = frame[plan.num_names].to_numpy(dtype=np.float32)
+    assert np.array_equal(num, expected_num, equal_nan=True)
+    assert (cat == frame[plan.cat_names].to_numpy(dtype=object)).all()
+
+
+def test_vectorized_rows_equal_the_dataframe_baseline(baseline_frame):
+    plan = load_feature_plan()
+    rows = patient_population(20) + ODD_ROWS
+    _assert_same_input(plan, rows, baseline_frame(rows))
+
+
+def test_underscore_aliases_read_the_hyphenated_column(baseline_frame):
+    plan = load_feature_plan()
+    underscored = [dict(PATIENT, glyburide_metformin="Up", metformin_pioglitazone="No")]
+    hyphenated = [dict(PATIENT, **{"glyburide-metformin": "Up", "metformin-pioglitazone": "No"})]
+    _assert_same_input(plan, underscored, baseline_frame(hyphenated))
+    assert plan.index_of["glyburide_metformin"] == plan.index_of["glyburide-metformin"]
+
+    # Drivers come back under the caller's spelling
+    provided = dict(plan.provided(underscored[0]))
+    assert provided[plan.index_of["glyburide-metformin"]] == "glyburide_metformin"
+
+
+def test_missing_categoricals_and_bad_numerics():
+    plan = load_feature_plan()
+    num, cat = plan.to_arrays(ODD_ROWS[1])
+    assert np.isnan(num[0, plan.num_names.index("age")])
+    assert cat[0, plan.cat_names.index("race")] == MISSING_CATEGORY
+    assert cat[0, plan.cat_names.index("gender")] == MISSING_CATEGORY
+
+
+def test_vectorized_pool_scores_like_the_dataframe(model_path, baseline_frame):
+    from catboost import CatBoostClassifier
+
+    plan = load_feature_plan()
+    model = CatBoostClassifier()
+    model.load_model(model_path)
+    rows = patient_population(10, seed=5) + ODD_ROWS
+    expected = model.predict_proba(baseline_frame(rows))[:, 1]
+    assert model.predict_proba(plan.to_pool(rows))[:, 1] == pytest.approx(expected, abs=1e-12)
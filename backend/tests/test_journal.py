@@ -0,0 +1,54 @@
+from datetime import datetime
+
+from app.journal import PredictionJournal
+
+
+class _Session:
+    """Stub sync session: commit() fails for the rows of `bad` prediction ids."""
+
+    def __init__(self, bad, committed):
+        self.bad, self.committed, self.rows = bad, committed, []
+
+    def execute(self, statement, rows=None):
+        if isinstance(rows, list) and rows and "risk_score" in rows[0]:
+            self.rows = rows
+
+    def commit(self):
+        if any(r["id"] in self.bad for r in self.rows):
+            raise RuntimeError("constraint failed")
+        self.committed.extend(r["id"] for r in self.rows)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _row(prediction_id: str) -> dict:
+    return {"id": prediction_id, "patient_id": "p" + prediction_id, "risk_score": 0.5, "band": "medium",
+            "top_features": {}, "explanation": "x", "timestamp": datetime.utcnow()}
+
+
+def test_dropped_row_is_reported_and_neighbours_are_written():
+    committed = []
+    journal = PredictionJournal(session_for=lambda customer_id: _Session({"bad"}, committed), max_wait_ms=50)
+    for prediction_id in ("ok1", "bad", "ok2"):
+        journal.append("c", _row(prediction_id), [])
+
+    assert journal.wait_written("ok1", timeout=5) and journal.wait_written("ok2", timeout=5)
+    assert not journal.wait_written("bad", timeout=5)
+    assert journal.dropped("bad") == "RuntimeError: constraint failed"
+    assert journal.dropped("ok1") is None
+    assert sorted(committed) == ["ok1", "ok2"]
+    stats = journal.stats()
+    assert stats["dropped_ids"] == ["bad"] and stats["failed"] == 1 and stats["written"] == 2
+    journal.close()
+
+
+def test_wait_written_times_out_while_queued():
+    journal = PredictionJournal(session_for=lambda customer_id: _Session(set(), []))
+    journal._ensure_started = lambda: None  # no writer: the row stays queued
+    journal.append("c", _row("slow"), [])
+    assert not journal.wait_written("slow", timeout=0.05)
+    assert journal.dropped("slow") is None
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from app.db import Base, Customer, Patient, PatientLatestRisk, Prediction, init_schema, make_engine
+
+T0 = datetime(2025, 3, 3, 9, 0)
+
+
+def _prediction(prediction_id: str, patient_id: str, hours: float, score: float, band: str) -> dict:
+    return {"id": prediction_id, "patient_id": patient_id, "risk_score": score, "band": band,
+            "top_features": {}, "explanation": "x", "timestamp": T0 + timedelta(hours=hours)}
+
+
+def _seed(conn, predictions: list):
+    conn.execute(insert(Customer.__table__), [{"id": "c", "name": "C"}])
+    conn.execute(insert(Patient.__table__), [{"id": p, "name": p, "customer_id": "c"} for p in ("a", "b", "c")])
+    conn.execute(insert(Prediction.__table__), predictions)
+
+
+def _latest(conn) -> dict:
+    rows = conn.execute(select(PatientLatestRisk.patient_id, PatientLatestRisk.prediction_id,
+                               PatientLatestRisk.band)).all()
+    return {r.patient_id: (r.prediction_id, r.band) for r in rows}
+
+
+def test_backfill_fills_the_newest_prediction_of_each_patient(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path}/latest.db")
+    Base.metadata.create_all(engine)  # predictions stored before the table and its trigger existed
+    with engine.begin() as conn:
+        _seed(conn, [_prediction("a1", "a", 0, 0.2, "low"), _prediction("a2", "a", 5, 0.7, "high"),
+                     _prediction("a0", "a", -5, 0.5, "medium"), _prediction("b1", "b", 1, 0.4, "medium")])
+    init_schema(engine)
+    with engine.connect() as conn:
+        assert _latest(conn) == {"a": ("a2", "high"), "b": ("b1", "medium")}
+
+
+def test_trigger_keeps_the_newest_prediction(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path}/latest.db")
+    init_schema(engine)
+    with engine.begin() as conn:
+        _seed(conn, [_prediction("a1", "a", 0, 0.2, "low")])
+        conn.execute(insert(Prediction.__table__), [_prediction("a2", "a", 1, 0.5, "medium")])
+        # A late write of an older prediction does not replace the newer one
+        conn.execute(insert(Prediction.__table__), [_prediction("a0", "a", -1, 0.9, "high")])
+        conn.execute(insert(Prediction.__table__), [_prediction("c1", "c", 2, 0.1, "low")])
+    with engine.connect() as conn:
+        assert _latest(conn) == {"a": ("a2", "medium"), "c": ("c1", "low")}
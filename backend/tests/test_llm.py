@@ -0,0 +1,99 @@
+import httpx
+import openai
+import pytest
+
+from app.llm import CircuitBreaker, CircuitOpenError, ResilientLLMClient
+
+
+def _status_error(cls, status: int):
+    request = httpx.Request("POST", "http://llm.invalid/v1/chat/completions")
+    return cls("error", response=httpx.Response(status, request=request), body=None)
+
+
+class _Chunk:
+    def __init__(self, text):
+        delta = type("Delta", (), {"content": text})
+        self.choices = [type("Choice", (), {"delta": delta})]
+
+
+class _Stream:
+    def __init__(self, texts):
+        self.texts = texts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        return (_Chunk(t) for t in self.texts)
+
+
+class _Completions:
+    """Plays back `outcomes`: an exception to raise or a value to return, one per create() call."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+
+    def create(self, stream=False, **request):
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        if stream:
+            return _Stream(outcome)
+        message = type("Message", (), {"content": outcome})
+        return type("Response", (), {"choices": [type("Choice", (), {"message": message})]})
+
+
+def _client(outcomes) -> ResilientLLMClient:
+    client = ResilientLLMClient(retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0))
+    client._client = type("Stub", (), {"chat": type("Chat", (), {"completions": _Completions(outcomes)})})
+    return client
+
+
+def _open(client):
+    with pytest.raises(openai.InternalServerError):
+        client.complete(messages=[])
+    assert client.breaker.state == "open"
+
+
+def test_rejected_request_during_trial_frees_the_breaker():
+    client = _client([_status_error(openai.InternalServerError, 500),
+                      _status_error(openai.BadRequestError, 400), "ok"])
+    _open(client)
+    with pytest.raises(openai.BadRequestError):
+        client.complete(messages=[])  # the half-open trial
+    assert client.complete(messages=[]) == "ok"
+    assert client.breaker.state == "closed"
+
+
+def test_stream_closed_before_first_delta_frees_the_breaker():
+    client = _client([_status_error(openai.InternalServerError, 500), ["a", "b"], ["c"]])
+    _open(client)
+    client.stream(messages=[]).close()  # never started: no call made, nothing to release
+    stream = client.stream(messages=[])
+    assert next(stream) == "a"
+    stream.close()
+    assert client.breaker.state == "closed"
+    assert list(client.stream(messages=[])) == ["c"]
+
+
+def test_stream_rejected_during_trial_frees_the_breaker():
+    client = _client([_status_error(openai.InternalServerError, 500),
+                      _status_error(openai.UnprocessableEntityError, 422), ["x"]])
+    _open(client)
+    with pytest.raises(openai.UnprocessableEntityError):
+        list(client.stream(messages=[]))
+    assert list(client.stream(messages=[])) == ["x"]
+
+
+def test_trial_still_reopens_on_upstream_failure():
+    client = _client([_status_error(openai.InternalServerError, 500), _status_error(openai.InternalServerError, 503)])
+    _open(client)
+    client.breaker.reset_timeout = 60
+    client.breaker._opened_at = 0  # long enough ago for the trial
+    with pytest.raises(openai.InternalServerError):
+        client.complete(messages=[])
+    with pytest.raises(CircuitOpenError):
+        client.complete(messages=[])
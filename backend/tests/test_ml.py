@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from app import ml
+from app.ml import InferenceEngine, model_version_for
+from bench.fixtures import patient_population
+
+
+def _no_load(*args, **kwargs):
+    raise AssertionError("the model was loaded")
+
+
+def test_serving_model_versions_never_loads_the_model(monkeypatch):
+    monkeypatch.setattr(ml, "_engine", None)
+    monkeypatch.setattr(ml, "InferenceEngine", _no_load)
+    assert ml.serving_model_versions() == set()
+    assert ml.loaded_engine() is None
+
+
+def test_engine_matches_the_per_row_model(model_path, baseline_frame):
+    from catboost import CatBoostClassifier, Pool
+
+    rows = patient_population(8, seed=3)
+    engine = InferenceEngine(model_path, cache_size=0)
+    frame = baseline_frame(rows)
+    model = CatBoostClassifier()
+    model.load_model(model_path)
+    pool = Pool(frame, cat_features=engine.plan.cat_names)
+    probs = model.predict_proba(pool)[:, 1]
+    shap = model.get_feature_importance(pool, type="ShapValues")[:, :-1]
+
+    results = engine.predict_batch(rows)
+    for i, (row, result) in enumerate(zip(rows, results)):
+        assert result["risk_score"] == pytest.approx(probs[i], abs=1e-9)
+        # Drivers only for the features the caller provided, keyed as spelled
+        assert set(result["top_features"]) == set(row) & set(engine.plan.feature_names)
+        for name, value in result["top_features"].items():
+            assert value == pytest.approx(shap[i, engine.plan.feature_names.index(name)], abs=1e-9)
+        assert result["explanation_tier"] == "exact"
+
+
+def test_engine_batch_equals_single_rows(model_path):
+    rows = patient_population(5, seed=11)
+    engine = InferenceEngine(model_path, cache_size=0)
+    batch = engine.predict_batch(rows)
+    for row, result in zip(rows, batch):
+        single = engine.predict(row)
+        assert single["risk_score"] == pytest.approx(result["risk_score"])
+        assert single["band"] == result["band"]
+        assert np.allclose([single["top_features"][k] for k in sorted(single["top_features"])],
+                           [result["top_features"][k] for k in sorted(result["top_features"])])
+
+
+def test_engine_version_comes_from_the_artifact(model_path):
+    engine = InferenceEngine(model_path, cache_size=0)
+    assert engine.model_version == model_version_for(model_path, ml.file_checksum(model_path))
+    assert engine.model_version.startswith("catboost_test-")
+    assert all(r["model_version"] == engine.model_version for r in engine.predict_batch([{}, {"age": 60}]))
@@ -0,0 +1,76 @@
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app.db import Prediction, engine
+
+T0 = datetime(2025, 5, 1, 8, 0)
+
+
+def _customer(client, patients: int) -> str:
+    customer_id = f"pages-{uuid.uuid4().hex[:8]}"
+    client.post("/customers", json={"id": customer_id, "name": "Pages", "explainer": "local"})
+    for i in range(patients):
+        r = client.post(f"/customers/{customer_id}/patients", json={"id": f"{customer_id}-{i:02d}", "name": "P"})
+        assert r.status_code == 201
+    return customer_id
+
+
+def _walk(client, url: str, limit: int, **params) -> list:
+    items, cursor = [], None
+    while True:
+        r = client.get(url, params={"limit": limit, **params, **({"cursor": cursor} if cursor else {})})
+        assert r.status_code == 200 and len(r.json()) <= limit
+        items += r.json()
+        cursor = r.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return items
+
+
+def _history(customer_id: str) -> str:
+    """Ten predictions for the first patient, with timestamp ties broken by id."""
+    patient_id = f"{customer_id}-00"
+    with engine.begin() as conn:
+        conn.execute(insert(Prediction.__table__), [
+            {"id": f"{customer_id}-r{i}", "patient_id": patient_id, "risk_score": i / 10,
+             "band": "high" if i % 3 == 0 else "low", "top_features": {}, "explanation": "x",
+             "timestamp": T0 + timedelta(hours=i // 2)}
+            for i in range(10)
+        ])
+    return patient_id
+
+
+def test_patient_list_is_unpaged_unless_asked(client):
+    customer_id = _customer(client, 7)
+    r = client.get(f"/customers/{customer_id}/patients")
+    ids = [p["id"] for p in r.json()]
+    assert ids == sorted(ids) and len(ids) == 7 and "X-Next-Cursor" not in r.headers
+
+    assert [p["id"] for p in _walk(client, f"/customers/{customer_id}/patients", 3)] == ids
+
+
+def test_prediction_history_pages_newest_first(client):
+    customer_id = _customer(client, 1)
+    patient_id = _history(customer_id)
+    url = f"/customers/{customer_id}/patients/{patient_id}/predictions"
+    full = client.get(url).json()
+    assert [p["id"] for p in full] == [f"{customer_id}-r{i}" for i in range(9, -1, -1)]
+
+    for limit in (1, 3, 4):
+        assert _walk(client, url, limit) == full
+    assert _walk(client, url, 2, band="high") == [p for p in full if p["band"] == "high"]
+
+
+def test_patient_analytics_pages_oldest_first(client):
+    customer_id = _customer(client, 1)
+    patient_id = _history(customer_id)
+    url = f"/analytics/patients/{customer_id}/{patient_id}"
+    full = client.get(url).json()
+    assert [p["risk_score"] for p in full] == [i / 10 for i in range(10)]
+    assert _walk(client, url, 3) == full
+
+
+def test_bad_cursor_is_a_400(client):
+    customer_id = _customer(client, 1)
+    assert client.get(f"/customers/{customer_id}/patients", params={"cursor": "not-a-cursor"}).status_code == 400
@@ -0,0 +1,79 @@
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select, text
+
+from app.db import Base, Customer, CustomerRiskRollup, Patient, Prediction, init_schema, make_engine
+
+BANDS = ("low", "medium", "high")
+
+
+def _predictions(n: int, seed: int = 1) -> list:
+    """Predictions over three weeks for patients of two customers, inserted out of time order."""
+    rng = random.Random(seed)
+    start = datetime(2025, 2, 26, 0, 0)  # a Wednesday: the first week bucket starts before it
+    return [
+        {"id": f"r{i}", "patient_id": f"p{rng.randrange(8)}", "risk_score": round(rng.random(), 3),
+         "band": rng.choice(BANDS), "top_features": {}, "explanation": "x",
+         "timestamp": start + timedelta(minutes=rng.randrange(21 * 24 * 60))}
+        for i in range(n)
+    ]
+
+
+def _seed_patients(conn):
+    conn.execute(insert(Customer.__table__), [{"id": c, "name": c} for c in ("c1", "c2")])
+    conn.execute(insert(Patient.__table__),
+                 [{"id": f"p{i}", "name": "n", "customer_id": "c1" if i < 5 else "c2"} for i in range(8)])
+
+
+def _expected(conn) -> dict:
+    """The rollup recomputed with a GROUP BY over predictions, bucketed in Python."""
+    rows = conn.execute(text(
+        "SELECT pt.customer_id, p.patient_id, p.timestamp, p.risk_score, p.band "
+        "FROM predictions p JOIN patients pt ON pt.id = p.patient_id")).all()
+    groups = defaultdict(list)
+    for customer_id, patient_id, ts, score, band in rows:
+        day = datetime.fromisoformat(str(ts)).date()
+        for key in (("all", ""), ("day", day.isoformat()), ("week", (day - timedelta(days=day.weekday())).isoformat())):
+            groups[(customer_id, *key)].append((patient_id, score, band))
+    return {
+        key: (len(g), round(sum(s for _, s, _ in g), 6), *(sum(b == band for _, _, b in g) for band in BANDS),
+              len({p for p, _, _ in g}))
+        for key, g in groups.items()
+    }
+
+
+def _rollup(conn) -> dict:
+    r = CustomerRiskRollup
+    return {
+        (row.customer_id, row.granularity, row.bucket_start):
+            (row.predictions, round(row.risk_sum, 6), row.low, row.medium, row.high, row.patients)
+        for row in conn.execute(select(r.customer_id, r.granularity, r.bucket_start, r.predictions, r.risk_sum,
+                                       r.low, r.medium, r.high, r.patients))
+    }
+
+
+def test_trigger_rollup_matches_a_recomputed_group_by(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path}/rollup.db")
+    init_schema(engine)
+    predictions = _predictions(300)
+    with engine.begin() as conn:
+        _seed_patients(conn)
+        for chunk in (predictions[:1], predictions[1:120], predictions[120:]):  # single and bulk inserts
+            conn.execute(insert(Prediction.__table__), chunk)
+    with engine.connect() as conn:
+        expected = _expected(conn)
+        assert _rollup(conn) == expected
+    assert {g for _, g, _ in expected} == {"all", "day", "week"}
+
+
+def test_backfill_rollup_matches_a_recomputed_group_by(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path}/rollup.db")
+    Base.metadata.create_all(engine)  # predictions stored before the rollup trigger existed
+    with engine.begin() as conn:
+        _seed_patients(conn)
+        conn.execute(insert(Prediction.__table__), _predictions(200, seed=2))
+    init_schema(engine)
+    with engine.connect() as conn:
+        assert _rollup(conn) == _expected(conn)
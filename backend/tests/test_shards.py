@@ -0,0 +1,58 @@
+import threading
+
+from app import shards
+from app.shards import TenantRouter
+
+
+def test_pinned_shard_is_not_retired(tmp_path):
+    router = TenantRouter(str(tmp_path), max_open=1)
+    a = router.pin("a")
+    b = router.pin("b")
+    assert router.stats()["open"] == 2 and router.stats()["evicted"] == 0
+
+    router.unpin(a)  # back under max_open as soon as "a" is free
+    assert router.stats()["open"] == 1 and router.pin("b", create=False) is b
+    assert router.pin("a", create=False) is None
+    router.unpin(b)
+    router.unpin(b)
+
+
+def test_session_keeps_its_shard_pinned_until_closed(tmp_path):
+    router = TenantRouter(str(tmp_path), max_open=1)
+    db = router.session("a")
+    shard = router.pin("b")
+    router.unpin(shard)  # "b" is the one retired: "a" is still in use
+    a = router.pin("a", create=False)
+    assert a is not None
+    router.unpin(a)
+
+    db.close()
+    db.close()  # a second close does not unpin twice
+    router.unpin(router.pin("b"))
+    assert router.pin("a", create=False) is None
+    assert router.stats()["pinned"] == 0
+
+
+def test_opening_a_shard_does_not_block_other_customers(tmp_path, monkeypatch):
+    router = TenantRouter(str(tmp_path))
+    a = router.pin("a")
+    opening, release = threading.Event(), threading.Event()
+    real_shard = shards.Shard
+
+    def slow_shard(*args, **kwargs):
+        opening.set()
+        release.wait(5)
+        return real_shard(*args, **kwargs)
+
+    monkeypatch.setattr(shards, "Shard", slow_shard)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(router.pin("b"))) for _ in range(2)]
+    for t in threads:
+        t.start()
+    assert opening.wait(5)
+    assert router.pin("a", create=False) is a  # not held up by "b" being opened
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert len(results) == 2 and results[0] is results[1]
+    assert router.stats()["opened"] == 2 and results[0].pins == 2 and not router._creating
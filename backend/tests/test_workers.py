@@ -0,0 +1,40 @@
+from app import ml
+from app.workers import InferencePool
+
+
+class _Engine:
+    """Stand-in for InferenceEngine, inherited by forked workers."""
+
+    def __init__(self, model_version):
+        self.model_path = "model.cbm"
+        self.model_version = model_version
+
+    def predict_batch(self, inputs, tier="exact"):
+        return [self.model_version for _ in inputs]
+
+
+def test_load_model_moves_every_worker_to_the_new_version(monkeypatch):
+    monkeypatch.setattr(ml, "_engine", _Engine("v1"))
+    pool = InferencePool(2, "model.cbm", "fork", "v1")
+    try:
+        assert pool.score_batch([{}]) == ["v1"]
+        first = pool._executor
+
+        monkeypatch.setattr(ml, "_engine", _Engine("v2"))  # same path, retrained artifact
+        pool.load_model("model.cbm", "v2")
+        assert pool._executor is not first and pool.model_version == "v2"
+        assert [pool.score_batch([{}]) for _ in range(4)] == [["v2"]] * 4
+        assert pool.stats()["model_loads"] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_health_pings_each_worker_once(monkeypatch):
+    monkeypatch.setattr(ml, "_engine", _Engine("v1"))
+    pool = InferencePool(3, "model.cbm", "fork", "v1")
+    try:
+        for _ in range(3):
+            health = pool.health()
+            assert health["healthy"] and len(health["responding_pids"]) == 3
+    finally:
+        pool.shutdown()
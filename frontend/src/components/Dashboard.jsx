@@ -24,100 +24,109 @@ const Dashboard = () => {
   const [isNewPatientModalOpen, setIsNewPatientModalOpen] = useState(false);
   const [viewStatus, setViewStatus] = useState('all'); // 'all', 'discharged', 'not_discharged'
   const [patientRisks, setPatientRisks] = useState({}); // Store risk data for each patient
-  const [riskDataLoading, setRiskDataLoading] = useState(false); // Loading state for risk data
 
-  // Fetch risk data for all patients in parallel
-  const fetchAllPatientRisks = async (patientList) => {
-    setRiskDataLoading(true);
-    try {
-      const riskPromises = patientList.map(async (patient) => {
-        try {
-          const response = await fetch(`https://submammary-correlatively-irma.ngrok-free.dev/analytics/patients/CUST1/${patient.id}`, {
-            method: 'GET',
-            headers: {
-              'ngrok-skip-browser-warning': 'true',
-              'Accept': 'application/json'
-            }
-          });
+  // Latest risk per patient comes with the dashboard response
+  const indexPatientRisks = (patientList) => {
+    const risks = {};
+    patientList.forEach((patient) => {
+      if (patient.latest_risk) {
+        risks[patient.id] = patient.latest_risk;
+      }
+    });
+    setPatientRisks(risks);
+  };
 
-          if (response.ok) {
-            const riskData = await response.json();
-            // Get the latest risk data (most recent timestamp)
-            if (riskData && riskData.length > 0) {
-              const latestRisk = riskData[riskData.length - 1]; // Assuming data is sorted by timestamp
-              return { patientId: patient.id, riskData: latestRisk };
-            }
-          }
-          return { patientId: patient.id, riskData: null };
-        } catch (error) {
-          console.error(`Error fetching risk data for patient ${patient.id}:`, error);
-          return { patientId: patient.id, riskData: null };
-        }
-      });
+  const API_BASE = 'https://submammary-correlatively-irma.ngrok-free.dev/customers/CUST1';
+  const PAGE_SIZE = 100;
+  const [nextCursor, setNextCursor] = useState(null); // X-Next-Cursor of the last page loaded, null on the last page
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [summary, setSummary] = useState(null); // patient counts by status and gender, aggregated by the server
 
-      const results = await Promise.all(riskPromises);
-      
-      // Update state with all risk data at once
-      const newPatientRisks = {};
-      results.forEach(({ patientId, riskData }) => {
-        if (riskData) {
-          newPatientRisks[patientId] = riskData;
-        }
-      });
-      
-      setPatientRisks(newPatientRisks);
-    } catch (error) {
-      console.error('Error fetching risk data:', error);
-    } finally {
-      setRiskDataLoading(false);
+  const getJson = async (url) => {
+    const response = await fetch(url, {
+      method: 'GET',
+      mode: 'cors',
+      headers: {
+        'ngrok-skip-browser-warning': 'true',
+        'Accept': 'application/json'
+      }
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const text = await response.text();
+    try {
+      return { data: JSON.parse(text), cursor: response.headers.get('X-Next-Cursor') };
+    } catch (parseError) {
+      console.error('JSON parse error:', parseError);
+      console.error('Response text:', text);
+      throw new Error('Invalid JSON response from server');
+    }
+  };
+
+  // One page of patients with their latest risk (only the columns the table shows); the server filters by status
+  const fetchPage = (cursor) => {
+    let url = `${API_BASE}/dashboard?fields=id,name,status,details.age,details.gender,latest_risk&limit=${PAGE_SIZE}`;
+    if (viewStatus !== 'all') {
+      url += `&status=${viewStatus}`;
+    }
+    if (cursor) {
+      url += `&cursor=${encodeURIComponent(cursor)}`;
     }
+    return getJson(url);
   };
 
-  // Fetch patients from API
+  // First page of the current view; switching views starts over
   useEffect(() => {
+    let cancelled = false;
     const fetchPatients = async () => {
       try {
         setLoading(true);
-        const response = await fetch('https://submammary-correlatively-irma.ngrok-free.dev/customers/CUST1/patients', {
-          method: 'GET',
-          mode: 'cors',
-          headers: {
-            'ngrok-skip-browser-warning': 'true',
-            'Accept': 'application/json'
-          }
-        });
-        
-        if (!response.ok) {
-          throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        
-        const text = await response.text();
-        console.log('Raw response:', text); // Debug log
-        
-        let data;
-        try {
-          data = JSON.parse(text);
-        } catch (parseError) {
-          console.error('JSON parse error:', parseError);
-          console.error('Response text:', text);
-          throw new Error('Invalid JSON response from server');
-        }
-        
+        setError(null);
+        const { data, cursor } = await fetchPage(null);
+        if (cancelled) return;
         setPatients(data);
-        
-        // Fetch risk data for all patients in parallel
-        fetchAllPatientRisks(data);
+        indexPatientRisks(data);
+        setNextCursor(cursor);
       } catch (err) {
+        if (cancelled) return;
         setError(err.message);
         console.error('Error fetching patients:', err);
       } finally {
-        setLoading(false);
+        if (!cancelled) setLoading(false);
       }
     };
 
     fetchPatients();
+    return () => { cancelled = true; };
+  }, [viewStatus]);
+
+  useEffect(() => {
+    getJson(`${API_BASE}/dashboard/summary`)
+      .then(({ data }) => setSummary(data))
+      .catch((err) => console.error('Error fetching dashboard summary:', err));
   }, []);
 
+  // Keyset pagination: the next page is only fetched when asked for
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const { data, cursor } = await fetchPage(nextCursor);
+      const loaded = [...patients, ...data];
+      setPatients(loaded);
+      indexPatientRisks(loaded);
+      setNextCursor(cursor);
+    } catch (err) {
+      setError(err.message);
+      console.error('Error fetching patients:', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleNewPatientSubmit = async (patientData) => {
     try {
       // Here you would typically send the data to your backend
@@ -135,19 +144,13 @@ const Dashboard = () => {
     }
   };
 
-  // Filter patients based on current view
-  const getFilteredPatients = () => {
-    switch (viewStatus) {
-      case 'discharged':
-        return patients.filter(p => p.status === 'discharged');
-      case 'not_discharged':
-        return patients.filter(p => p.status !== 'discharged');
-      default:
-        return patients;
-    }
-  };
+  // The server already filtered by the current view
+  const filteredPatients = patients;
 
-  const filteredPatients = getFilteredPatients();
+  const count = (n) => (summary ? n.toString() : '…');
+  const totalPatients = summary?.patients ?? 0;
+  const dischargedPatients = summary?.by_status?.discharged ?? 0;
+  const activePatients = totalPatients - dischargedPatients;
 
   // Helper function to get risk color based on band
   const getRiskColor = (band) => {
@@ -164,10 +167,10 @@ const Dashboard = () => {
   };
 
   const stats = [
-    { title: 'Total Patients', value: patients.length.toString(), change: '+12%', icon: Users, color: 'blue' },
-    { title: 'Discharged Patients', value: patients.filter(p => p.status === 'discharged').length.toString(), change: '+8%', icon: CheckCircle, color: 'green' },
-    { title: 'Active Patients', value: patients.filter(p => p.status !== 'discharged').length.toString(), change: '+15%', icon: Clock, color: 'purple' },
-    { title: 'Male Patients', value: patients.filter(p => p.details?.gender === 'Male').length.toString(), change: '+5%', icon: Users, color: 'blue' }
+    { title: 'Total Patients', value: count(totalPatients), change: '+12%', icon: Users, color: 'blue' },
+    { title: 'Discharged Patients', value: count(dischargedPatients), change: '+8%', icon: CheckCircle, color: 'green' },
+    { title: 'Active Patients', value: count(activePatients), change: '+15%', icon: Clock, color: 'purple' },
+    { title: 'Male Patients', value: count(summary?.by_gender?.Male ?? 0), change: '+5%', icon: Users, color: 'blue' }
   ];
 
 
@@ -236,7 +239,7 @@ const Dashboard = () => {
                           : 'bg-gray-800/50 text-gray-300 hover:bg-gray-700/50 border border-gray-600/30'
                       }`}
                     >
-                      All ({patients.length})
+                      All ({count(totalPatients)})
                     </button>
                     <button
                       onClick={() => setViewStatus('not_discharged')}
@@ -246,7 +249,7 @@ const Dashboard = () => {
                           : 'bg-gray-800/50 text-gray-300 hover:bg-gray-700/50 border border-gray-600/30'
                       }`}
                     >
-                      Active ({patients.filter(p => p.status !== 'discharged').length})
+                      Active ({count(activePatients)})
                     </button>
                     <button
                       onClick={() => setViewStatus('discharged')}
@@ -256,7 +259,7 @@ const Dashboard = () => {
                           : 'bg-gray-800/50 text-gray-300 hover:bg-gray-700/50 border border-gray-600/30'
                       }`}
                     >
-                      Discharged ({patients.filter(p => p.status === 'discharged').length})
+                      Discharged ({count(dischargedPatients)})
                     </button>
                   </div>
                 </div>
@@ -311,12 +314,7 @@ const Dashboard = () => {
                             <TableCell className="text-gray-300">{patient.details?.age || 'N/A'}</TableCell>
                             <TableCell className="text-gray-300">{patient.details?.gender || 'N/A'}</TableCell>
                                 <TableCell>
-                                  {riskDataLoading ? (
-                                    <span className="inline-flex items-center px-2.5 py-0.5 rounded-full text-xs font-medium bg-gray-800/50 text-gray-300 border border-gray-600/30">
-                                      <div className="w-3 h-3 border border-gray-300 border-t-transparent rounded-full animate-spin mr-2"></div>
-                                      Loading...
-                                    </span>
-                                  ) : patientRisks[patient.id] ? (
+                                  {patientRisks[patient.id] ? (
                                     <span className={`inline-flex items-center px-2.5 py-0.5 rounded-full text-xs font-medium ${getRiskColor(patientRisks[patient.id].band)}`}>
                                       {patientRisks[patient.id].band?.toUpperCase() || 'N/A'}
                                     </span>
@@ -332,6 +330,17 @@ const Dashboard = () => {
                     </TableBody>
                   </Table>
                 )}
+                {!loading && !error && nextCursor && (
+                  <div className="flex justify-center pt-6">
+                    <button
+                      onClick={loadMore}
+                      disabled={loadingMore}
+                      className="px-4 py-2 rounded-lg text-sm font-medium transition-colors bg-gray-800/50 text-gray-300 hover:bg-gray-700/50 border border-gray-600/30 disabled:opacity-50"
+                    >
+                      {loadingMore ? 'Loading...' : `Load more (${patients.length} shown)`}
+                    </button>
+                  </div>
+                )}
               </div>
             </div>
           </div>
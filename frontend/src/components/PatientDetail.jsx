@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
+import { useExplanation } from '../hooks/useExplanation';
 import { motion, AnimatePresence } from 'motion/react';
 import { 
   ArrowLeft, 
@@ -51,6 +52,8 @@ const PatientDetail = () => {
   const [predictionData, setPredictionData] = useState(null);
   const [nudges, setNudges] = useState([]);
   const [showDischargeDialog, setShowDischargeDialog] = useState(false);
+  // Template text until the background explanation is stored
+  const explanation = useExplanation(patientId, predictionData?.prediction);
 
   useEffect(() => {
     const fetchPatientDetails = async () => {
@@ -617,7 +620,7 @@ const PatientDetail = () => {
                           <CardContent>
                             <div className="prose max-w-none">
                               <p className="text-gray-300 leading-relaxed whitespace-pre-line">
-                                {predictionData.prediction.explanation}
+                                {explanation}
                               </p>
                             </div>
                           </CardContent>
@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
+import { useExplanation } from '../hooks/useExplanation';
 import { motion, AnimatePresence } from 'motion/react';
 import { 
   ArrowLeft, 
@@ -54,6 +55,8 @@ const PatientDischarge = () => {
   const [isDischarging, setIsDischarging] = useState(false);
   const [activeTab, setActiveTab] = useState('discharge');
   const [showDischargeDialog, setShowDischargeDialog] = useState(false);
+  // Template text until the background explanation is stored
+  const explanation = useExplanation(patientId, predictionData?.prediction);
 
   useEffect(() => {
     const fetchDischargeData = async () => {
@@ -549,7 +552,7 @@ const PatientDischarge = () => {
                      <div className="bg-white p-8 rounded-xl shadow-lg">
                        <div className="prose max-w-none text-lg">
                          <p className="text-gray-700 leading-relaxed whitespace-pre-line">
-                           {prediction.explanation}
+                           {explanation}
                          </p>
                        </div>
                      </div>
@@ -0,0 +1,64 @@
+import { useEffect, useState } from "react";
+
+const API_BASE = "https://submammary-correlatively-irma.ngrok-free.dev/customers/CUST1";
+const MAX_POLLS = 120;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+/**
+ * The explanation text to show for a /predict result.
+ * /predict answers with a template explanation and explanation_status "pending"
+ * while the full one is generated in the background; this polls the prediction's
+ * explanation endpoint (waiting as long as its Retry-After header asks) and
+ * returns the final text once it is stored.
+ * @param {string} patientId
+ * @param {Object} prediction - the `prediction` object of the /predict response
+ * @returns {string|undefined} Explanation text
+ */
+export const useExplanation = (patientId, prediction) => {
+  const [explanation, setExplanation] = useState(prediction?.explanation);
+
+  useEffect(() => {
+    setExplanation(prediction?.explanation);
+    if (!prediction || prediction.explanation_status !== "pending") return undefined;
+
+    let cancelled = false;
+    const url = `${API_BASE}/patients/${patientId}/predictions/${prediction.id}/explanation`;
+    const poll = async () => {
+      let waitSeconds = 1;
+      for (let i = 0; i < MAX_POLLS && !cancelled; i++) {
+        await sleep(waitSeconds * 1000);
+        if (cancelled) return;
+        try {
+          const response = await fetch(url, {
+            method: "GET",
+            headers: {
+              "ngrok-skip-browser-warning": "true",
+              Accept: "application/json",
+            },
+          });
+          if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+          }
+          const body = await response.json();
+          if (cancelled) return;
+          if (body.status !== "pending") {
+            setExplanation(body.explanation);
+            return;
+          }
+          waitSeconds = Number(response.headers.get("Retry-After")) || 1;
+        } catch (err) {
+          console.error("Error fetching explanation:", err);
+          waitSeconds = Math.min(waitSeconds * 2, 10);
+        }
+      }
+    };
+
+    poll();
+    return () => {
+      cancelled = true;
+    };
+  }, [patientId, prediction?.id, prediction?.explanation_status]);
+
+  return explanation;
+};